@@ -1,12 +1,14 @@
 import streamlit as st
 from datetime import datetime
 import os
-import re
+import pandas as pd
 from scripts.igs_downloader import download_and_uncompress_ionex as download_ionex_range
-from scripts.generation_excel import generer_excel_TEC_par_heure
-from scripts.plot_ionex_map import afficher_carte_TEC_fichier
+from scripts.generation_excel import generer_series_TEC_par_heure
 from scripts.madrigal_downloader import telecharger_donnees_tec
-from scripts.madrigal_carte import lire_tec_ascii
+from scripts.cache_streamlit import (empreinte_upload, dossier_session, carte_globale_png, animation_octets,
+                                     carte_madrigal_png, mosaique_png, carte_statistique_png, images_horaires,
+                                     signature_fichier, carte_heure_fichier_png, tec_point_fichier)
+from scripts.profilage import Journal, activer_journal, desactiver_journal
 
 
 
@@ -18,13 +20,18 @@ choix = st.selectbox("🧭 Choisis une action :", [
     "Télécharger fichiers IONEX",
     "Téléchargement via Madrigal",  
     "Correction fichiers IONEX",
-    "Générer Excel TEC (zone précise)",
+    "Générer séries TEC (zone précise)",
     "Affichage série temporelle TEC",
     "Afficher carte TEC globale",
     "Animation carte TEC",
      "Afficher carte TEC depuis HDF5.gz"
 ])
 
+# Mesure des étapes (temps, CPU, lectures, mémoire) de l'action exécutée
+diagnostics = st.sidebar.checkbox("🩺 Diagnostics de performance", value=False)
+journal = Journal() if diagnostics else None
+jeton_journal = activer_journal(journal)
+
 
 
 # === Option 1 : Télécharger fichiers IONEX ===
@@ -39,6 +46,7 @@ if choix == "Télécharger fichiers IONEX":
 
     # 📁 Spécifier le dossier de destination
     dossier = st.text_input("📁 Dossier de téléchargement (ex: ./ionex_data)", value="./ionex_data")
+    n_paralleles = st.number_input("⚡ Téléchargements simultanés", min_value=1, max_value=16, value=4)
 
     if st.button("📥 Télécharger"):
         if start_date > end_date:
@@ -51,7 +59,7 @@ if choix == "Télécharger fichiers IONEX":
                 start_dt = datetime.strptime(start_date, "%Y-%m-%d") if isinstance(start_date, str) else start_date
                 end_dt = datetime.strptime(end_date, "%Y-%m-%d") if isinstance(end_date, str) else end_date
 
-                logs = download_ionex_range(start_dt, end_dt, dossier)  # 👈 passe le chemin ici
+                logs = download_ionex_range(start_dt, end_dt, dossier, n_paralleles=int(n_paralleles))  # 👈 passe le chemin ici
 
             if not logs:
                 st.warning("⚠️ Aucun fichier traité ou erreur durant le téléchargement.")
@@ -97,75 +105,122 @@ elif choix == "Correction fichiers IONEX":
 
     folder = st.text_input("📁 Dossier source des fichiers IONEX :", "ionex_files")
     output_folder = st.text_input("📁 Dossier de sortie (corrigé) :", "ionex_files/corrected")
+    # Le parsing (Excel, cartes, animations) lit les fichiers CODE tels quels : la réécriture n'est utile
+    # qu'aux outils externes qui découpent l'en-tête sur les blancs
+    verifier = st.checkbox("🔎 Vérifier seulement (aucun fichier réécrit)", value=True,
+                           help="Les pages d'extraction et d'affichage n'ont pas besoin des fichiers corrigés.")
+    en_place = st.checkbox("✏️ Corriger en place (aucune copie de l'archive)", value=False, disabled=verifier)
+    n_workers = st.number_input("⚙️ Processus parallèles (1 = séquentiel, 0 = tous les cœurs)",
+                                min_value=0, max_value=64, value=1)
 
     if st.button("🔧 Lancer la correction"):
         try:
-            os.makedirs(output_folder, exist_ok=True)
+            from scripts.corecteur_du_fichier import corriger_dossier_ionex, resumer_corrections
+
+            progression = st.progress(0.0, text="Correction en cours...")
+
+            def suivre(termines, total, statistiques):
+                progression.progress(termines / total, text=f"{termines}/{total} : "
+                                                            f"{os.path.basename(statistiques['source'])}")
 
             # Extensions des fichiers à corriger (ancien + nouveau format)
             valid_ext = (".inx", ".i", ".ionex", "")
-            ionex_files = [
-                f for f in os.listdir(folder)
-                if f.lower().endswith(valid_ext) and os.path.isfile(os.path.join(folder, f))
-            ]
+            corriges, echecs = corriger_dossier_ionex(folder, None if en_place else output_folder,
+                                                       extensions=valid_ext, n_workers=int(n_workers),
+                                                       rappel=suivre, verifier_seulement=verifier)
 
-            if not ionex_files:
+            if not corriges and not echecs:
                 st.warning("⚠️ Aucun fichier IONEX trouvé dans le dossier spécifié.")
             else:
-                for filename in ionex_files:
-                    filepath = os.path.join(folder, filename)
-                    output_filepath = os.path.join(output_folder, filename)
-
-                    try:
-                        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                            lines = f.readlines()
-
-                        corrected_lines = []
-                        for line in lines:
-                            if "LAT/LON1/LON2/DLON/H" in line:
-                                # Correction d’un format erroné par exemple : 60.0-5.0 devient 60.0 -5.0
-                                line = re.sub(r'(\d+\.\d+)-(\d+\.\d+)', r'\1 -\2', line)
-                            corrected_lines.append(line)
-
-                        with open(output_filepath, 'w', encoding='utf-8') as f:
-                            f.writelines(corrected_lines)
-
-                        st.success(f"✅ Corrigé : {filename}")
-                    except Exception as e:
-                        st.error(f"❌ Erreur avec {filename} : {e}")
+                resume = resumer_corrections(corriges)
+                if verifier:
+                    st.info(f"🔎 {resume['a_corriger']} fichier(s) à corriger "
+                            f"({resume['lignes_corrigees']} ligne(s)), {resume['valides']} déjà valide(s) ; "
+                            f"lisibles tels quels par l'application")
+                else:
+                    st.info(f"📊 {resume['corriges']} fichier(s) corrigé(s), {resume['valides']} déjà valide(s), "
+                            f"{resume['lignes_corrigees']} ligne(s) réécrite(s), "
+                            f"{resume['octets_ecrits'] / 1e6:.1f} Mo écrits pour "
+                            f"{resume['octets_lus'] / 1e6:.1f} Mo lus")
+                for filepath, statistiques in corriges:
+                    if statistiques["statut"] == "corrige":
+                        st.success(f"✅ Corrigé : {os.path.basename(filepath)}")
+                    elif statistiques["statut"] == "a_corriger":
+                        st.info(f"🔎 À corriger : {os.path.basename(filepath)} "
+                                f"({statistiques['lignes_corrigees']} ligne(s))")
+                    else:
+                        st.info(f"⏩ Déjà valide : {os.path.basename(filepath)}")
+                for filepath, message in echecs:
+                    st.error(f"❌ Erreur avec {os.path.basename(filepath)} : {message}")
 
         except Exception as e:
             st.error(f"❌ Erreur globale : {e}")
 
 
 # === Option 3 : Générer série temporelle ===
-elif choix == "Générer Excel TEC (zone précise)":
-    st.markdown("### 📄 Générer un fichier Excel TEC à partir des fichiers IONEX corrigés")
-
-    folder = st.text_input("📂 Dossier des fichiers IONEX", "ionex_files/corrected")
-    target_lat = st.number_input("Latitude de l'épicentre (°N)", value=21.0)
-    target_lon = st.number_input("Longitude de l'épicentre (°E)", value=96.0)
-    output_path = st.text_input("📁 Chemin de sauvegarde Excel", "outputs/tec_par_heure.xlsx")
+elif choix == "Générer séries TEC (zone précise)":
+    st.markdown("### 📄 Générer un fichier de séries TEC (Parquet, Feather ou Excel) à partir des fichiers IONEX")
+
+    # Fichiers lus tels quels : la correction préalable n'est pas nécessaire
+    folder = st.text_input("📂 Dossier des fichiers IONEX", "ionex_files")
+    mode = st.radio("🎯 Mode d'extraction", ["Épicentre unique", "Catalogue de séismes (CSV)"], horizontal=True)
+    if mode == "Épicentre unique":
+        target_lat = st.number_input("Latitude de l'épicentre (°N)", value=21.0)
+        target_lon = st.number_input("Longitude de l'épicentre (°E)", value=96.0)
+    else:
+        catalogue = st.text_input("📄 Catalogue CSV (colonnes latitude / longitude)", "catalogue_seismes.csv")
+        format_sortie = st.selectbox("🧾 Format du tableau", ["large", "long"],
+                                     help="large : une colonne par site ; long : une ligne par (date, site)")
+    output_path = st.text_input("📁 Chemin de sauvegarde (.parquet, .feather ou .xlsx)", "outputs/tec_par_heure.parquet",
+                                help="Parquet / Feather : écriture et relecture rapides ; Excel : export optionnel")
+    ajouter = st.checkbox("➕ Compléter le fichier existant (nouvelles dates uniquement)", value=False)
+    n_workers = st.number_input("⚙️ Processus parallèles pour le parsing (1 = séquentiel, 0 = tous les cœurs)",
+                                min_value=0, max_value=64, value=1)
 
     if st.button("📊 Lancer l’analyse"):
         try:
-            from scripts.generation_excel import generer_excel_TEC_par_heure
-            chemin = generer_excel_TEC_par_heure(folder, target_lat, target_lon, output_path)
-            st.success(f"✅ Fichier Excel généré : {chemin}")
+            echecs = []
+            if mode == "Épicentre unique":
+                chemin = generer_series_TEC_par_heure(folder, target_lat, target_lon, output_path,
+                                                      n_workers=int(n_workers), ajouter=ajouter, echecs=echecs)
+            else:
+                from scripts.generation_excel import generer_series_TEC_multi_sites
+                chemin = generer_series_TEC_multi_sites(folder, catalogue, output_path, format_sortie=format_sortie,
+                                                        n_workers=int(n_workers), ajouter=ajouter, echecs=echecs)
+            st.success(f"✅ Fichier de séries généré : {chemin}")
+            for filepath, message in echecs:
+                st.warning(f"⚠️ Fichier ignoré {os.path.basename(filepath)} : {message}")
         except Exception as e:
             st.error(f"❌ Erreur : {e}")
 # === Option 4 : afficher série temporelle ===
 elif choix == "Affichage série temporelle TEC":
     st.markdown("### 📈 Affichage de la série temporelle du TEC")
 
-    excel_file = st.text_input("📂 Chemin du fichier Excel TEC", "outputs/tec_par_heure.xlsx")
+    excel_file = st.text_input("📂 Chemin du fichier de séries TEC (.parquet, .feather ou .xlsx)",
+                               "outputs/tec_par_heure.parquet")
+    colonne = None
+    if os.path.exists(excel_file):
+        try:
+            from scripts.serie_temporelle import series_disponibles
+            # Colonnes (format large) ou sites (format long) du fichier
+            colonne = st.selectbox("📍 Série à afficher", series_disponibles(excel_file))
+        except Exception as e:
+            st.warning(f"⚠️ Colonnes illisibles : {e}")
     seisme_str = st.text_input("📅 Date/heure du séisme (ex: 2025-03-28 03:00:00)", "2025-03-28 03:00:00")
     k = st.number_input("⚖️ Facteur k pour limites de contrôle (ex: 2 pour Mw >= 6.0)", min_value=0.1, max_value=5.0, value=2.0, step=0.1)
+    methode = st.selectbox("📐 Référence des limites de contrôle", ["globale", "mediane", "moyenne"],
+                           format_func=lambda m: {"globale": "Moyenne globale ± kσ",
+                                                  "mediane": "Médiane glissante par heure ± k·IQR",
+                                                  "moyenne": "Moyenne glissante par heure ± kσ"}[m])
+    fenetre = 15
+    if methode != "globale":
+        fenetre = st.select_slider("📆 Fenêtre de la ligne de base (jours précédents)", options=[15, 27], value=15)
 
     if st.button("📊 Afficher la série temporelle"):
         try:
             from scripts.serie_temporelle import afficher_serie_temporelle_tec
-            fig = afficher_serie_temporelle_tec(excel_file, seisme_str, k=k)
+            fig = afficher_serie_temporelle_tec(excel_file, seisme_str, k=k, methode=methode, fenetre=fenetre,
+                                                colonne=colonne)
             st.pyplot(fig)
         except Exception as e:
             st.error(f"❌ Erreur lors de l'affichage : {e}")
@@ -174,9 +229,21 @@ elif choix == "Affichage série temporelle TEC":
 elif choix == "Afficher carte TEC globale":
     st.markdown("### 🌍 Affichage d'une carte TEC globale à partir d'un fichier IONEX")
 
-    fichier_ionex = st.file_uploader("📂 Sélectionner un fichier IONEX corrigé")
+    source = st.radio("📂 Source du fichier", ["Fichier déposé", "Fichier local (chemin)"], horizontal=True)
+    if source == "Fichier déposé":
+        fichier_ionex = st.file_uploader("📂 Sélectionner un fichier IONEX corrigé")
+    else:
+        # Fichier non compressé : l'heure choisie est lue seule, via l'index persistant des cartes
+        chemin_ionex = st.text_input("📂 Chemin du fichier IONEX", "ionex_files/")
+        fichier_ionex = chemin_ionex if os.path.isfile(chemin_ionex) else None
+
+    affichage = st.radio("🖼️ Affichage", ["Heure choisie", "Curseur horaire", "Toutes les heures (mosaïque)",
+                                          "Statistiques journalières"], horizontal=True)
 
-    heure = st.number_input("🕒 Heure UTC à afficher (0 à 23)", min_value=0, max_value=23, value=12)
+    if affichage == "Heure choisie":
+        heure = st.number_input("🕒 Heure UTC à afficher (0 à 23)", min_value=0, max_value=23, value=12)
+    elif affichage == "Statistiques journalières":
+        statistique = st.selectbox("📊 Statistique", ["moyenne", "min", "max"])
 
     col1, col2 = st.columns(2)
     with col1:
@@ -184,16 +251,45 @@ elif choix == "Afficher carte TEC globale":
     with col2:
         lon_epi = st.number_input("🧭 Longitude de l'épicentre", min_value=-180.0, max_value=180.0, value=96.0)
 
-    if fichier_ionex is not None and st.button("🌍 Afficher la carte TEC"):
+    if fichier_ionex is not None and source == "Fichier déposé":
+        # Le tampon du fichier déposé est lu directement, sans copie sur disque
+        cle, contenu, nom = empreinte_upload(fichier_ionex), fichier_ionex.getbuffer(), fichier_ionex.name
+    elif fichier_ionex is not None and affichage != "Heure choisie":
+        # Fichier local : empreinte mémorisée (taille, date), le fichier n'est haché qu'une fois
+        from scripts.ionex_cache import cle_source
+        cle, contenu, nom = cle_source(fichier_ionex), fichier_ionex, None
+
+    if affichage == "Curseur horaire" and fichier_ionex is not None:
+        # Les 24 images sont rendues une fois (fichier lu une seule fois) puis gardées en cache :
+        # déplacer le curseur n'affiche qu'une image déjà prête
         try:
-            temp_path = "temp_ionex.ionex"
-            with open(temp_path, "wb") as f:
-                f.write(fichier_ionex.read())
-
-            fig = afficher_carte_TEC_fichier(temp_path, heure_utc=heure,
-                                             epicenter_lat=lat_epi, epicenter_lon=lon_epi)
+            with st.spinner("Pré-rendu des cartes horaires... ⏳"):
+                images = images_horaires(cle, contenu, lat_epi, lon_epi, nom=nom)
+            heures = sorted(images)
+            heure = st.select_slider("🕒 Heure UTC", options=heures, value=heures[len(heures) // 2])
+            st.image(images[heure])
+        except Exception as e:
+            st.error(f"❌ Erreur lors de l'affichage : {e}")
 
-            st.pyplot(fig)
+    elif fichier_ionex is not None and st.button("🌍 Afficher la carte TEC"):
+        try:
+            # Jeu parsé et image mis en cache par empreinte du contenu et paramètres
+            point = None
+            if affichage == "Heure choisie" and source != "Fichier déposé":
+                from scripts.decompression import extension_compression
+                signature = signature_fichier(fichier_ionex)
+                png = carte_heure_fichier_png(fichier_ionex, signature, heure, lat_epi, lon_epi)
+                if not extension_compression(fichier_ionex):
+                    point = tec_point_fichier(fichier_ionex, signature, heure, lat_epi, lon_epi)
+            elif affichage == "Heure choisie":
+                png = carte_globale_png(cle, contenu, heure, lat_epi, lon_epi, nom=nom)
+            elif affichage == "Toutes les heures (mosaïque)":
+                png = mosaique_png(cle, contenu, lat_epi, lon_epi, nom=nom)
+            else:
+                png = carte_statistique_png(cle, contenu, statistique, lat_epi, lon_epi, nom=nom)
+            st.image(png)
+            if point is not None:
+                st.metric(f"TEC à l'épicentre ({point[0]} UTC)", f"{point[1]:.1f} TECU")
         except Exception as e:
             st.error(f"❌ Erreur lors de l'affichage : {e}")
 
@@ -202,76 +298,141 @@ elif choix == "Afficher carte TEC globale":
 elif choix == "Animation carte TEC":
     st.markdown("### 🎥 Animation carte TEC")
 
-    fichier = st.file_uploader("📂 Sélectionne un fichier IONEX corrigé ou TEC", type=["ionex", "inx", "txt", "gz", "xlsx"])
+    mode = st.radio("🎯 Source des cartes", ["Fichier unique", "Archive IONEX (plusieurs jours)"], horizontal=True)
+
+    if mode == "Fichier unique":
+        fichier = st.file_uploader("📂 Sélectionne un fichier IONEX corrigé ou TEC", type=["ionex", "inx", "txt", "gz", "xlsx"])
+    else:
+        folder = st.text_input("📂 Dossier des fichiers IONEX", "ionex_files")
+        col1, col2 = st.columns(2)
+        with col1:
+            date_debut = st.date_input("📅 Date de début", datetime(2024, 1, 1))
+        with col2:
+            date_fin = st.date_input("📅 Date de fin", datetime(2024, 1, 7))
 
     seisme_lat = st.number_input("Latitude de l'épicentre", format="%.1f")
     seisme_lon = st.number_input("Longitude de l'épicentre", format="%.1f")
 
-    if fichier is not None:
+    from scripts.video import ffmpeg_disponible
+    formats = ["gif", "mp4"] if ffmpeg_disponible() else ["gif"]
+    format_sortie = st.radio("🎞️ Format de l'animation", formats, horizontal=True)
+
+    if mode == "Fichier unique" and fichier is not None:
         if st.button("▶️ Afficher l'animation TEC"):
             with st.spinner("Génération de l'animation en cours... ⏳"):
                 try:
-                    from scripts.video import generer_animation_tec  # adapte le chemin si besoin
+                    # Animation mise en cache par empreinte du contenu et paramètres
+                    gif_bytes = animation_octets(empreinte_upload(fichier), fichier.getbuffer(),
+                                                 seisme_lat, seisme_lon, format_sortie, nom=fichier.name)
 
-                    # Sauvegarde temporaire du fichier uploadé
-                    temp_path = "temp_uploaded_file"
-                    with open(temp_path, "wb") as f:
-                        f.write(fichier.read())
+                    # Affichage dans Streamlit
+                    if format_sortie == "mp4":
+                        st.video(gif_bytes, format="video/mp4")
+                    else:
+                        st.image(gif_bytes)
 
-                    # Appel de la fonction pour générer l'animation et récupérer le chemin du fichier GIF
-                    animation_path = generer_animation_tec(temp_path, seisme_lat, seisme_lon)
+                except Exception as e:
+                    st.error(f"❌ Erreur durant la génération de l'animation : {e}")
 
-                    # Affichage dans Streamlit
-                    with open(animation_path, "rb") as gif_file:
-                        gif_bytes = gif_file.read()
-                    st.image(gif_bytes)
+    elif mode != "Fichier unique" and st.button("▶️ Générer l'animation sur la période"):
+        if date_fin < date_debut:
+            st.error("❌ La date de fin doit être postérieure à la date de début.")
+        else:
+            with st.spinner("Génération de l'animation en cours... ⏳"):
+                animation_path = None
+                echecs = []
+                try:
+                    from scripts.video import generer_animation_archive
+
+                    # Les cartes sont lues dans le cube de l'archive et encodées au fil de l'eau
+                    fin = datetime.combine(date_fin, datetime.max.time())
+                    animation_path = generer_animation_archive(folder, date_debut, fin, seisme_lat, seisme_lon,
+                                                               format_sortie, echecs=echecs)
+                    for filepath, message in echecs:
+                        st.warning(f"⚠️ Fichier ignoré {os.path.basename(filepath)} : {message}")
+
+                    with open(animation_path, "rb") as anim_file:
+                        anim_bytes = anim_file.read()
+                    if format_sortie == "mp4":
+                        st.video(anim_bytes, format="video/mp4")
+                    else:
+                        st.image(anim_bytes)
+                    st.download_button("💾 Télécharger l'animation", anim_bytes,
+                                       file_name=f"animation_tec_{date_debut}_{date_fin}.{format_sortie}")
 
                 except Exception as e:
                     st.error(f"❌ Erreur durant la génération de l'animation : {e}")
 
                 finally:
-                    # Nettoyage des fichiers temporaires si présents
-                    import os
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                    if 'animation_path' in locals() and os.path.exists(animation_path):
+                    if animation_path and os.path.exists(animation_path):
                         os.remove(animation_path)
 
 
 
 # === Option 7 : Afficher carte TEC depuis HDF5.gz ===
 elif choix == "Afficher carte TEC depuis HDF5.gz":
-    st.markdown("### 🗺️ Affichage carte TEC depuis fichier .HDF5.gz ou .txt")
+    st.markdown("### 🗺️ Affichage carte TEC depuis fichier .HDF5(.gz) ou .txt")
 
-    fichier = st.file_uploader("📂 Sélectionne un fichier .HDF5.gz ou .txt", type=["txt", "gz"])
+    fichier = st.file_uploader("📂 Sélectionne un fichier .hdf5, .HDF5.gz ou .txt", type=["txt", "gz", "hdf5", "h5"])
 
     heure_choisie = st.number_input("🕒 Heure UTC à afficher", min_value=0, max_value=23, value=12)
 
+    en_grille = st.checkbox("🧮 Grille pré-calculée (rapide, mise en cache)", value=False)
+    if en_grille:
+        statistique = st.selectbox("📊 Statistique par cellule", ["moyenne", "mediane", "compte"])
+        resolution = st.select_slider("📐 Résolution (°)", options=[0.5, 1.0, 2.0, 2.5, 5.0], value=1.0)
+
     if fichier is not None and st.button("🗺️ Afficher carte TEC"):
         try:
-            import tempfile
-            import gzip
-            import os
-
-            suffix = ".gz" if fichier.name.endswith(".gz") else ".txt"
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-                tmp_file.write(fichier.read())
-                tmp_path = tmp_file.name
-
-            # Si c’est un fichier .gz, on le décompresse en .txt
-            if suffix == ".gz":
-                with gzip.open(tmp_path, 'rb') as f_in:
-                    txt_path = tmp_path.replace(".gz", ".txt")
-                    with open(txt_path, 'wb') as f_out:
-                        f_out.write(f_in.read())
-                os.remove(tmp_path)  # supprime le .gz temporaire
-            else:
-                txt_path = tmp_path  # c’est déjà un .txt
-
-            fig = lire_tec_ascii(txt_path, heure_choisie)
-
-            st.pyplot(fig)
+            options = (statistique, resolution) if en_grille else ()
+            png = carte_madrigal_png(empreinte_upload(fichier), fichier.name, fichier.getbuffer(),
+                                     heure_choisie, en_grille, *options, _dossier_temp=dossier_session())
+            st.image(png)
 
         except Exception as e:
             st.error(f"❌ Erreur lors de l'affichage : {e}")
+
+
+# === Diagnostics de performance ===
+desactiver_journal(jeton_journal)
+if journal is not None:
+    # Les mesures de la dernière action restent affichées aux exécutions suivantes (téléchargements...)
+    if journal.etapes:
+        st.session_state["diagnostics"] = journal
+    dernier = st.session_state.get("diagnostics")
+
+    with st.expander("🩺 Diagnostics de performance", expanded=dernier is not None):
+        if dernier is None:
+            st.info("Lance une action pour mesurer ses étapes.")
+        else:
+            mo = 1024 * 1024
+            resume = pd.DataFrame(dernier.resume())
+            st.dataframe(pd.DataFrame({
+                "Étape": resume["nom"],
+                "Appels": resume["appels"],
+                "Durée (s)": resume["duree_s"].round(3),
+                "CPU (s)": resume["cpu_s"].round(3),
+                "Lu (Mo)": (resume["octets_lus"].astype(float) / mo).round(2),
+                "Hausse pic RSS (Mo)": (resume["hausse_pic_rss_octets"].astype(float) / mo).round(1),
+            }), hide_index=True)
+
+            detail = pd.DataFrame(dernier.lignes())
+            st.dataframe(pd.DataFrame({
+                "Étape": ["· " * p + n for p, n in zip(detail["profondeur"], detail["nom"])],
+                "Début (s)": detail["debut_s"].round(3),
+                "Durée (s)": detail["duree_s"].round(3),
+                "CPU (s)": detail["cpu_s"].round(3),
+                "Lu (Mo)": (detail["octets_lus"].astype(float) / mo).round(2),
+                "Pic RSS (Mo)": (detail["pic_rss_octets"].astype(float) / mo).round(1),
+                "Erreur": detail["erreur"],
+            }), hide_index=True)
+            st.caption("CPU, lectures et pic RSS sont ceux du processus entier ; "
+                       "les traitements en processus parallèles n'y figurent pas.")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("💾 Journal JSON", dernier.exporter_json(), file_name="diagnostics.json",
+                                   mime="application/json")
+            with col2:
+                st.download_button("💾 Trace Chrome", dernier.exporter_chrome_trace(), file_name="trace.json",
+                                   mime="application/json")
@@ -0,0 +1,241 @@
+import numpy as np
+from scripts.tec_cube import serie_grille
+from scripts.profilage import etape
+
+# Ligne de base glissante par heure du jour (jours précédents uniquement)
+FENETRE_DEFAUT = 15
+METHODES = ("mediane", "moyenne")
+# Bornes : médiane ± k·IQR ou moyenne ± k·σ
+K_DEFAUT = {"mediane": 1.5, "moyenne": 2.0}
+
+_UNE_HEURE = np.timedelta64(3600, "s")
+
+
+def grille_journaliere(temps, valeurs):
+    """
+    Range une série horaire dans un tableau (n_jours, 24, ...).
+
+    Les époques hors heure pleine sont ignorées et les heures absentes
+    valent NaN, si bien que la position d'une valeur ne dépend que de sa
+    date et de son heure.
+
+    Args:
+        temps (np.ndarray datetime64): époques croissantes (n,).
+        valeurs (np.ndarray): (n, ...) ; les dimensions suivantes (grille, points) sont conservées.
+
+    Returns:
+        tuple: (jours (n_jours, 24, ...) float32, indices horaires (n,) dans la grille aplatie ou -1)
+    """
+    temps = np.asarray(temps, dtype="datetime64[s]")
+    valeurs = np.asarray(valeurs, dtype=np.float32)
+    if len(temps) == 0:
+        return np.empty((0, 24) + valeurs.shape[1:], dtype=np.float32), np.empty(0, dtype=np.int64)
+
+    origine = temps[0].astype("datetime64[D]").astype("datetime64[s]")
+    ecarts = temps - origine
+    pleines = ecarts % _UNE_HEURE == np.timedelta64(0, "s")
+    indices = np.where(pleines, ecarts // _UNE_HEURE, -1).astype(np.int64)
+
+    n_jours = int(indices.max()) // 24 + 1
+    jours = np.full((n_jours * 24,) + valeurs.shape[1:], np.nan, dtype=np.float32)
+    jours[indices[pleines]] = valeurs[pleines]
+    return jours.reshape((n_jours, 24) + valeurs.shape[1:]), indices
+
+
+def _quantile_trie(tri, n, q):
+    """Quantile q (interpolation linéaire) de fenêtres triées (w, R) dont les n premières valeurs sont valides."""
+    if n.size and (n == n[0]).all():
+        # Même effectif partout (série sans lacune) : lecture de deux lignes contiguës
+        position = q * max(int(n[0]) - 1, 0)
+        bas = int(np.floor(position))
+        haut = min(bas + 1, max(int(n[0]) - 1, 0))
+        return tri[bas] + (position - bas) * (tri[haut] - tri[bas])
+
+    colonnes = np.arange(tri.shape[1])
+    position = q * np.maximum(n - 1, 0)
+    bas = np.floor(position).astype(np.int64)
+    haut = np.minimum(bas + 1, np.maximum(n - 1, 0))
+    v_bas = tri[bas, colonnes]
+    return v_bas + (position - bas) * (tri[haut, colonnes] - v_bas)
+
+
+def _retirer_inserer(tri, sortant, entrant, sortie):
+    """
+    Fenêtres triées suivantes : retire `sortant` et insère `entrant` dans chaque colonne de `tri` (w, R).
+
+    Quelques passages en O(w) par colonne, sans nouveau tri ; les NaN sont
+    codés +inf et restent donc en fin de fenêtre. Le résultat est écrit dans `sortie`.
+    """
+    # Fenêtres triées : les rangs j < i (resp. j < k) sont exactement ceux où la comparaison est vraie
+    reste = np.where(tri[:-1] < sortant, tri[:-1], tri[1:])
+    avant = reste < entrant
+    sortie[:-1] = np.where(avant, reste, entrant)
+    sortie[-1] = entrant
+    np.copyto(sortie[1:], reste, where=~avant)
+    return sortie
+
+
+def _base_mediane(jours, fenetre, min_valides):
+    """
+    Médiane et quartiles des `fenetre` jours précédents (au moins `min_valides` valeurs), par jour et heure.
+
+    La fenêtre triée de chaque série (heure, point) est mise à jour d'un
+    jour au suivant en retirant le jour sortant et en insérant le nouveau :
+    O(w) par jour au lieu d'un tri de chaque fenêtre. Les jours avant le
+    début de la série comptent comme manquants.
+    """
+    forme = jours.shape
+    centre = np.full(forme, np.nan, dtype=np.float32)
+    q1 = np.full(forme, np.nan, dtype=np.float32)
+    q3 = np.full(forme, np.nan, dtype=np.float32)
+    if forme[0] == 0:
+        return centre, q1, q3
+
+    # Une colonne par série : (n_jours, R) et fenêtres triées (fenetre, R)
+    cles = np.where(np.isfinite(jours), jours, np.inf).astype(np.float32).reshape(forme[0], -1)
+    tri = np.full((fenetre, cles.shape[1]), np.inf, dtype=np.float32)
+    suivant = np.empty_like(tri)
+    n = np.zeros(cles.shape[1], dtype=np.int64)
+    absent = np.full(cles.shape[1], np.inf, dtype=np.float32)
+
+    with np.errstate(invalid="ignore"):
+        for d in range(1, forme[0]):
+            # Fenêtre du jour d = jours [d - fenetre, d)
+            sortant = cles[d - 1 - fenetre] if d - 1 >= fenetre else absent
+            tri, suivant = _retirer_inserer(tri, sortant, cles[d - 1], suivant), tri
+            n += np.isfinite(cles[d - 1]).astype(np.int64) - np.isfinite(sortant)
+
+            suffisant = n >= max(min_valides, 1)
+            for resultat, q in ((centre, 0.5), (q1, 0.25), (q3, 0.75)):
+                resultat[d] = np.where(suffisant, _quantile_trie(tri, n, q), np.nan).reshape(forme[1:])
+    return centre, q1, q3
+
+
+def _base_moyenne(jours, fenetre, min_valides):
+    """Moyenne et écart-type des `fenetre` jours précédents, par sommes cumulées (O(n))."""
+    valides = np.isfinite(jours)
+    x = np.where(valides, jours, 0.0).astype(np.float64)
+    zeros = np.zeros((1,) + jours.shape[1:])
+    s1 = np.concatenate([zeros, np.cumsum(x, axis=0)])
+    s2 = np.concatenate([zeros, np.cumsum(x * x, axis=0)])
+    n = np.concatenate([zeros, np.cumsum(valides, axis=0)])
+
+    # Jour d : somme sur [max(d - fenetre, 0), d) = S[d] - S[max(d - fenetre, 0)]
+    d = np.arange(jours.shape[0])
+    d0 = np.maximum(d - fenetre, 0)
+    somme = s1[d] - s1[d0]
+    carres = s2[d] - s2[d0]
+    effectif = n[d] - n[d0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        m = somme / effectif
+        variance = (carres - effectif * m * m) / (effectif - 1)
+    ok = effectif >= max(min_valides, 2)
+    moyenne = np.where(ok, m, np.nan).astype(np.float32)
+    ecart = np.where(ok, np.sqrt(np.maximum(variance, 0.0)), np.nan).astype(np.float32)
+    return moyenne, ecart
+
+
+@etape("extraction.ligne_de_base")
+def ligne_de_base(temps, valeurs, fenetre=FENETRE_DEFAUT, methode="mediane", k=None,
+                  min_valides=None):
+    """
+    Ligne de base glissante par heure du jour et détection d'anomalies.
+
+    Pour chaque époque, la référence est calculée sur la même heure UTC des
+    `fenetre` jours précédents (ex. 15 ou 27 jours), ce qui retire la
+    variation diurne et suit la variation saisonnière :
+
+    - "mediane" : médiane M et quartiles, bornes M ± k·IQR (k = 1.5 par défaut) ;
+    - "moyenne" : moyenne et écart-type glissants par sommes cumulées, bornes ± k·σ.
+
+    Le calcul est vectorisé sur toutes les dimensions suivant le temps :
+    une série (n,), plusieurs points (n, p) ou toute la grille (n, n_lat, n_lon).
+
+    Args:
+        temps (np.ndarray datetime64): époques (n,), croissantes, au pas horaire ou multiple.
+        valeurs (np.ndarray): TEC (n, ...).
+        fenetre (int): nombre de jours de la ligne de base.
+        methode (str): "mediane" ou "moyenne".
+        k (float | None): facteur des bornes.
+        min_valides (int | None): valeurs minimales dans la fenêtre (par défaut fenetre // 2) ;
+            en début de série, la ligne de base est disponible dès que ce nombre de jours précède.
+
+    Returns:
+        dict: tableaux de même forme que `valeurs` : "centre", "bas", "haut",
+        "indice" (écart normalisé : 0 au centre, ±1 sur les bornes) et
+        "anomalie" (bool). Les époques sans ligne de base valent NaN / False.
+    """
+    if methode not in METHODES:
+        raise ValueError(f"Méthode de ligne de base inconnue : {methode}")
+    k = K_DEFAUT[methode] if k is None else k
+    min_valides = max(1, fenetre // 2) if min_valides is None else min_valides
+
+    valeurs = np.asarray(valeurs, dtype=np.float32)
+    jours, indices = grille_journaliere(temps, valeurs)
+
+    if methode == "mediane":
+        centre, q1, q3 = _base_mediane(jours, fenetre, min_valides)
+        ecart = k * (q3 - q1)
+    else:
+        centre, sigma = _base_moyenne(jours, fenetre, min_valides)
+        ecart = k * sigma
+
+    # Retour de la grille (jour, heure) aux époques d'origine
+    forme = (-1,) + valeurs.shape[1:]
+    pleines = indices >= 0
+    centre_t = np.full(valeurs.shape, np.nan, dtype=np.float32)
+    ecart_t = np.full(valeurs.shape, np.nan, dtype=np.float32)
+    centre_t[pleines] = centre.reshape(forme)[indices[pleines]]
+    ecart_t[pleines] = ecart.reshape(forme)[indices[pleines]]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        indice = (valeurs - centre_t) / ecart_t
+    return {
+        "centre": centre_t,
+        "bas": centre_t - ecart_t,
+        "haut": centre_t + ecart_t,
+        "indice": indice.astype(np.float32),
+        "anomalie": np.abs(indice) > 1,
+    }
+
+
+def anomalies_cube(cube, debut, fin, fenetre=FENETRE_DEFAUT, methode="mediane", k=None, lignes_par_lot=8):
+    """
+    Détection d'anomalies sur toute la grille du cube TEC pour la période [debut, fin].
+
+    Les `fenetre` jours qui précèdent `debut` sont lus en plus pour que la
+    ligne de base soit disponible dès le premier jour. La grille est
+    traitée par bandes de `lignes_par_lot` latitudes pour borner la mémoire.
+
+    Returns:
+        dict: {"temps" (n,), "latitudes", "longitudes",
+               "indice" float32 (n, n_lat, n_lon), "anomalie" bool (n, n_lat, n_lon),
+               "nb_anomalies" int (n_lat, n_lon)}
+    """
+    debut = np.datetime64(debut, "s")
+    fin = np.datetime64(fin, "s")
+    debut_base = (debut.astype("datetime64[D]") - np.timedelta64(fenetre, "D")).astype("datetime64[s]")
+
+    lats = cube["latitudes"]
+    temps, _ = serie_grille(cube, debut_base, fin, lignes=slice(0, 1))
+    garder = temps >= debut
+    if not garder.any():
+        raise ValueError("Aucune carte TEC sur la période demandée.")
+    n = int(garder.sum())
+
+    indice = np.full((n, len(lats), len(cube["longitudes"])), np.nan, dtype=np.float32)
+    anomalie = np.zeros(indice.shape, dtype=bool)
+    for i in range(0, len(lats), lignes_par_lot):
+        _, bande = serie_grille(cube, debut_base, fin, lignes=slice(i, i + lignes_par_lot))
+        resultat = ligne_de_base(temps, bande, fenetre, methode, k)
+        indice[:, i:i + lignes_par_lot] = resultat["indice"][garder]
+        anomalie[:, i:i + lignes_par_lot] = resultat["anomalie"][garder]
+
+    return {
+        "temps": temps[garder],
+        "latitudes": lats,
+        "longitudes": cube["longitudes"],
+        "indice": indice,
+        "anomalie": anomalie,
+        "nb_anomalies": anomalie.sum(axis=0),
+    }
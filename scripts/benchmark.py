@@ -0,0 +1,321 @@
+"""
+Mesures de performance reproductibles des chemins critiques (parsing, extraction, rendu).
+
+Les données sont synthétiques (scripts.synthetique), générées hors ligne
+dans un dossier temporaire, et les caches sont isolés : deux exécutions
+avec les mêmes paramètres mesurent le même travail.
+
+Exemple :
+    python -m scripts.benchmark --jours 30 --sortie bench.json
+    python -m scripts.benchmark --jours 30 --reference bench.json --tolerance 0.2
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+
+REPETITIONS = 3
+TOLERANCE = 0.2
+
+
+def mesurer(fonction, repetitions=REPETITIONS, preparation=None):
+    """
+    Temps (meilleur et médian de `repetitions` exécutions) et pic mémoire Python/NumPy de `fonction`.
+
+    Le pic est mesuré par tracemalloc lors d'une exécution séparée, pour ne
+    pas fausser les temps. `preparation`, si fourni, est appelée avant
+    chaque exécution (hors chronométrage), ex. pour vider un cache.
+
+    Returns:
+        dict: {"secondes", "secondes_mediane", "pic_memoire_mo", "resultat"}
+    """
+    durees = []
+    resultat = None
+    for _ in range(repetitions):
+        if preparation is not None:
+            preparation()
+        gc.collect()
+        debut = time.perf_counter()
+        resultat = fonction()
+        durees.append(time.perf_counter() - debut)
+
+    if preparation is not None:
+        preparation()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fonction()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "secondes": min(durees),
+        "secondes_mediane": float(np.median(durees)),
+        "pic_memoire_mo": pic / 1e6,
+        "resultat": resultat,
+    }
+
+
+def _debit(mesure, quantite, unite):
+    resultat = {k: v for k, v in mesure.items() if k != "resultat"}
+    resultat["debit"] = quantite / mesure["secondes"] if mesure["secondes"] > 0 else None
+    resultat["unite"] = unite
+    return resultat
+
+
+def bench_parsing(fichiers):
+    """Débit du parseur IONEX complet (cartes TEC/s), sans cache."""
+    from scripts.ionex_parser import lire_ionex
+
+    def parser():
+        return sum(len(lire_ionex(f)["epoques"]) for f in fichiers)
+
+    mesure = mesurer(parser)
+    octets = sum(os.path.getsize(f) for f in fichiers)
+    resultat = _debit(mesure, mesure["resultat"], "cartes/s")
+    resultat["mo_par_seconde"] = octets / 1e6 / mesure["secondes"]
+    return resultat
+
+
+def bench_cube(dossier_ionex, dossier_travail):
+    """Construction complète du cube TEC (parsing + écriture des memmaps), en jours/s."""
+    from scripts.tec_cube import construire_cube
+
+    dossier_cube = os.path.join(dossier_travail, "cube")
+    dossier_cache = os.path.join(dossier_travail, "cache_cube")
+
+    def vider():
+        shutil.rmtree(dossier_cube, ignore_errors=True)
+        shutil.rmtree(dossier_cache, ignore_errors=True)
+
+    def construire():
+        return construire_cube(dossier_ionex, dossier_cube=dossier_cube, dossier_cache=dossier_cache)
+
+    mesure = mesurer(construire, preparation=vider)
+    n_jours = len(os.listdir(dossier_ionex))
+    return _debit(mesure, n_jours, "jours/s")
+
+
+def bench_extraction(cube, n_sites, n_points, graine=0):
+    """Extraction de séries (zones 3x3 de n_sites) et interpolation à n_points points sur toute la période."""
+    from scripts.tec_cube import serie_zones
+    from scripts.interpolation import interpoler_cube
+
+    rng = np.random.default_rng(graine)
+    lats = rng.uniform(-85.0, 85.0, n_sites)
+    lons = rng.uniform(-180.0, 180.0, n_sites)
+    zones = mesurer(lambda: serie_zones(cube, lats, lons))
+    n_valeurs = len(zones["resultat"][0]) * n_sites
+
+    t0, t1 = cube["temps"][0].astype(np.int64), cube["temps"][-1].astype(np.int64)
+    temps = np.sort(rng.integers(t0, t1, n_points)).astype("datetime64[s]")
+    p_lats = rng.uniform(-87.5, 87.5, n_points)
+    p_lons = rng.uniform(-180.0, 180.0, n_points)
+    interpolation = mesurer(lambda: interpoler_cube(cube, temps, p_lats, p_lons))
+
+    return {
+        "serie_zones": _debit(zones, n_valeurs, "valeurs/s"),
+        "interpolation_points": _debit(interpolation, n_points, "points/s"),
+    }
+
+
+def bench_carte_heure(fichier, dossier_cache):
+    """Lecture d'une heure d'un fichier : index des blocs contre parsing complet, en cartes/s."""
+    from scripts.index_ionex import lire_cartes_heure
+    from scripts.ionex_parser import lire_ionex
+
+    lire_cartes_heure(fichier, 12, dossier_cache=dossier_cache)  # construit et enregistre l'index
+    index = mesurer(lambda: lire_cartes_heure(fichier, 12, dossier_cache=dossier_cache)["cartes"])
+    complet = mesurer(lambda: lire_ionex(fichier)["tec"])
+    return {
+        "lecture_indexee": _debit(index, len(index["resultat"]), "cartes/s"),
+        "lecture_complete": _debit(complet, len(complet["resultat"]), "cartes/s"),
+    }
+
+
+def bench_madrigal(fichier_ascii, fichier_hdf5):
+    """Lecture des mesures Madrigal (ASCII et HDF5) et binning horaire sur grille, en mesures/s."""
+    from scripts.madrigal_grille import _mesures, binner_tec
+
+    ascii_ = mesurer(lambda: _mesures(fichier_ascii))
+    hdf5 = mesurer(lambda: _mesures(fichier_hdf5))
+    mesures = ascii_["resultat"]
+    binning = mesurer(lambda: binner_tec(*mesures))
+    n = len(mesures[0])
+    return {
+        "lecture_ascii": _debit(ascii_, n, "mesures/s"),
+        "lecture_hdf5": _debit(hdf5, n, "mesures/s"),
+        "binning": _debit(binning, n, "mesures/s"),
+    }
+
+
+def bench_rendu(fichier, dossier_cache):
+    """
+    Latence de rendu d'une carte globale (figure + PNG) et encodage GIF d'une journée.
+
+    Le fond de carte, statique, est rendu dans `dossier_cache` au premier
+    passage puis relu (le meilleur temps n'en dépend pas).
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from scripts.rendu import figure_en_png
+    from scripts.plot_ionex_map import afficher_carte_TEC_fichier
+    from scripts.ionex_parser import lire_ionex
+    from scripts.video import generer_animation_tec
+
+    # Jeu chargé une fois : seuls la figure et l'encodage sont mesurés, sans passer par les caches IONEX
+    ds = lire_ionex(fichier)
+    carte = mesurer(lambda: len(figure_en_png(afficher_carte_TEC_fichier(ds, 12, 23.0, 96.0,
+                                                                          dossier_cache=dossier_cache))))
+
+    def animer():
+        chemin = generer_animation_tec(ds, 23.0, 96.0, "gif", dossier_cache=dossier_cache)
+        taille = os.path.getsize(chemin)
+        os.remove(chemin)
+        return taille
+
+    gif = mesurer(animer, repetitions=1)
+    resultat = {"carte_globale": _debit(carte, 1, "cartes/s"),
+                "animation_gif": _debit(gif, len(ds["epoques"]), "images/s")}
+    resultat["animation_gif"]["octets"] = gif["resultat"]
+    return resultat
+
+
+def executer(n_jours=7, n_sites=50, n_points=1_000_000, n_mesures=500_000, dossier=None, rendu=True):
+    """
+    Génère les données synthétiques puis exécute toutes les mesures.
+
+    Args:
+        n_jours (int): fichiers IONEX journaliers générés (parsing, cube, extraction).
+        n_sites (int): sites extraits par serie_zones.
+        n_points (int): points (temps, lat, lon) interpolés.
+        n_mesures (int): mesures par fichier Madrigal synthétique.
+        dossier (str | None): dossier de travail (temporaire et supprimé par défaut).
+        rendu (bool): inclut le rendu de carte et l'encodage GIF (Cartopy requis).
+
+    Returns:
+        dict: {"meta": {...}, "resultats": {nom: mesure}} ; une mesure impossible
+        dans l'environnement est remplacée par {"erreur": message}.
+    """
+    temporaire = dossier is None
+    dossier = dossier or tempfile.mkdtemp(prefix="iono_bench_")
+    # Caches isolés, passés explicitement : chaque exécution part d'un état connu
+    dossier_cache = os.path.join(dossier, "cache")
+
+    from scripts.synthetique import generer_archive_ionex, ecrire_madrigal_ascii, ecrire_madrigal_hdf5
+    from scripts.tec_cube import construire_cube
+
+    try:
+        dossier_ionex = os.path.join(dossier, "ionex")
+        fichiers = generer_archive_ionex(dossier_ionex, "2023-01-01", n_jours)
+        ascii_ = ecrire_madrigal_ascii(os.path.join(dossier, "madrigal.txt"), "2023-01-01", n_mesures)
+        hdf5 = ecrire_madrigal_hdf5(os.path.join(dossier, "madrigal.hdf5"), "2023-01-01", n_mesures)
+
+        resultats = {}
+
+        def lancer(nom, fonction, *args):
+            try:
+                mesure = fonction(*args)
+            except Exception as e:
+                resultats[nom] = {"erreur": f"{type(e).__name__}: {e}"}
+                print(f"❌ {nom} : {e}", file=sys.stderr)
+                return
+            if "secondes" in mesure:
+                resultats[nom] = mesure
+            else:
+                resultats.update({f"{nom}.{cle}": valeur for cle, valeur in mesure.items()})
+            print(f"✅ {nom}", file=sys.stderr)
+
+        lancer("parsing", bench_parsing, fichiers)
+        lancer("cube", bench_cube, dossier_ionex, dossier)
+        cube = construire_cube(dossier_ionex, dossier_cube=os.path.join(dossier, "cube"),
+                               dossier_cache=os.path.join(dossier, "cache_cube"))
+        lancer("extraction", bench_extraction, cube, n_sites, n_points)
+        lancer("carte_heure", bench_carte_heure, fichiers[0], dossier_cache)
+        lancer("madrigal", bench_madrigal, ascii_, hdf5)
+        if rendu:
+            lancer("rendu", bench_rendu, fichiers[0], dossier_cache)
+    finally:
+        if temporaire:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "plateforme": platform.platform(),
+            "processeurs": os.cpu_count(),
+            "parametres": {"jours": n_jours, "sites": n_sites, "points": n_points, "mesures_madrigal": n_mesures},
+        },
+        "resultats": resultats,
+    }
+
+
+def comparer(resultats, reference, tolerance=TOLERANCE):
+    """
+    Compare deux exécutions mesure par mesure (meilleur temps).
+
+    Returns:
+        list[dict]: {"mesure", "reference", "actuel", "rapport", "regression"} ; une
+        régression est un temps supérieur de plus de `tolerance` (20 % par défaut).
+    """
+    lignes = []
+    for nom, actuel in resultats["resultats"].items():
+        ancien = reference.get("resultats", {}).get(nom)
+        if not ancien or "secondes" not in ancien or "secondes" not in actuel:
+            continue
+        rapport = actuel["secondes"] / ancien["secondes"] if ancien["secondes"] > 0 else float("inf")
+        lignes.append({"mesure": nom, "reference": ancien["secondes"], "actuel": actuel["secondes"],
+                       "rapport": rapport, "regression": rapport > 1 + tolerance})
+    return lignes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure les performances sur des données synthétiques.")
+    parser.add_argument("--jours", type=int, default=7, help="fichiers IONEX journaliers générés")
+    parser.add_argument("--sites", type=int, default=50, help="sites extraits (zones 3x3)")
+    parser.add_argument("--points", type=int, default=1_000_000, help="points interpolés")
+    parser.add_argument("--mesures", type=int, default=500_000, help="mesures par fichier Madrigal")
+    parser.add_argument("--sans-rendu", action="store_true", help="ignorer le rendu de carte et le GIF")
+    parser.add_argument("--dossier", help="dossier de travail conservé (temporaire par défaut)")
+    parser.add_argument("--sortie", help="fichier JSON des résultats (sortie standard par défaut)")
+    parser.add_argument("--reference", help="résultats JSON d'une exécution de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="ralentissement toléré avant de signaler une régression (0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    resultats = executer(args.jours, args.sites, args.points, args.mesures, args.dossier,
+                         rendu=not args.sans_rendu)
+    texte = json.dumps(resultats, indent=2, ensure_ascii=False)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            f.write(texte)
+    else:
+        print(texte)
+
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        if reference.get("meta", {}).get("parametres") != resultats["meta"]["parametres"]:
+            print("⚠️ Paramètres différents de la référence : comparaison indicative.", file=sys.stderr)
+        regressions = 0
+        for ligne in comparer(resultats, reference, args.tolerance):
+            symbole = "❌" if ligne["regression"] else "✅"
+            regressions += ligne["regression"]
+            print(f"{symbole} {ligne['mesure']:<40} {ligne['reference']:.4f} s → {ligne['actuel']:.4f} s "
+                  f"(x{ligne['rapport']:.2f})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
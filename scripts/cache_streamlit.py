@@ -0,0 +1,207 @@
+import os
+import shutil
+import atexit
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import streamlit as st
+from scripts.ionex_cache import charger_ionex, cle_contenu
+from scripts.decompression import decompresseur_pour, TAILLE_BLOC
+from scripts.profilage import etape
+from scripts.rendu import figure_en_png
+
+# Bornes des caches partagés entre sessions (éviction LRU au-delà)
+MAX_JEUX = 16
+# Volume total des tableaux des jeux gardés en mémoire (le dernier jeu chargé est toujours gardé)
+MAX_OCTETS_JEUX = 512 * 1024 * 1024
+MAX_FIGURES = 64
+MAX_ANIMATIONS = 8
+# Au-delà de cette taille, un fichier décompressé est déversé sur disque
+SEUIL_MEMOIRE = 64 * 1024 * 1024
+
+# Jeux IONEX parsés, du moins au plus récemment utilisé : {cle: (jeu, octets)}
+_JEUX = OrderedDict()
+_VERROU_JEUX = threading.Lock()
+
+
+def empreinte_upload(fichier):
+    """Empreinte SHA-256 du contenu d'un fichier déposé (UploadedFile), hachée sans copie."""
+    return cle_contenu(fichier.getbuffer())
+
+
+def dossier_session():
+    """Dossier temporaire propre à la session Streamlit courante (supprimé à l'arrêt du serveur)."""
+    if "dossier_temp" not in st.session_state:
+        dossier = tempfile.mkdtemp(prefix="iono_session_")
+        atexit.register(shutil.rmtree, dossier, ignore_errors=True)
+        st.session_state["dossier_temp"] = dossier
+    return st.session_state["dossier_temp"]
+
+
+@etape("decompression.memoire")
+def decompresser_en_memoire(contenu, nom, dossier=None, seuil=SEUIL_MEMOIRE):
+    """
+    Décompresse un contenu .gz/.Z vers un fichier temporaire « spoolé ».
+
+    Le résultat reste en mémoire jusqu'à `seuil` octets puis bascule sur
+    disque dans `dossier` (dossier de session). L'objet renvoyé est
+    seekable, positionné au début, et doit être fermé par l'appelant.
+    """
+    decompresseur = decompresseur_pour(nom)
+    sortie = tempfile.SpooledTemporaryFile(max_size=seuil, dir=dossier)
+    vue = memoryview(contenu)
+    for debut in range(0, len(vue), TAILLE_BLOC):
+        sortie.write(decompresseur.decompress(vue[debut:debut + TAILLE_BLOC]))
+    sortie.write(decompresseur.flush())
+    sortie.seek(0)
+    return sortie
+
+
+def taille_jeu(ds):
+    """Volume en octets des tableaux d'un jeu IONEX."""
+    return sum(v.nbytes for v in ds.values() if isinstance(v, np.ndarray))
+
+
+def jeu_ionex(cle, _contenu, nom=None):
+    """
+    Jeu IONEX parsé, partagé entre reruns et sessions.
+
+    La clé est l'empreinte du contenu : `_contenu` (octets ou memoryview du
+    fichier déposé) n'est lu qu'au premier appel. Les tableaux renvoyés sont
+    les memmaps en lecture seule du cache disque.
+
+    Le cache est borné à MAX_JEUX jeux et à MAX_OCTETS_JEUX octets de
+    tableaux : les jeux les moins récemment utilisés sont évincés au-delà.
+    """
+    with _VERROU_JEUX:
+        if cle in _JEUX:
+            _JEUX.move_to_end(cle)
+            return _JEUX[cle][0]
+
+    ds = charger_ionex(_contenu, nom=nom)
+    with _VERROU_JEUX:
+        _JEUX[cle] = (ds, taille_jeu(ds))
+        _JEUX.move_to_end(cle)
+        total = sum(octets for _, octets in _JEUX.values())
+        while len(_JEUX) > 1 and (len(_JEUX) > MAX_JEUX or total > MAX_OCTETS_JEUX):
+            _, (_, octets) = _JEUX.popitem(last=False)
+            total -= octets
+    return ds
+
+
+@st.cache_data(max_entries=MAX_FIGURES, show_spinner=False)
+def carte_globale_png(cle, _contenu, heure, lat_epi, lon_epi, nom=None):
+    """PNG de la carte TEC globale d'une heure, pour un contenu et des paramètres donnés."""
+    from scripts.plot_ionex_map import afficher_carte_TEC_fichier
+    fig = afficher_carte_TEC_fichier(jeu_ionex(cle, _contenu, nom), heure_utc=heure,
+                                     epicenter_lat=lat_epi, epicenter_lon=lon_epi)
+    return figure_en_png(fig)
+
+
+def signature_fichier(chemin):
+    """(taille, date de modification) d'un fichier local : change avec son contenu."""
+    st_fichier = os.stat(chemin)
+    return st_fichier.st_size, st_fichier.st_mtime_ns
+
+
+@st.cache_data(max_entries=MAX_FIGURES, show_spinner=False)
+def carte_heure_fichier_png(chemin, signature, heure, lat_epi, lon_epi):
+    """
+    PNG de la carte TEC d'une heure d'un fichier IONEX local.
+
+    Seules les cartes de l'heure sont lues et décodées, grâce à l'index
+    persistant des cartes. `signature` (voir signature_fichier) renouvelle
+    l'image quand le fichier change.
+    """
+    from scripts.plot_ionex_map import afficher_carte_TEC_fichier
+    fig = afficher_carte_TEC_fichier(chemin, heure_utc=heure, epicenter_lat=lat_epi, epicenter_lon=lon_epi)
+    return figure_en_png(fig)
+
+
+@st.cache_data(max_entries=MAX_FIGURES, show_spinner=False)
+def tec_point_fichier(chemin, signature, heure, lat, lon):
+    """
+    TEC au nœud le plus proche d'un point, à la première époque d'une heure, lu via l'index des cartes.
+
+    Returns:
+        tuple | None: (époque, TEC en TECU), None si aucune carte à cette heure.
+    """
+    from scripts.index_ionex import charger_index_cartes, valeur_point
+    index = charger_index_cartes(chemin)
+    heures = index["epoques"].astype("datetime64[h]").astype(np.int64) % 24
+    epoques = index["epoques"][(index["types"] == "TEC") & (heures == heure)]
+    if len(epoques) == 0:
+        return None
+    return epoques[0], valeur_point(chemin, lat, lon, epoques[0])
+
+
+@st.cache_data(max_entries=MAX_FIGURES, show_spinner=False)
+def mosaique_png(cle, _contenu, lat_epi, lon_epi, nom=None):
+    """PNG de la mosaïque des cartes TEC de toutes les heures."""
+    from scripts.plot_ionex_map import afficher_cartes_TEC_toutes_heures
+    fig = afficher_cartes_TEC_toutes_heures(jeu_ionex(cle, _contenu, nom), lat_epi, lon_epi)
+    return figure_en_png(fig)
+
+
+@st.cache_data(max_entries=MAX_FIGURES, show_spinner=False)
+def carte_statistique_png(cle, _contenu, statistique, lat_epi, lon_epi, nom=None):
+    """PNG de la carte journalière min / max / moyenne."""
+    from scripts.plot_ionex_map import afficher_carte_statistique
+    fig = afficher_carte_statistique(jeu_ionex(cle, _contenu, nom), statistique, lat_epi, lon_epi)
+    return figure_en_png(fig)
+
+
+@st.cache_data(max_entries=MAX_ANIMATIONS, show_spinner=False)
+def images_horaires(cle, _contenu, lat_epi, lon_epi, nom=None):
+    """Images PNG pré-rendues de chaque heure (curseur horaire), calculées en une fois."""
+    from scripts.plot_ionex_map import images_par_heure
+    return images_par_heure(jeu_ionex(cle, _contenu, nom), lat_epi, lon_epi)
+
+
+@st.cache_data(max_entries=MAX_ANIMATIONS, show_spinner=False)
+def animation_octets(cle, _contenu, seisme_lat, seisme_lon, format_sortie, nom=None):
+    """Octets de l'animation TEC d'un fichier (GIF ou MP4)."""
+    from scripts.video import generer_animation_tec
+    chemin = generer_animation_tec(jeu_ionex(cle, _contenu, nom), seisme_lat, seisme_lon, format_sortie)
+    try:
+        with open(chemin, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(chemin)
+
+
+@st.cache_data(max_entries=MAX_FIGURES, show_spinner=False)
+def carte_madrigal_png(cle, nom, _contenu, heure, en_grille=False, statistique="moyenne", resolution=1.0,
+                       _dossier_temp=None):
+    """
+    PNG d'une carte TEC Madrigal (ASCII, .gz ou HDF5) pour un contenu et des paramètres donnés.
+
+    Le contenu est lu directement en mémoire. Seul un HDF5 compressé, qui
+    exige un accès aléatoire, est d'abord décompressé : en mémoire s'il est
+    petit, sinon dans le dossier temporaire de la session.
+    """
+    from scripts.madrigal_carte import lire_tec_ascii, lire_tec_hdf5_carte, lire_tec_grille_carte
+
+    nom = nom.lower()
+    est_hdf5 = nom.endswith((".hdf5", ".h5", ".hdf5.gz", ".h5.gz"))
+
+    source, a_fermer = _contenu, None
+    if est_hdf5 and nom.endswith(".gz"):
+        source = a_fermer = decompresser_en_memoire(_contenu, nom, _dossier_temp)
+        nom = nom[:-3]
+    try:
+        if en_grille:
+            # Binning de toutes les heures une seule fois, puis lecture du cache
+            fig = lire_tec_grille_carte(source, heure, statistique, resolution, nom=nom)
+        elif est_hdf5:
+            # Lecture ciblée : seules les lignes et colonnes de l'heure choisie
+            fig = lire_tec_hdf5_carte(source, heure)
+        else:
+            # Les .gz sont décompressés en flux pendant la lecture
+            fig = lire_tec_ascii(source, heure, nom=nom)
+    finally:
+        if a_fermer is not None:
+            a_fermer.close()
+
+    return figure_en_png(fig)
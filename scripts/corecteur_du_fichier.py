@@ -1,29 +1,218 @@
 import os
 import re
+import shutil
+import tempfile
+from scripts.parallele import executer_par_fichier
+from scripts.profilage import etape
 
-folder = r"D:\python\data"
-output_folder = r"D:\python\data\corrected"
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
+EXTENSIONS_IONEX = (".inx", ".i", ".ionex")
 
-ionex_files = [f for f in os.listdir(folder) if f.lower().endswith((".inx", ".i", ".ionex"))]
+ETIQUETTE_LAT = b"LAT/LON1/LON2/DLON/H"
+# L'étiquette occupe les colonnes 61 à 80 ; les 5 valeurs sont avant (2X,5F6.1 en IONEX)
+COL_ETIQUETTE = 60
+N_VALEURS = 5
+TAILLE_BLOC = 1024 * 1024
+_NOMBRE = re.compile(rb"[-+]?\d*\.\d+|[-+]?\d+")
 
-for filename in ionex_files:
-    filepath = os.path.join(folder, filename)
-    output_filepath = os.path.join(output_folder, filename)
+def _ligne_valide(bloc, debut, idx_etiquette):
+    # Étiquette à sa colonne et 5 valeurs séparées par des blancs : rien à corriger
+    return idx_etiquette - debut == COL_ETIQUETTE and len(bloc[debut:idx_etiquette].split()) == N_VALEURS
+
+def _lignes_a_corriger(bloc):
+    """Positions (début, fin) des lignes LAT/LON1/LON2/DLON/H invalides d'un bloc de lignes complètes."""
+    idx = bloc.find(ETIQUETTE_LAT)
+    while idx != -1:
+        debut = bloc.rfind(b"\n", 0, idx) + 1
+        fin = bloc.find(b"\n", idx)
+        fin = len(bloc) if fin == -1 else fin + 1
+        if not _ligne_valide(bloc, debut, idx):
+            yield debut, fin
+        idx = bloc.find(ETIQUETTE_LAT, fin)
+
+def corriger_ligne_lat(ligne):
+    """
+    Réécrit une ligne LAT/LON1/LON2/DLON/H en colonnes fixes.
+
+    Les valeurs sont lues aux positions du format IONEX (2X,5F6.1), où des
+    champs comme '87.5-180.0' sont collés, ou à défaut dans le texte (ligne
+    déjà décalée par une ancienne correction). Elles sont réécrites en
+    2X,5(F6.1,1X) : toujours séparées par un blanc, l'étiquette restant en
+    colonne 61.
+    """
+    corps = ligne.rstrip(b"\r\n")
+    fin_ligne = ligne[len(corps):]
+    donnees = corps[:corps.find(ETIQUETTE_LAT)]
+    try:
+        valeurs = [float(donnees[2 + 6 * k:8 + 6 * k]) for k in range(N_VALEURS)]
+    except ValueError:
+        valeurs = [float(v) for v in _NOMBRE.findall(donnees)]
+    if len(valeurs) != N_VALEURS:
+        raise ValueError(f"Ligne LAT/LON1/LON2/DLON/H illisible : {corps.decode('latin-1').strip()}")
+    champs = b"  " + b" ".join(b"%6.1f" % v for v in valeurs)
+    return champs.ljust(COL_ETIQUETTE) + ETIQUETTE_LAT + fin_ligne
+
+def _copier_debut(filepath, sortie, n_octets):
+    with open(filepath, "rb") as source:
+        while n_octets > 0:
+            bloc = source.read(min(TAILLE_BLOC, n_octets))
+            if not bloc:
+                break
+            sortie.write(bloc)
+            n_octets -= len(bloc)
+
+def _publier_valide(filepath, output_filepath):
+    # Fichier déjà valide : lien physique (aucun octet copié), copie si impossible
+    if os.path.exists(output_filepath):
+        if os.path.samefile(filepath, output_filepath):
+            return 0
+        os.remove(output_filepath)
+    try:
+        os.link(filepath, output_filepath)
+        return 0
+    except OSError:
+        shutil.copyfile(filepath, output_filepath)
+        return os.path.getsize(filepath)
+
+@etape("sortie.correction_ionex")
+def corriger_fichier_ionex(filepath, output_filepath=None, verifier_seulement=False):
+    """
+    Corrige les lignes LAT/LON1/LON2/DLON/H dont les champs sont collés
+    (ex. '87.5-180.0' devient '87.5 -180.0').
+
+    Le fichier est lu en flux, par blocs : seules les lignes d'étiquette
+    LAT/LON1/LON2/DLON/H sont examinées et réécrites par position. Tant
+    qu'aucune ligne n'est à corriger, rien n'est écrit ; un fichier déjà
+    valide n'est donc jamais recopié (lien physique vers la sortie si elle
+    est distincte). Sans `output_filepath`, ou s'il désigne le fichier
+    source, la correction se fait en place via un fichier temporaire.
+
+    lire_ionex() n'utilise pas ces lignes : la correction ne sert qu'aux
+    outils qui découpent l'en-tête sur les blancs. Les fichiers CODE
+    standard ('87.5-180.0') sont tous concernés ; avec
+    `verifier_seulement=True`, les lignes à corriger sont seulement
+    comptées et rien n'est écrit.
+
+    Returns:
+        dict: {"source", "sortie", "statut" ("corrige", "valide" ou, en
+               vérification, "a_corriger"), "lignes_corrigees", "octets_lus",
+               "octets_ecrits"}
+    """
+    output_filepath = output_filepath or filepath
+    en_place = os.path.exists(output_filepath) and os.path.samefile(filepath, output_filepath)
+    statistiques = {"source": filepath, "sortie": output_filepath, "statut": "valide",
+                    "lignes_corrigees": 0, "octets_lus": 0, "octets_ecrits": 0}
+
+    sortie = temporaire = None
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        corrected_lines = []
-        for line in lines:
-            if "LAT/LON1/LON2/DLON/H" in line:
-                # Remplacer les champs collés comme '87.5-180.0' par '87.5 -180.0'
-                line = re.sub(r'(\d+\.\d+)-(\d+\.\d+)', r'\1 -\2', line)
-            corrected_lines.append(line)
-        
-        with open(output_filepath, 'w', encoding='utf-8') as f:
-            f.writelines(corrected_lines)
-        print(f"✅ Fichier corrigé : {output_filepath}")
-    except Exception as e:
-        print(f"❌ Erreur lors de la correction de {filename} : {e}")
\ No newline at end of file
+        with open(filepath, "rb") as f:
+            reste, position = b"", 0
+            while True:
+                lu = f.read(TAILLE_BLOC)
+                statistiques["octets_lus"] += len(lu)
+                bloc = reste + lu
+                # Seules des lignes complètes sont examinées ; la dernière ligne partielle attend le bloc suivant
+                coupure = bloc.rfind(b"\n") + 1 if lu else len(bloc)
+                bloc, reste = bloc[:coupure], bloc[coupure:]
+
+                ecrit = 0
+                for debut, fin in _lignes_a_corriger(bloc):
+                    if verifier_seulement:
+                        statistiques["lignes_corrigees"] += 1
+                        continue
+                    if sortie is None:
+                        # Première correction : recopie de tout ce qui précède
+                        fd, temporaire = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_filepath)),
+                                                          suffix=".tmp")
+                        sortie = os.fdopen(fd, "wb")
+                        _copier_debut(filepath, sortie, position)
+                    sortie.write(bloc[ecrit:debut])
+                    sortie.write(corriger_ligne_lat(bloc[debut:fin]))
+                    statistiques["lignes_corrigees"] += 1
+                    ecrit = fin
+                if sortie is not None:
+                    sortie.write(bloc[ecrit:])
+                position += len(bloc)
+                if not lu:
+                    break
+    except BaseException:
+        if sortie is not None:
+            sortie.close()
+            os.remove(temporaire)
+        raise
+
+    if sortie is not None:
+        statistiques["octets_ecrits"] = sortie.tell()
+        sortie.close()
+        os.replace(temporaire, output_filepath)
+        statistiques["statut"] = "corrige"
+    elif verifier_seulement:
+        statistiques["statut"] = "a_corriger" if statistiques["lignes_corrigees"] else "valide"
+    elif not en_place:
+        statistiques["octets_ecrits"] = _publier_valide(filepath, output_filepath)
+    return statistiques
+
+def _corriger_vers_dossier(filepath, output_folder, verifier_seulement=False):
+    return corriger_fichier_ionex(filepath, os.path.join(output_folder, os.path.basename(filepath)),
+                                  verifier_seulement=verifier_seulement)
+
+def corriger_dossier_ionex(folder, output_folder=None, extensions=EXTENSIONS_IONEX, n_workers=None, rappel=None,
+                           verifier_seulement=False):
+    """
+    Corrige tous les fichiers IONEX d'un dossier, éventuellement en parallèle.
+
+    Args:
+        folder (str): dossier source.
+        output_folder (str | None): dossier de sortie des fichiers corrigés ;
+            None ou le dossier source : correction en place.
+        extensions (tuple): extensions des fichiers à traiter.
+        n_workers (int | None): nombre de processus (None ou 1 : séquentiel, 0 : tous les cœurs).
+        rappel (callable | None): appelé après chaque fichier avec
+            (fichiers traités, nombre total, statistiques du fichier ou
+            {"source", "erreur"}), pour suivre la progression.
+        verifier_seulement (bool): compte les lignes à corriger sans rien
+            écrire ni créer le dossier de sortie.
+
+    Returns:
+        tuple: (corriges, echecs) — liste des (fichier source, statistiques)
+        et liste des (fichier source, message d'erreur), dans l'ordre des noms.
+    """
+    output_folder = output_folder or folder
+    if not verifier_seulement:
+        os.makedirs(output_folder, exist_ok=True)
+    ionex_files = [
+        os.path.join(folder, f) for f in sorted(os.listdir(folder))
+        if f.lower().endswith(extensions) and os.path.isfile(os.path.join(folder, f))
+    ]
+
+    termines = [0]
+
+    def suivre(fichier, resultat, erreur):
+        termines[0] += 1
+        rappel(termines[0], len(ionex_files), resultat or {"source": fichier, "erreur": erreur})
+
+    return executer_par_fichier(_corriger_vers_dossier, ionex_files, output_folder, verifier_seulement,
+                                n_workers=n_workers, rappel=suivre if rappel is not None else None)
+
+def resumer_corrections(corriges):
+    """Totaux d'une correction de dossier : fichiers corrigés / valides / à corriger, lignes et octets."""
+    resume = {"corriges": 0, "valides": 0, "a_corriger": 0, "lignes_corrigees": 0, "octets_lus": 0,
+              "octets_ecrits": 0}
+    compteurs = {"corrige": "corriges", "valide": "valides", "a_corriger": "a_corriger"}
+    for _, statistiques in corriges:
+        resume[compteurs[statistiques["statut"]]] += 1
+        for cle in ("lignes_corrigees", "octets_lus", "octets_ecrits"):
+            resume[cle] += statistiques[cle]
+    return resume
+
+if __name__ == "__main__":
+    folder = r"D:\python\data"
+    output_folder = r"D:\python\data\corrected"
+
+    corriges, echecs = corriger_dossier_ionex(folder, output_folder)
+    for _, statistiques in corriges:
+        if statistiques["statut"] == "corrige":
+            print(f"✅ Fichier corrigé : {statistiques['sortie']} ({statistiques['lignes_corrigees']} lignes)")
+        else:
+            print(f"⏩ Déjà valide : {statistiques['sortie']}")
+    for filepath, message in echecs:
+        print(f"❌ Erreur lors de la correction de {os.path.basename(filepath)} : {message}")
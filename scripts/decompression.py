@@ -0,0 +1,270 @@
+import io
+import os
+import zlib
+import zipfile
+from scripts.profilage import etape
+
+TAILLE_BLOC = 1024 * 1024
+
+
+class ErreurDecompression(ValueError):
+    pass
+
+
+class DecompresseurLZW:
+    """
+    Décodeur incrémental du format Unix compress (.Z, LZW).
+
+    S'utilise comme zlib.decompressobj : decompress(octets) renvoie la
+    portion décodée disponible, flush() termine le flux. Le décodage suit
+    ncompress : codes de 9 à `maxbits` bits (ordre LSB), code 256 de
+    réinitialisation en mode bloc, et alignement des codes par groupes de 8
+    à chaque changement de largeur.
+    """
+
+    def __init__(self):
+        self._entete = b""
+        self._pret = False
+        self._tampon = b""      # octets reçus non encore consommés
+        self._pos = 0
+        self._acc = 0           # accumulateur de bits (LSB en premier)
+        self._n_acc = 0         # nombre de bits disponibles dans l'accumulateur
+        self._a_sauter = 0      # bits de bourrage restant à ignorer
+        self._n_codes = 0       # codes lus depuis le dernier changement de largeur
+
+    def _initialiser(self, drapeaux):
+        self._maxbits = drapeaux & 0x1F
+        self._mode_bloc = bool(drapeaux & 0x80)
+        if self._maxbits < 9 or self._maxbits > 16:
+            raise ErreurDecompression(f"Largeur de code LZW non prise en charge : {self._maxbits}")
+        self._maxmaxcode = 1 << self._maxbits
+        self._reinitialiser_table()
+        self._ancien = None
+        self._pret = True
+
+    def _reinitialiser_table(self):
+        self._table = [bytes((i,)) for i in range(256)]
+        if self._mode_bloc:
+            self._table.append(b"")  # code 256 réservé à CLEAR
+        self._libre = len(self._table)
+        self._n_bits = 9
+        self._maxcode = (1 << 9) - 1
+
+    def _aligner(self):
+        """Ignore les codes de bourrage jusqu'à la fin du groupe de 8 codes courant."""
+        reste = (-self._n_codes) % 8
+        self._a_sauter += reste * self._n_bits
+        self._n_codes = 0
+
+    def decompress(self, donnees):
+        if not self._pret:
+            self._entete += bytes(donnees)
+            if len(self._entete) < 3:
+                return b""
+            if self._entete[:2] != b"\x1f\x9d":
+                raise ErreurDecompression("Signature .Z (1F 9D) absente.")
+            self._initialiser(self._entete[2])
+            donnees, self._entete = self._entete[3:], b""
+
+        tampon = self._tampon[self._pos:] + bytes(donnees)
+        pos, fin = 0, len(tampon)
+        acc, n_acc = self._acc, self._n_acc
+
+        sortie = bytearray()
+        table = self._table
+        while True:
+            if self._a_sauter:
+                # Bits de bourrage : on saute d'abord les octets entiers
+                if n_acc >= self._a_sauter:
+                    acc >>= self._a_sauter
+                    n_acc -= self._a_sauter
+                    self._a_sauter = 0
+                else:
+                    self._a_sauter -= n_acc
+                    acc, n_acc = 0, 0
+                    octets = min(self._a_sauter // 8, fin - pos)
+                    pos += octets
+                    self._a_sauter -= octets * 8
+                    if self._a_sauter and pos < fin:
+                        acc, n_acc = tampon[pos], 8
+                        pos += 1
+                        continue
+                    if self._a_sauter:
+                        break
+
+            if self._libre > self._maxcode and self._n_bits < self._maxbits:
+                self._aligner()
+                self._n_bits += 1
+                self._maxcode = self._maxmaxcode if self._n_bits == self._maxbits else (1 << self._n_bits) - 1
+                continue
+
+            n_bits = self._n_bits
+            while n_acc < n_bits and pos < fin:
+                acc |= tampon[pos] << n_acc
+                n_acc += 8
+                pos += 1
+            if n_acc < n_bits:
+                break
+            code = acc & ((1 << n_bits) - 1)
+            acc >>= n_bits
+            n_acc -= n_bits
+            self._n_codes += 1
+
+            if self._ancien is None:
+                if code >= 256:
+                    raise ErreurDecompression("Premier code LZW invalide.")
+                sortie += table[code]
+                self._ancien = code
+                continue
+
+            if code == 256 and self._mode_bloc:
+                self._aligner()
+                self._reinitialiser_table()
+                table = self._table
+                # Le code suivant repart d'une table vierge (ncompress y écrit une
+                # entrée 256 factice, jamais référencée : inutile de la reproduire)
+                self._ancien = None
+                continue
+
+            if code < len(table) and code != self._libre:
+                entree = table[code]
+            elif code == self._libre:
+                precedent = table[self._ancien]
+                entree = precedent + precedent[:1]
+            else:
+                raise ErreurDecompression("Flux LZW corrompu.")
+            sortie += entree
+
+            if self._libre < self._maxmaxcode:
+                nouvelle = table[self._ancien] + entree[:1]
+                if self._libre < len(table):
+                    table[self._libre] = nouvelle
+                else:
+                    table.append(nouvelle)
+                self._libre += 1
+            self._ancien = code
+
+        self._tampon, self._pos = tampon, pos
+        self._acc, self._n_acc = acc, n_acc
+        return bytes(sortie)
+
+    def flush(self):
+        # Les bits restants (moins d'un code) sont du bourrage de fin de flux
+        return b""
+
+
+class _SansCompression:
+    def decompress(self, donnees):
+        return bytes(donnees)
+
+    def flush(self):
+        return b""
+
+
+# Décompresseurs en flux par extension (en minuscules) ; chaque fabrique
+# renvoie un objet exposant decompress() / flush().
+DECOMPRESSEURS = {
+    ".z": DecompresseurLZW,
+    ".gz": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+}
+
+
+def extension_compression(nom):
+    """Extension de compression reconnue d'un nom de fichier (ex. '.z', '.gz'), ou None."""
+    _, ext = os.path.splitext(nom)
+    return ext.lower() if ext.lower() in DECOMPRESSEURS else None
+
+
+def nom_decompresse(nom):
+    """Nom du fichier une fois décompressé (extension de compression retirée)."""
+    return nom[:-len(extension_compression(nom))] if extension_compression(nom) else nom
+
+
+def decompresseur_pour(nom):
+    """Nouvel objet décompresseur adapté au nom de fichier (identité si non compressé)."""
+    ext = extension_compression(nom)
+    return DECOMPRESSEURS[ext]() if ext else _SansCompression()
+
+
+@etape("decompression.fichier")
+def decompresser_fichier(chemin, chemin_sortie=None, taille_bloc=TAILLE_BLOC):
+    """Décompresse un fichier .Z / .gz par blocs, sans le charger en mémoire."""
+    if chemin_sortie is None:
+        chemin_sortie = nom_decompresse(chemin)
+    decompresseur = decompresseur_pour(chemin)
+    with open(chemin, "rb") as f_in, open(chemin_sortie, "wb") as f_out:
+        for bloc in iter(lambda: f_in.read(taille_bloc), b""):
+            f_out.write(decompresseur.decompress(bloc))
+        f_out.write(decompresseur.flush())
+    return chemin_sortie
+
+
+class FluxDecompresse(io.RawIOBase):
+    """Flux binaire en lecture qui décompresse un flux brut au fil des lectures."""
+
+    def __init__(self, brut, decompresseur, taille_bloc=64 * 1024, a_fermer=()):
+        self._brut = brut
+        self._decompresseur = decompresseur
+        self._taille_bloc = taille_bloc
+        self._a_fermer = a_fermer
+        self._tampon = b""
+        self._pos = 0
+        self._fini = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._tampon) and not self._fini:
+            bloc = self._brut.read(self._taille_bloc)
+            if bloc:
+                self._tampon = self._decompresseur.decompress(bloc)
+            else:
+                self._tampon = self._decompresseur.flush()
+                self._fini = True
+            self._pos = 0
+        n = min(len(b), len(self._tampon) - self._pos)
+        b[:n] = self._tampon[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            for objet in self._a_fermer:
+                objet.close()
+        super().close()
+
+
+def ouvrir_flux(source, nom=None):
+    """
+    Ouvre une source (chemin, objet fichier binaire ou octets en mémoire) comme un flux décompressé.
+
+    Le format est déduit de `nom` (par défaut le chemin ou l'attribut
+    `name` de l'objet) : .gz et .Z sont décompressés au fil de la lecture,
+    .zip renvoie le premier membre de l'archive, tout autre nom est lu tel
+    quel. La mémoire utilisée reste bornée à un bloc, quelle que soit la
+    taille du fichier.
+
+    Returns:
+        io.BufferedReader: flux à fermer par l'appelant (utilisable avec `with`).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # Lecture directe du tampon (pas de copie pour bytes)
+        source = io.BytesIO(source)
+    est_chemin = isinstance(source, (str, os.PathLike))
+    if nom is None:
+        nom = os.fspath(source) if est_chemin else getattr(source, "name", "") or ""
+    brut = open(source, "rb") if est_chemin else source
+    # Seuls les objets ouverts ici sont fermés avec le flux
+    a_fermer = [brut] if est_chemin else []
+
+    if nom.lower().endswith(".zip"):
+        archive = zipfile.ZipFile(brut)
+        membres = [m for m in archive.infolist() if not m.is_dir()]
+        if not membres:
+            archive.close()
+            raise ErreurDecompression("Archive zip vide.")
+        brut = archive.open(membres[0])
+        a_fermer = [brut, archive] + a_fermer
+
+    return io.BufferedReader(FluxDecompresse(brut, decompresseur_pour(nom), a_fermer=a_fermer))
@@ -0,0 +1,110 @@
+import os
+import functools
+import tempfile
+import numpy as np
+from PIL import Image
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+from scripts.ionex_cache import DOSSIER_CACHE
+
+ETENDUE_GLOBALE = (-180.0, 180.0, -90.0, 90.0)
+LARGEUR_FOND = 2048
+RESOLUTION_TRAITS = "110m"
+
+# Habillage de chaque type de carte (couleurs et traits d'origine des renderers)
+STYLES_FOND = {
+    "carte_globale": {"terre": "lightgray", "ocean": "white", "frontieres": {"linestyle": ":"}},
+    "madrigal": {"terre": "lightgray", "ocean": "lightblue", "frontieres": {"linestyle": ":"}},
+    "animation": {"terre": "lightgray", "ocean": "lightblue", "frontieres": {"edgecolor": "gray"}},
+}
+
+# Ordre d'affichage : terre/océan sous les données TEC, traits au-dessus
+ZORDER_FOND = -1
+ZORDER_TRAITS = 1.5
+
+
+def _dessiner_couche(style, couche, largeur, resolution):
+    """Rend une couche (fond ou traits) en RGBA sur la carte globale PlateCarree."""
+    hauteur = largeur // 2
+    fig = Figure(figsize=(largeur / 100, hauteur / 100), dpi=100)
+    FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0)
+    ax = fig.add_axes([0, 0, 1, 1], projection=ccrs.PlateCarree())
+    ax.set_axis_off()
+    ax.set_global()
+
+    parametres = STYLES_FOND[style]
+    if couche == "fond":
+        ax.add_feature(cfeature.LAND, facecolor=parametres["terre"])
+        ax.add_feature(cfeature.OCEAN, facecolor=parametres["ocean"])
+    else:
+        ax.coastlines(resolution=resolution)
+        ax.add_feature(cfeature.BORDERS, **parametres["frontieres"])
+
+    fig.canvas.draw()
+    return np.array(fig.canvas.buffer_rgba())
+
+
+@functools.lru_cache(maxsize=16)
+def couches_fond(style="animation", largeur=LARGEUR_FOND, resolution=RESOLUTION_TRAITS,
+                 dossier_cache=DOSSIER_CACHE):
+    """
+    Couches raster (fond, traits) d'un fond de carte, rendues une seule fois.
+
+    Les entités Natural Earth ne sont lues et rastérisées qu'au premier
+    appel pour un (style, largeur, résolution) donné : le résultat est gardé
+    en mémoire pour le processus et sur disque (PNG) pour les suivants.
+
+    Returns:
+        tuple: (fond, traits), tableaux RGBA (largeur // 2, largeur, 4) en lecture seule.
+    """
+    if style not in STYLES_FOND:
+        raise ValueError(f"Style de fond de carte inconnu : {style}")
+
+    dossier = os.path.join(dossier_cache, "fonds_carte")
+    os.makedirs(dossier, exist_ok=True)
+
+    couches = []
+    for couche in ("fond", "traits"):
+        chemin = os.path.join(dossier, f"{style}_{couche}_{resolution}_{largeur}.png")
+        if os.path.exists(chemin):
+            rgba = np.asarray(Image.open(chemin).convert("RGBA"))
+        else:
+            rgba = _dessiner_couche(style, couche, largeur, resolution)
+            fd, tmp = tempfile.mkstemp(dir=dossier, suffix=".png")
+            with os.fdopen(fd, "wb") as f:
+                Image.fromarray(rgba).save(f, format="PNG")
+            os.replace(tmp, chemin)
+        rgba.flags.writeable = False
+        couches.append(rgba)
+    return tuple(couches)
+
+
+def largeur_adaptee(ax, pas=512):
+    """Largeur de couche proche de la largeur affichée des axes (arrondie au pas supérieur)."""
+    largeur = ax.get_window_extent().width
+    return max(pas, int(np.ceil(largeur / pas)) * pas)
+
+
+def ajouter_fond_de_carte(ax, style="animation", largeur=None, dossier_cache=DOSSIER_CACHE):
+    """
+    Pose le fond de carte en cache sur des axes PlateCarree globaux.
+
+    Terre et océan sont affichés sous les données, côtes et frontières
+    au-dessus, comme le faisaient les entités Cartopy d'origine. Par défaut
+    les couches sont à la taille d'affichage des axes, pour que leur
+    rééchantillonnage à chaque rendu reste négligeable.
+
+    Returns:
+        tuple: (image du fond, image des traits)
+    """
+    if largeur is None:
+        largeur = largeur_adaptee(ax)
+    fond, traits = couches_fond(style, largeur, dossier_cache=dossier_cache)
+    proj = ccrs.PlateCarree()
+    image_fond = ax.imshow(fond, extent=ETENDUE_GLOBALE, origin="upper", transform=proj, zorder=ZORDER_FOND)
+    image_traits = ax.imshow(traits, extent=ETENDUE_GLOBALE, origin="upper", transform=proj, zorder=ZORDER_TRAITS)
+    ax.set_global()
+    return image_fond, image_traits
@@ -1,87 +1,153 @@
-import os
 import numpy as np
-import datetime
-import re
 import pandas as pd
+from scripts.tec_cube import construire_cube, serie_zone, serie_zones
+from scripts.sortie_series import ecrire_series, derniere_date
 
 def find_nearest_index(array, value):
     array = np.asarray(array)
     idx = (np.abs(array - value)).argmin()
     return idx
 
-def generer_excel_TEC_par_heure(folder, target_lat, target_lon, output_excel_path):
-    results = []
-    ionex_files = [f for f in os.listdir(folder) if f.lower().endswith((".inx", ".i", ".ionex"))]
-
-    for filename in sorted(ionex_files):
-        filepath = os.path.join(folder, filename)
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-
-            tec_data = []
-            current_map = []
-            current_time = None
-            latitudes = np.arange(87.5, -87.6, -2.5)
-            longitudes = np.arange(-180, 180.1, 5.0)
-            tec_values = []
-            in_tec_values = False
-
-            for line in lines:
-                if "START OF TEC MAP" in line:
-                    current_map = []
-                    tec_values = []
-                    in_tec_values = False
-                elif "END OF TEC MAP" in line:
-                    if tec_values and in_tec_values:
-                        current_map.append(tec_values)
-                    if current_map:
-                        tec_data.append((current_time, np.array(current_map)))
-                    current_map = []
-                    tec_values = []
-                    in_tec_values = False
-                elif "EPOCH OF CURRENT MAP" in line:
-                    year, month, day, hour, minute, second = map(int, line.split()[:6])
-                    current_time = datetime.datetime(year, month, day, hour, minute, second)
-                elif "LAT/LON1/LON2/DLON/H" in line:
-                    if tec_values and in_tec_values:
-                        current_map.append(tec_values)
-                    tec_values = []
-                    in_tec_values = True
-                elif in_tec_values:
-                    parts = re.split(r'\s+', line.strip())
-                    try:
-                        values = [float(val) for val in parts if val]
-                        tec_values.extend(values)
-                    except ValueError:
-                        in_tec_values = False
-                        continue
-
-            if tec_values and in_tec_values:
-                current_map.append(tec_values)
-
-            lat_idx = find_nearest_index(latitudes, target_lat)
-            lon_idx = find_nearest_index(longitudes, target_lon)
-
-            for time, tec_map in tec_data:
-                try:
-                    zone_values = []
-                    for di in [-1, 0, 1]:
-                        for dj in [-1, 0, 1]:
-                            i = lat_idx + di
-                            j = lon_idx + dj
-                            if 0 <= i < tec_map.shape[0] and 0 <= j < tec_map.shape[1]:
-                                val = tec_map[i, j] * 0.1  # Conversion en TECU
-                                zone_values.append(val)
-                    if zone_values:
-                        tec_avg = np.mean(zone_values)
-                        results.append((time, tec_avg))
-                except:
-                    continue
-        except:
-            continue
-
-    df = pd.DataFrame(results, columns=["DateTime", f"TEC_zone_{int(target_lat)}N_{int(target_lon)}E"])
-    os.makedirs(os.path.dirname(output_excel_path), exist_ok=True)
-    df.to_excel(output_excel_path, index=False)
-    return output_excel_path
+def _debut_ajout(output_path, ajouter):
+    # En mode ajout, seules les époques postérieures au fichier existant sont extraites
+    if not ajouter:
+        return None
+    derniere = derniere_date(output_path)
+    return None if derniere is None else np.datetime64(derniere.to_datetime64(), "s") + np.timedelta64(1, "s")
+
+def _cube(folder, n_workers, echecs):
+    # Les fichiers ignorés (illisibles, grille différente) sont transmis à l'appelant
+    cube = construire_cube(folder, n_workers=n_workers)
+    if echecs is not None:
+        echecs.extend(cube["echecs"])
+    return cube
+
+def generer_series_TEC_par_heure(folder, target_lat, target_lon, output_excel_path, n_workers=None, ajouter=False,
+                                 echecs=None):
+    """
+    Extrait la moyenne TEC de la zone 3x3 autour d'un épicentre, à chaque époque.
+
+    Le fichier de sortie n'est pas forcément un classeur Excel : son format
+    est déduit de l'extension (.parquet, .feather, .xlsx ou .csv), Parquet
+    étant le format conseillé pour les longues séries.
+
+    Args:
+        folder (str): dossier des fichiers IONEX.
+        target_lat, target_lon (float): épicentre.
+        output_excel_path (str): chemin du fichier de sortie.
+        n_workers (int | None): processus utilisés pour parser les nouveaux
+            fichiers (None ou 1 : séquentiel, 0 : tous les cœurs).
+        ajouter (bool): complète un fichier existant avec les seules époques
+            postérieures à sa dernière date au lieu de le réécrire.
+        echecs (list | None): reçoit les (fichier, message) des fichiers
+            ignorés lors de la mise à jour du cube.
+
+    Returns:
+        str: chemin du fichier généré.
+    """
+    # Le cube est mis à jour de façon incrémentale : seuls les nouveaux jours sont parsés
+    cube = _cube(folder, n_workers, echecs)
+
+    # Zone 3x3 autour de l'épicentre (tronquée aux bords de la grille), en TECU
+    temps, tec_avg = serie_zone(cube, target_lat, target_lon, rayon=1,
+                                debut=_debut_ajout(output_excel_path, ajouter))
+    if ajouter and len(temps) == 0:
+        return output_excel_path  # fichier déjà à jour
+
+    df = pd.DataFrame({
+        "DateTime": pd.to_datetime(temps),
+        f"TEC_zone_{int(target_lat)}N_{int(target_lon)}E": tec_avg,
+    })
+    # Format déduit de l'extension : .parquet / .feather (colonnaires), .xlsx ou .csv
+    return ecrire_series(df, output_excel_path, ajouter=ajouter)
+
+def lire_catalogue_seismes(chemin_csv):
+    """
+    Lit un catalogue de séismes CSV et retourne les sites à extraire.
+
+    Les colonnes de latitude et longitude sont reconnues par leur nom
+    (lat/latitude, lon/long/longitude, insensible à la casse). Une colonne
+    nom/name/id/event, si présente, sert de libellé.
+
+    Returns:
+        pd.DataFrame: colonnes "Site", "Latitude", "Longitude".
+    """
+    df = pd.read_csv(chemin_csv)
+    colonnes = {c.strip().lower(): c for c in df.columns}
+
+    def trouver(*noms):
+        return next((colonnes[n] for n in noms if n in colonnes), None)
+
+    col_lat = trouver("lat", "latitude")
+    col_lon = trouver("lon", "long", "longitude")
+    if col_lat is None or col_lon is None:
+        raise ValueError("Le catalogue doit contenir des colonnes latitude et longitude.")
+    col_nom = trouver("nom", "name", "id", "event", "site")
+
+    sites = pd.DataFrame({"Latitude": df[col_lat].astype(float), "Longitude": df[col_lon].astype(float)})
+    sites.insert(0, "Site", df[col_nom].astype(str) if col_nom else None)
+    return _normaliser_sites(sites)
+
+def _normaliser_sites(sites):
+    """Accepte un DataFrame ou une liste de (lat, lon) / (nom, lat, lon)."""
+    if not isinstance(sites, pd.DataFrame):
+        lignes = [tuple(s) if len(s) == 3 else (None, *s) for s in sites]
+        sites = pd.DataFrame(lignes, columns=["Site", "Latitude", "Longitude"])
+    sites = sites.reset_index(drop=True).copy()
+    noms_defaut = [f"TEC_zone_{int(la)}N_{int(lo)}E" for la, lo in zip(sites["Latitude"], sites["Longitude"])]
+    sites["Site"] = [n if isinstance(n, str) and n else d for n, d in zip(sites["Site"], noms_defaut)]
+    # Deux sites identiques produiraient des colonnes en double
+    doublons = sites["Site"].duplicated(keep=False)
+    sites.loc[doublons, "Site"] = sites.loc[doublons, "Site"] + "_" + sites.index[doublons].astype(str)
+    return sites
+
+def generer_series_TEC_multi_sites(folder, sites, output_excel_path, format_sortie="large", rayon=1, n_workers=None,
+                                   ajouter=False, echecs=None):
+    """
+    Extrait en une seule passe la moyenne TEC de zone pour plusieurs épicentres.
+
+    Args:
+        folder (str): dossier des fichiers IONEX.
+        sites: liste de (lat, lon) ou (nom, lat, lon), DataFrame issu de
+            lire_catalogue_seismes, ou chemin vers un catalogue CSV.
+        output_excel_path (str): chemin du fichier de sortie ; le format est déduit
+            de l'extension (.parquet, .feather, .xlsx ou .csv).
+        format_sortie (str): "large" (une colonne par site) ou "long"
+            (DateTime, Site, Latitude, Longitude, TEC).
+        rayon (int): demi-largeur de la fenêtre en nœuds de grille (1 → 3x3).
+        n_workers (int | None): processus utilisés pour parser les nouveaux
+            fichiers (None ou 1 : séquentiel, 0 : tous les cœurs).
+        ajouter (bool): complète un fichier existant avec les seules époques
+            postérieures à sa dernière date (mêmes sites requis) au lieu de le réécrire.
+        echecs (list | None): reçoit les (fichier, message) des fichiers
+            ignorés lors de la mise à jour du cube.
+
+    Returns:
+        str: chemin du fichier généré.
+    """
+    if isinstance(sites, str):
+        sites = lire_catalogue_seismes(sites)
+    sites = _normaliser_sites(sites)
+    if sites.empty:
+        raise ValueError("Aucun site à extraire.")
+
+    cube = _cube(folder, n_workers, echecs)
+    temps, valeurs = serie_zones(cube, sites["Latitude"].to_numpy(), sites["Longitude"].to_numpy(), rayon=rayon,
+                                 debut=_debut_ajout(output_excel_path, ajouter))
+    if ajouter and len(temps) == 0:
+        return output_excel_path  # fichier déjà à jour
+
+    df = pd.DataFrame(valeurs, columns=sites["Site"].tolist())
+    df.insert(0, "DateTime", pd.to_datetime(temps))
+
+    if format_sortie == "long":
+        df = df.melt(id_vars="DateTime", var_name="Site", value_name="TEC")
+        df = df.merge(sites, on="Site", how="left")[["DateTime", "Site", "Latitude", "Longitude", "TEC"]]
+    elif format_sortie != "large":
+        raise ValueError(f"Format de sortie inconnu : {format_sortie}")
+
+    return ecrire_series(df, output_excel_path, ajouter=ajouter)
+
+# Anciens noms, conservés pour les scripts existants : la sortie n'est plus forcément un fichier Excel
+generer_excel_TEC_par_heure = generer_series_TEC_par_heure
+generer_excel_TEC_multi_sites = generer_series_TEC_multi_sites
@@ -1,37 +1,156 @@
 import os
+import time
 import requests
-import shutil
-import gzip
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import streamlit as st  # Nécessaire pour accéder aux secrets
+from scripts.manifeste import charger_manifeste, memoriser_produit, produit_a_jour
+from scripts.decompression import decompresseur_pour, decompresser_fichier, extension_compression, nom_decompresse
+from scripts.profilage import etape, propager_contexte
 
-def build_cddis_filename_and_url(date_obj):
+SOURCE_MANIFESTE = "igs_codg"
+
+CDDIS_BASE_URL = "https://cddis.nasa.gov/archive/gnss/products/ionex"
+TAILLE_BLOC = 1024 * 1024
+TENTATIVES = 5
+DELAI_INITIAL = 1.0
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+CODES_TRANSITOIRES = {408, 425, 429, 500, 502, 503, 504}
+# Depuis la semaine GPS 2238, CDDIS ne diffuse plus que les noms longs (.INX.gz)
+DEBUT_NOMS_LONGS = date(2022, 11, 27)
+
+def build_cddis_filename_and_url(date_obj, base_url=CDDIS_BASE_URL):
     doy = date_obj.timetuple().tm_yday
     yy = str(date_obj.year)[2:]
     year = date_obj.year
 
-    filename = f"CODG{doy:03d}0.{yy}i.Z"
-    url = f"https://cddis.nasa.gov/archive/gnss/products/ionex/{year}/{doy:03d}/{filename}"
+    if date_obj >= DEBUT_NOMS_LONGS:
+        filename = f"COD0OPSFIN_{year}{doy:03d}0000_01D_01H_GIM.INX.gz"
+    else:
+        filename = f"CODG{doy:03d}0.{yy}i.Z"
+    url = f"{base_url}/{year}/{doy:03d}/{filename}"
     return filename, url
 
-def try_download_ionex_for_day(date_obj, output_folder):
-    filename, url = build_ionex_filename_and_url(date_obj)
+def _identifiants_earthdata():
+    """Identifiants Earthdata lus dans les secrets Streamlit (None s'ils sont absents)."""
+    try:
+        return st.secrets["earthdata"]["username"], st.secrets["earthdata"]["password"]
+    except Exception:
+        return None
+
+def creer_session(auth=None, n_connexions=8):
+    """
+    Crée une session HTTP dont les connexions sont réutilisées d'un fichier à l'autre.
+
+    Args:
+        auth (tuple | None): (utilisateur, mot de passe).
+        n_connexions (int): taille du pool de connexions par hôte.
+    """
+    session = requests.Session()
+    adaptateur = HTTPAdapter(pool_connections=n_connexions, pool_maxsize=n_connexions)
+    session.mount("https://", adaptateur)
+    session.mount("http://", adaptateur)
+    if auth:
+        session.auth = auth
+    return session
+
+def telecharger_fichier(session, url, output_path, tentatives=TENTATIVES, delai_initial=DELAI_INITIAL,
+                        timeout=30, decompresser=False):
+    """
+    Télécharge une URL vers `output_path` avec reprise et nouvelles tentatives.
+
+    Les octets sont écrits dans `output_path + ".part"` ; si ce fichier existe
+    déjà, le transfert reprend à sa taille via un en-tête HTTP Range. Les
+    erreurs réseau et les codes transitoires (429, 5xx...) sont retentés avec
+    une attente exponentielle (delai_initial, 2x, 4x...).
+
+    Avec `decompresser=True`, les octets compressés sont gardés dans
+    `output_path + <extension de l'URL> + ".part"` (ex. CODG0370.23i.Z.part)
+    puis décompressés selon cette extension (.Z, .gz) une fois le transfert
+    terminé : seul le fichier décompressé reste. Un .part laissé par une
+    exécution interrompue est donc repris, comme sans décompression.
+
+    Returns:
+        str: chemin du fichier complet.
+
+    Raises:
+        RuntimeError: en cas d'échec définitif (code HTTP, contenu HTML, tentatives épuisées).
+    """
+    partiel = output_path + (os.path.splitext(url)[1] if decompresser else "") + ".part"
+    derniere_erreur = None
+    recu = os.path.getsize(partiel) if os.path.exists(partiel) else 0  # octets bruts déjà reçus
+
+    for tentative in range(tentatives):
+        if tentative:
+            time.sleep(delai_initial * 2 ** (tentative - 1))
+
+        entetes = {"Range": f"bytes={recu}-"} if recu else {}
+        try:
+            with session.get(url, stream=True, timeout=timeout, headers=entetes) as response:
+                if response.status_code == 416 and recu:
+                    # Le fichier partiel est déjà complet
+                    break
+                if response.status_code in CODES_TRANSITOIRES:
+                    derniere_erreur = f"status {response.status_code}"
+                    continue
+                if response.status_code not in (200, 206):
+                    raise RuntimeError(f"status {response.status_code}")
+                if "html" in response.headers.get("Content-Type", "").lower():
+                    raise RuntimeError("contenu HTML reçu (authentification ?)")
+
+                # 206 : on complète le fichier partiel ; 200 : le serveur renvoie tout
+                if response.status_code == 200:
+                    recu = 0
+                mode = "ab" if recu else "wb"
+                with open(partiel, mode) as f:
+                    for chunk in response.iter_content(chunk_size=TAILLE_BLOC):
+                        recu += len(chunk)
+                        f.write(chunk)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            derniere_erreur = str(e)
+    else:
+        raise RuntimeError(f"échec après {tentatives} tentatives ({derniere_erreur})")
+
+    if decompresser:
+        _decompresser_partiel(partiel, output_path, url)
+    else:
+        os.replace(partiel, output_path)
+    return output_path
+
+def _decompresser_partiel(partiel, output_path, url):
+    """Décompresse par blocs un transfert terminé vers `output_path`, puis supprime le .part."""
+    decompresseur = decompresseur_pour(url)
+    temporaire = output_path + ".tmp"
+    try:
+        with open(partiel, "rb") as f_in, open(temporaire, "wb") as f_out:
+            for bloc in iter(lambda: f_in.read(TAILLE_BLOC), b""):
+                f_out.write(decompresseur.decompress(bloc))
+            f_out.write(decompresseur.flush())
+    except Exception:
+        # Archive corrompue : le prochain appel repart de zéro
+        for chemin in (temporaire, partiel):
+            if os.path.exists(chemin):
+                os.remove(chemin)
+        raise
+    os.replace(temporaire, output_path)
+    os.remove(partiel)
+
+def try_download_ionex_for_day(date_obj, output_folder, session=None, base_url=CDDIS_BASE_URL, decompresser=False):
+    filename, url = build_cddis_filename_and_url(date_obj, base_url)
     os.makedirs(output_folder, exist_ok=True)
+    if decompresser:
+        filename = nom_decompresse(filename)
     output_path = os.path.join(output_folder, filename)
 
-    username = st.secrets["earthdata"]["username"]
-    password = st.secrets["earthdata"]["password"]
+    if session is None:
+        session = creer_session(_identifiants_earthdata())
 
     try:
-        response = requests.get(url, stream=True, timeout=30, auth=(username, password))
-        if response.status_code == 200 and "html" not in response.headers.get("Content-Type", "").lower():
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            return f"✅ Téléchargé : {filename}", output_path
-        else:
-            return f"❌ Erreur (status {response.status_code}) ou contenu invalide pour : {filename}", None
+        telecharger_fichier(session, url, output_path, decompresser=decompresser)
+        return f"✅ Téléchargé : {filename}", output_path
     except Exception as e:
         return f"❌ Erreur de téléchargement {filename} : {e}", None
 
@@ -40,11 +159,9 @@ def decompress_file(file_path):
         return None
 
     try:
-        if file_path.endswith(".gz"):
-            output_path = file_path[:-3]
-            with gzip.open(file_path, 'rb') as f_in:
-                with open(output_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
+        if extension_compression(file_path):
+            # .gz et .Z : décompression en flux
+            output_path = decompresser_fichier(file_path)
             os.remove(file_path)
             return output_path
 
@@ -61,25 +178,107 @@ def decompress_file(file_path):
         print(f"❌ Erreur décompression {file_path} : {e}")
         return None
 
-def download_and_uncompress_ionex(start_date, end_date, output_folder="ionex_files"):
+def metadonnees_distantes(session, url, timeout=30):
+    """Taille et date de modification annoncées par le serveur (requête HEAD), ou None."""
+    try:
+        response = session.head(url, allow_redirects=True, timeout=timeout)
+        if response.status_code != 200:
+            return None
+        return {"taille": response.headers.get("Content-Length"),
+                "modifie": response.headers.get("Last-Modified")}
+    except requests.RequestException:
+        return None
+
+@etape("telechargement.igs_jour")
+def _traiter_jour(date_obj, output_folder, session, base_url, manifeste=None, verifier_distant=True):
+    """
+    Télécharge et décompresse un jour ; en synchronisation, le manifeste est
+    sauvé dès que le jour est récupéré.
+
+    Returns:
+        tuple: (logs, entree) où entree vaut (date, chemin final, métadonnées
+        distantes) si un produit a été récupéré, sinon None.
+    """
+    logs = []
+    distant = None
+    if manifeste is not None:
+        if verifier_distant:
+            distant = metadonnees_distantes(session, build_cddis_filename_and_url(date_obj, base_url)[1])
+        if produit_a_jour(manifeste, SOURCE_MANIFESTE, date_obj, distant):
+            chemin = manifeste[f"{SOURCE_MANIFESTE}:{date_obj.isoformat()}"]["chemin"]
+            return [f"⏩ Déjà à jour : {os.path.basename(chemin)}"], None
+
+    # .Z et .gz : l'archive reste dans le .part (reprise possible) puis est décompressée en fin de transfert
+    a_la_volee = extension_compression(build_cddis_filename_and_url(date_obj, base_url)[0]) is not None
+    message, downloaded_path = try_download_ionex_for_day(date_obj, output_folder, session, base_url,
+                                                          decompresser=a_la_volee)
+    logs.append(message)
+    if not downloaded_path:
+        return logs, None
+    if a_la_volee:
+        logs.append(f"✅ Décompressé : {os.path.basename(downloaded_path)}")
+        chemin_final = downloaded_path
+    else:
+        decompressed_path = decompress_file(downloaded_path)
+        if decompressed_path:
+            logs.append(f"✅ Décompressé : {os.path.basename(decompressed_path)}")
+        else:
+            logs.append(f"❌ Échec décompression : {os.path.basename(downloaded_path)}")
+        chemin_final = (decompressed_path if decompressed_path and os.path.isfile(decompressed_path)
+                        else downloaded_path)
+
+    if manifeste is not None:
+        memoriser_produit(output_folder, SOURCE_MANIFESTE, date_obj, chemin_final, distant)
+    return logs, (date_obj, chemin_final, distant)
+
+@etape("telechargement.igs")
+def download_and_uncompress_ionex(start_date, end_date, output_folder="ionex_files", n_paralleles=4,
+                                  base_url=CDDIS_BASE_URL, auth=None, synchroniser=True, verifier_distant=True):
+    """
+    Télécharge puis décompresse les IONEX CODE d'une plage de dates.
+
+    Les jours sont traités en parallèle (au plus `n_paralleles` transferts
+    simultanés) sur une session HTTP partagée ; les journaux sont renvoyés
+    dans l'ordre chronologique. En mode synchronisation, le manifeste du
+    dossier (manifeste.json) permet de ne récupérer que les jours absents,
+    altérés localement ou modifiés sur le serveur ; il est sauvé après
+    chaque jour récupéré, si bien qu'une exécution interrompue n'a pas à
+    tout reprendre.
+
+    Args:
+        start_date, end_date (date | str): bornes incluses ("YYYY-MM-DD" accepté).
+        output_folder (str): dossier de destination.
+        n_paralleles (int): nombre maximal de téléchargements simultanés.
+        base_url (str): racine de l'archive (modifiable pour un miroir ou un serveur de test).
+        auth (tuple | None): identifiants ; par défaut ceux des secrets Streamlit.
+        synchroniser (bool): consulter et mettre à jour le manifeste.
+        verifier_distant (bool): comparer taille/date distantes (HEAD) au manifeste.
+
+    Returns:
+        list[str]: messages de suivi.
+    """
     if isinstance(start_date, str):
         start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
     if isinstance(end_date, str):
         end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
 
-    logs = []
+    dates = []
     current_date = start_date
     while current_date <= end_date:
-        message, downloaded_path = try_download_ionex_for_day(current_date, output_folder)
-        logs.append(message)
+        dates.append(current_date)
+        current_date += timedelta(days=1)
 
-        if downloaded_path:
-            decompressed_path = decompress_file(downloaded_path)
-            if decompressed_path:
-                logs.append(f"✅ Décompressé : {os.path.basename(decompressed_path)}")
-            else:
-                logs.append(f"❌ Échec décompression : {os.path.basename(downloaded_path)}")
+    manifeste = charger_manifeste(output_folder) if synchroniser else None
 
-        current_date += timedelta(days=1)
+    n_paralleles = max(1, n_paralleles)
+    session = creer_session(auth or _identifiants_earthdata(), n_connexions=n_paralleles)
+    with session, ThreadPoolExecutor(max_workers=n_paralleles) as executeur:
+        # Les threads reprennent le contexte appelant (journal de profilage éventuel)
+        resultats = list(executeur.map(propager_contexte(
+            lambda d: _traiter_jour(d, output_folder, session, base_url, manifeste, verifier_distant)), dates))
 
-    return logs
+    return [log for logs, _ in resultats for log in logs]
@@ -0,0 +1,166 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+from scripts.decompression import extension_compression
+from scripts.ionex_cache import DOSSIER_CACHE
+from scripts.ionex_parser import (COL_ETIQUETTE, _decoder_bloc, _parser_entete, _parser_epoque,
+                                  _valeurs_physiques)
+from scripts.profilage import etape
+
+TYPES_INDEXES = ("TEC", "RMS")
+DOSSIER_INDEX = "index_cartes"
+# Les lignes LAT/LON1/LON2/DLON/H, comprises dans la zone lue, sont écartées au décodage
+_ETIQUETTE_RANGEE = b"LAT/LON1/LON2/DLON/H"
+
+
+@etape("parsing.index_cartes")
+def indexer_ionex(chemin):
+    """
+    Construit l'index des blocs de cartes TEC et RMS d'un fichier IONEX non compressé.
+
+    Le fichier est parcouru une fois, ligne par ligne, sans décoder les
+    valeurs : pour chaque carte sont relevés son époque, son exposant et la
+    position (début, longueur en octets) de la zone comprise entre la ligne
+    EPOCH OF CURRENT MAP (ou EXPONENT) et la ligne END OF ... MAP.
+
+    Returns:
+        dict: {"types" (n,) "TEC"/"RMS", "epoques" datetime64[s] (n,),
+               "debuts" int64 (n,), "longueurs" int64 (n,), "exposants" int32 (n,),
+               "latitudes", "longitudes"}
+    """
+    if extension_compression(str(chemin)):
+        raise ValueError("L'index des cartes exige un fichier IONEX non compressé (accès direct).")
+
+    types, epoques, debuts, longueurs, exposants = [], [], [], [], []
+    with open(chemin, "rb") as f:
+        lignes_entete = []
+        position = 0
+        for ligne in f:
+            position += len(ligne)
+            if b"END OF HEADER" in ligne[COL_ETIQUETTE:]:
+                break
+            lignes_entete.append(ligne.decode("latin-1"))
+        entete = _parser_entete(lignes_entete)
+
+        carte = None
+        for ligne in f:
+            debut_ligne, position = position, position + len(ligne)
+            etiquette = ligne[COL_ETIQUETTE:].strip()
+            if etiquette.startswith(b"START OF") and etiquette.endswith(b"MAP"):
+                type_carte = etiquette[len(b"START OF "):-len(b" MAP")].decode("ascii")
+                if type_carte in TYPES_INDEXES:
+                    carte = {"type": type_carte, "epoque": None, "exposant": entete["exposant"], "debut": position}
+            elif carte is None:
+                if etiquette == b"END OF FILE":
+                    break
+            elif etiquette.startswith(b"END OF") and etiquette.endswith(b"MAP"):
+                types.append(carte["type"])
+                epoques.append(carte["epoque"])
+                exposants.append(carte["exposant"])
+                debuts.append(carte["debut"])
+                longueurs.append(debut_ligne - carte["debut"])
+                carte = None
+            elif etiquette == b"EPOCH OF CURRENT MAP":
+                carte["epoque"] = _parser_epoque(ligne.decode("latin-1"))
+                carte["debut"] = position
+            elif etiquette == b"EXPONENT":
+                carte["exposant"] = int(ligne[:6])
+                carte["debut"] = position
+
+    return {
+        "types": np.array(types, dtype="U3"),
+        "epoques": np.array(epoques, dtype="datetime64[s]"),
+        "debuts": np.array(debuts, dtype=np.int64),
+        "longueurs": np.array(longueurs, dtype=np.int64),
+        "exposants": np.array(exposants, dtype=np.int32),
+        "latitudes": entete["latitudes"],
+        "longitudes": entete["longitudes"],
+    }
+
+
+def _chemin_index(chemin, dossier_cache):
+    # L'index est lié au fichier tel qu'il est : chemin, taille et date de modification
+    st = os.stat(chemin)
+    signature = f"{os.path.abspath(chemin)}|{st.st_size}|{st.st_mtime_ns}"
+    nom = hashlib.sha1(signature.encode("utf-8")).hexdigest()
+    return os.path.join(dossier_cache, DOSSIER_INDEX, f"{nom}.npz")
+
+
+def charger_index_cartes(chemin, dossier_cache=DOSSIER_CACHE):
+    """
+    Index des cartes d'un fichier IONEX, construit à la première ouverture puis relu du disque.
+
+    L'index est enregistré sous `<dossier_cache>/index_cartes/` et
+    reconstruit automatiquement si le fichier change (taille ou date).
+    """
+    chemin_index = _chemin_index(chemin, dossier_cache)
+    if os.path.exists(chemin_index):
+        with np.load(chemin_index) as donnees:
+            return {cle: donnees[cle] for cle in donnees.files}
+
+    index = indexer_ionex(chemin)
+    dossier = os.path.dirname(chemin_index)
+    os.makedirs(dossier, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dossier, suffix=".npz")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, **index)
+    os.replace(tmp, chemin_index)
+    return index
+
+
+@etape("parsing.cartes_indexees")
+def _lire_cartes(chemin, index, positions):
+    """Décode les cartes d'indices `positions` : un seek et une lecture de taille fixe par carte."""
+    n_lat, n_lon = len(index["latitudes"]), len(index["longitudes"])
+    cartes = np.empty((len(positions), n_lat, n_lon), dtype=np.float32)
+    with open(chemin, "rb") as f:
+        for k, i in enumerate(positions):
+            f.seek(int(index["debuts"][i]))
+            zone = f.read(int(index["longueurs"][i]))
+            lignes = [l for l in zone.splitlines() if l.strip() and _ETIQUETTE_RANGEE not in l]
+            cartes[k] = _decoder_bloc(lignes, n_lat, n_lon)
+    return _valeurs_physiques(cartes, index["exposants"][positions])
+
+
+def lire_carte(chemin, epoque, type_carte="TEC", dossier_cache=DOSSIER_CACHE):
+    """
+    Lit une seule carte TEC ou RMS d'un fichier IONEX par son époque.
+
+    Seul le bloc de la carte est lu, grâce à l'index persistant.
+
+    Returns:
+        np.ndarray float32 (n_lat, n_lon)
+    """
+    index = charger_index_cartes(chemin, dossier_cache)
+    positions = np.flatnonzero((index["types"] == type_carte) & (index["epoques"] == np.datetime64(epoque, "s")))
+    if len(positions) == 0:
+        raise ValueError(f"Aucune carte {type_carte} à l'époque {epoque}.")
+    return _lire_cartes(chemin, index, positions[:1])[0]
+
+
+def lire_cartes_heure(chemin, heure_utc, type_carte="TEC", dossier_cache=DOSSIER_CACHE):
+    """
+    Lit les seules cartes d'une heure UTC (ex. 00:00 et 24:00 d'un fichier journalier).
+
+    Returns:
+        dict: {"epoques" (n,), "cartes" float32 (n, n_lat, n_lon), "latitudes", "longitudes"}
+    """
+    index = charger_index_cartes(chemin, dossier_cache)
+    heures = index["epoques"].astype("datetime64[h]").astype(np.int64) % 24
+    positions = np.flatnonzero((index["types"] == type_carte) & (heures == heure_utc))
+    return {
+        "epoques": index["epoques"][positions],
+        "cartes": _lire_cartes(chemin, index, positions),
+        "latitudes": index["latitudes"],
+        "longitudes": index["longitudes"],
+    }
+
+
+def valeur_point(chemin, lat, lon, epoque, type_carte="TEC", dossier_cache=DOSSIER_CACHE):
+    """Valeur TEC (ou RMS) au nœud de grille le plus proche d'un point, à une époque donnée."""
+    index = charger_index_cartes(chemin, dossier_cache)
+    carte = lire_carte(chemin, epoque, type_carte, dossier_cache)
+    i = np.abs(index["latitudes"] - lat).argmin()
+    j = np.abs(index["longitudes"] - lon).argmin()
+    return float(carte[i, j])
@@ -0,0 +1,146 @@
+import numpy as np
+from scripts.profilage import etape
+
+# Rotation de la Terre par rapport au Soleil : 360° en 24 h
+DEGRES_PAR_SECONDE = 360.0 / 86400.0
+TAILLE_LOT = 1_000_000
+
+
+def _pas(axe):
+    axe = np.asarray(axe, dtype=np.float64)
+    if len(axe) < 2:
+        raise ValueError("La grille doit contenir au moins deux nœuds par axe.")
+    return axe[0], axe[1] - axe[0]
+
+
+def poids_latitude(latitudes, lats):
+    """
+    Indices (i0, i1) des rangées encadrant chaque latitude et poids de i1.
+
+    La grille est celle de l'en-tête (LAT1 / LAT2 / DLAT), croissante ou
+    décroissante ; les points hors grille sont ramenés au bord.
+    """
+    debut, pas = _pas(latitudes)
+    y = np.clip((np.asarray(lats, dtype=np.float64) - debut) / pas, 0, len(latitudes) - 1)
+    i0 = np.minimum(np.floor(y).astype(np.int64), len(latitudes) - 2)
+    return i0, i0 + 1, y - i0
+
+
+def poids_longitude(longitudes, lons):
+    """
+    Indices (j0, j1) des colonnes encadrant chaque longitude et poids de j1.
+
+    Une grille qui fait le tour du globe (ex. -180 à 180 par 5°) est
+    traitée comme périodique : toute longitude est acceptée, y compris
+    après rotation. Sinon, les points hors grille sont ramenés au bord.
+    """
+    debut, pas = _pas(longitudes)
+    n_lon = len(longitudes)
+    x = (np.asarray(lons, dtype=np.float64) - debut) / pas
+    n_tour = int(round(360.0 / abs(pas)))
+    if n_lon >= n_tour:
+        x = np.mod(x, n_tour)
+        j0 = np.floor(x).astype(np.int64) % n_tour
+        return j0, (j0 + 1) % n_tour, x - np.floor(x)
+    x = np.clip(x, 0, n_lon - 1)
+    j0 = np.minimum(np.floor(x).astype(np.int64), n_lon - 2)
+    return j0, j0 + 1, x - j0
+
+
+def _bilineaire(lire, indices_cartes, latitudes, longitudes, lats, lons):
+    """Interpolation bilinéaire (IONEX, éq. 2) des cartes `indices_cartes` aux points (lats, lons)."""
+    i0, i1, p = poids_latitude(latitudes, lats)
+    j0, j1, q = poids_longitude(longitudes, lons)
+    return ((1 - p) * (1 - q) * lire(indices_cartes, i0, j0) + (1 - p) * q * lire(indices_cartes, i0, j1)
+            + p * (1 - q) * lire(indices_cartes, i1, j0) + p * q * lire(indices_cartes, i1, j1))
+
+
+@etape("extraction.interpolation")
+def _interpoler(lire, temps_cartes, latitudes, longitudes, temps, lats, lons, rotation, taille_lot):
+    temps_cartes = np.asarray(temps_cartes, dtype="datetime64[s]").astype(np.int64)
+    temps = np.asarray(temps, dtype="datetime64[s]").astype(np.int64)
+    temps, lats, lons = np.broadcast_arrays(temps, np.asarray(lats, dtype=np.float64),
+                                            np.asarray(lons, dtype=np.float64))
+    forme = temps.shape
+    temps, lats, lons = temps.ravel(), lats.ravel(), lons.ravel()
+    resultat = np.full(len(temps), np.nan, dtype=np.float32)
+    if len(temps_cartes) == 0:
+        return resultat.reshape(forme)
+
+    for debut in range(0, len(temps), taille_lot):
+        lot = slice(debut, debut + taille_lot)
+        t, la, lo = temps[lot], lats[lot], lons[lot]
+        couverts = (t >= temps_cartes[0]) & (t <= temps_cartes[-1])
+
+        if len(temps_cartes) == 1:
+            k = np.zeros(len(t), dtype=np.int64)
+            resultat[lot] = np.where(couverts, _bilineaire(lire, k, latitudes, longitudes, la, lo), np.nan)
+            continue
+
+        # Cartes encadrantes T_k <= t <= T_k+1
+        k = np.clip(np.searchsorted(temps_cartes, t, side="right") - 1, 0, len(temps_cartes) - 2)
+        t0, t1 = temps_cartes[k], temps_cartes[k + 1]
+        w = (t - t0) / (t1 - t0)
+
+        # Interpolation « tournante » (IONEX, éq. 3) : chaque carte est lue à la
+        # longitude qu'avait le point à son époque, ce qui suit le Soleil
+        decalage0 = (t - t0) * DEGRES_PAR_SECONDE if rotation else 0.0
+        decalage1 = (t - t1) * DEGRES_PAR_SECONDE if rotation else 0.0
+        e0 = _bilineaire(lire, k, latitudes, longitudes, la, lo + decalage0)
+        e1 = _bilineaire(lire, k + 1, latitudes, longitudes, la, lo + decalage1)
+        resultat[lot] = np.where(couverts, (1 - w) * e0 + w * e1, np.nan)
+    return resultat.reshape(forme)
+
+
+def interpoler_tec(temps_cartes, cartes, latitudes, longitudes, temps, lats, lons, rotation=True,
+                   taille_lot=TAILLE_LOT):
+    """
+    TEC interpolé à des points (temps, lat, lon) quelconques, en un seul appel vectorisé.
+
+    Interpolation bilinéaire dans l'espace sur la grille de l'en-tête, puis
+    linéaire entre les deux époques encadrantes, avec rotation des cartes
+    (λ' = λ + (t - Tᵢ)) comme le recommande le format IONEX. Les points
+    sont traités par lots de `taille_lot` pour borner la mémoire.
+
+    Args:
+        temps_cartes (np.ndarray datetime64): époques des cartes (n_cartes,), croissantes.
+        cartes (np.ndarray): TEC (n_cartes, n_lat, n_lon).
+        latitudes, longitudes (np.ndarray): grille régulière de l'en-tête IONEX.
+        temps (np.ndarray datetime64): époques des points.
+        lats, lons (np.ndarray): positions des points (diffusées avec `temps`).
+        rotation (bool): False pour une simple interpolation linéaire dans le temps.
+
+    Returns:
+        np.ndarray float32 de la forme des points ; NaN hors de la période couverte.
+    """
+    cartes = np.asarray(cartes)
+    return _interpoler(lambda t, i, j: cartes[t, i, j], temps_cartes, latitudes, longitudes,
+                       temps, lats, lons, rotation, taille_lot)
+
+
+def interpoler_jeu(ds, temps, lats, lons, champ="tec", rotation=True, taille_lot=TAILLE_LOT):
+    """interpoler_tec() sur un jeu IONEX chargé (lire_ionex / charger_ionex) : "tec" ou "rms"."""
+    return interpoler_tec(ds["epoques"], ds[champ], ds["latitudes"], ds["longitudes"],
+                          temps, lats, lons, rotation, taille_lot)
+
+
+def interpoler_cube(cube, temps, lats, lons, rotation=True, taille_lot=TAILLE_LOT):
+    """
+    interpoler_tec() sur le cube TEC pluriannuel.
+
+    Seuls les nœuds nécessaires aux points sont lus dans les memmaps
+    annuels : les millions de points d'une trace de points de percée ou
+    d'un réseau de stations ne chargent jamais de cartes complètes.
+    """
+    bornes, blocs = cube["bornes"], cube["blocs"]
+
+    def lire(t, i, j):
+        valeurs = np.empty(len(t), dtype=np.float32)
+        bloc = np.searchsorted(bornes, t, side="right") - 1
+        for b in np.unique(bloc):
+            sel = bloc == b
+            valeurs[sel] = blocs[b][t[sel] - bornes[b], i[sel], j[sel]]
+        return valeurs
+
+    return _interpoler(lire, cube["temps"], cube["latitudes"], cube["longitudes"],
+                       temps, lats, lons, rotation, taille_lot)
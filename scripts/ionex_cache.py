@@ -0,0 +1,278 @@
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import numpy as np
+from scripts.ionex_parser import lire_ionex
+from scripts.profilage import etape
+from scripts.verrou import verrou_fichier
+
+DOSSIER_CACHE = os.environ.get("IONEX_CACHE_DIR", "cache_ionex")
+
+# Version du format des entrées et du parseur : l'incrémenter fait reconstruire toutes les entrées
+# (elles sont rangées sous <dossier_cache>/v<VERSION_CACHE>/), les anciennes restant intactes
+VERSION_CACHE = 1
+
+# Tableaux stockés en .npy pour chaque jour parsé
+CHAMPS_CARTES = ("tec", "rms", "cartes_hauteur")
+FICHIER_INDEX = "index_chemins.json"
+
+# Index chemins -> empreintes gardé en mémoire, rechargé si le fichier change
+_INDEX_MEMOIRE = {}
+
+
+def cle_contenu(contenu):
+    """Retourne l'empreinte SHA-256 (hex) d'un contenu binaire."""
+    return hashlib.sha256(contenu).hexdigest()
+
+
+def _charger_index(dossier_cache):
+    chemin = os.path.join(dossier_cache, FICHIER_INDEX)
+    try:
+        mtime = os.stat(chemin).st_mtime_ns
+    except OSError:
+        return {}
+    memo = _INDEX_MEMOIRE.get(chemin)
+    if memo and memo[0] == mtime:
+        return memo[1]
+    try:
+        with open(chemin, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    _INDEX_MEMOIRE[chemin] = (mtime, index)
+    return index
+
+
+def _sauver_index(dossier_cache, index):
+    chemin = os.path.join(dossier_cache, FICHIER_INDEX)
+    fd, tmp = tempfile.mkstemp(dir=dossier_cache, prefix=".index_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, chemin)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _INDEX_MEMOIRE[chemin] = (os.stat(chemin).st_mtime_ns, index)
+
+
+def _completer_index(dossier_cache, entrees):
+    """
+    Ajoute des entrées {chemin absolu: entrée} à l'index des chemins.
+
+    L'index est relu sur disque puis réécrit de façon atomique sous verrou :
+    deux processus qui indexent des fichiers en même temps ne perdent pas
+    les entrées l'un de l'autre.
+    """
+    chemin = os.path.join(dossier_cache, FICHIER_INDEX)
+    with verrou_fichier(chemin):
+        try:
+            with open(chemin, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.update(entrees)
+        _sauver_index(dossier_cache, index)
+
+
+def dossier_entree(dossier_cache, cle):
+    """Dossier d'une entrée du cache pour la version courante du format."""
+    return os.path.join(dossier_cache, f"v{VERSION_CACHE}", cle)
+
+
+def cle_connue(chemin, dossier_cache=DOSSIER_CACHE):
+    """Empreinte mémorisée d'un fichier inchangé depuis son indexation, sinon None."""
+    st = os.stat(chemin)
+    entree = _charger_index(dossier_cache).get(os.path.abspath(chemin))
+    if entree and entree["taille"] == st.st_size and entree["mtime_ns"] == st.st_mtime_ns:
+        return entree["cle"]
+    return None
+
+
+def _cle_fichier(chemin, dossier_cache):
+    """
+    Empreinte du contenu d'un fichier, mémorisée par (chemin, taille, mtime)
+    pour éviter de relire et re-hacher un fichier inchangé.
+    """
+    cle = cle_connue(chemin, dossier_cache)
+    if cle is not None:
+        return cle, None
+
+    st = os.stat(chemin)
+    with open(chemin, "rb") as f:
+        contenu = f.read()
+    cle = cle_contenu(contenu)
+    _completer_index(dossier_cache, {os.path.abspath(chemin): {"taille": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                                               "cle": cle}})
+    return cle, contenu
+
+
+def cle_source(source, dossier_cache=DOSSIER_CACHE):
+    """Empreinte du contenu d'une source (chemin, octets ou objet fichier), mémorisée pour les chemins."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return cle_contenu(source)
+    if hasattr(source, "read"):
+        # Objet fichier : haché par blocs puis rembobiné pour la lecture qui suit
+        h = hashlib.sha256()
+        for bloc in iter(lambda: source.read(1024 * 1024), b""):
+            h.update(bloc)
+        source.seek(0)
+        return h.hexdigest()
+    os.makedirs(dossier_cache, exist_ok=True)
+    return _cle_fichier(source, dossier_cache)[0]
+
+
+def _ecrire_entree(dossier_entree, ds, nom_source):
+    """Écrit un jeu de données parsé (tableaux .npy + métadonnées JSON) de façon atomique."""
+    parent = os.path.dirname(dossier_entree)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp_")
+    try:
+        for champ in CHAMPS_CARTES:
+            if ds.get(champ) is not None:
+                np.save(os.path.join(tmp, f"{champ}.npy"), np.ascontiguousarray(ds[champ], dtype=np.float32))
+
+        meta = {
+            "source": nom_source,
+            "epoques": [str(e) for e in ds["epoques"].astype("datetime64[s]")],
+            "latitudes": np.asarray(ds["latitudes"]).tolist(),
+            "longitudes": np.asarray(ds["longitudes"]).tolist(),
+            "hauteurs": None if ds.get("hauteurs") is None else np.asarray(ds["hauteurs"]).tolist(),
+            "exposant": ds["exposant"],
+            "champs": [c for c in CHAMPS_CARTES if ds.get(c) is not None],
+        }
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        os.replace(tmp, dossier_entree)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        # Une autre exécution a pu écrire la même entrée entre-temps
+        if not os.path.exists(os.path.join(dossier_entree, "meta.json")):
+            raise
+
+
+def _lire_meta(dossier_entree):
+    """Époques, grille et champs d'une entrée du cache, sans ouvrir ses cartes."""
+    with open(os.path.join(dossier_entree, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return {
+        "epoques": np.array(meta["epoques"], dtype="datetime64[s]"),
+        "latitudes": np.array(meta["latitudes"]),
+        "longitudes": np.array(meta["longitudes"]),
+        "hauteurs": None if meta["hauteurs"] is None else np.array(meta["hauteurs"]),
+        "exposant": meta["exposant"],
+        "champs": meta["champs"],
+        "cle": os.path.basename(os.path.normpath(dossier_entree)),
+    }
+
+
+def lire_entree(dossier_entree):
+    """
+    Ouvre une entrée du cache sans copie : les cartes sont des memmaps en lecture seule.
+
+    Returns:
+        dict: même structure que lire_ionex(), plus "cle" (empreinte du contenu).
+    """
+    ds = _lire_meta(dossier_entree)
+    for champ in CHAMPS_CARTES:
+        ds[champ] = None
+    for champ in ds.pop("champs"):
+        ds[champ] = ouvrir_champ(dossier_entree, champ)
+    return ds
+
+
+def ouvrir_champ(dossier_entree, champ="tec"):
+    """
+    Memmap en lecture seule d'un champ (tec, rms, cartes_hauteur) d'une entrée du cache.
+
+    Chaque memmap garde un descripteur de fichier ouvert jusqu'à sa libération.
+    """
+    return np.load(os.path.join(dossier_entree, f"{champ}.npy"), mmap_mode="r")
+
+
+@etape("cache.ionex")
+def charger_ionex(source, dossier_cache=DOSSIER_CACHE, nom=None):
+    """
+    Retourne le jeu de données d'un fichier IONEX en passant par le cache binaire.
+
+    Au premier appel le fichier est parsé puis stocké sous
+    `<dossier_cache>/v<VERSION_CACHE>/<sha256>/` ; les appels suivants
+    ouvrent directement les tableaux en mémoire mappée.
+
+    Un contenu en mémoire (bytes, memoryview d'un fichier déposé...) est
+    haché sans copie ; il n'est converti et parsé que s'il est absent du
+    cache.
+
+    Args:
+        source (str | bytes | memoryview | file): chemin vers le fichier IONEX,
+            son contenu brut ou un objet fichier binaire.
+        dossier_cache (str): dossier racine du cache.
+        nom (str): nom d'origine (détection de la compression d'un contenu en mémoire).
+
+    Returns:
+        dict: même structure que lire_ionex(), plus "cle" (empreinte du contenu).
+    """
+    os.makedirs(dossier_cache, exist_ok=True)
+
+    if hasattr(source, "read"):
+        nom = nom or getattr(source, "name", None)
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        contenu = source
+        cle, nom_source = cle_contenu(contenu), nom
+    else:
+        cle, contenu = _cle_fichier(source, dossier_cache)
+        nom_source = os.path.basename(source)
+        nom = nom or os.fspath(source)
+
+    entree = dossier_entree(dossier_cache, cle)
+    if not os.path.exists(os.path.join(entree, "meta.json")):
+        if contenu is None:
+            with open(source, "rb") as f:
+                contenu = f.read()
+        _ecrire_entree(entree, lire_ionex(contenu, nom), nom_source)
+
+    return lire_entree(entree)
+
+
+def entete_ionex(chemin, dossier_cache=DOSSIER_CACHE):
+    """
+    Époques et grille d'un fichier IONEX passé par le cache, sans ouvrir ses cartes.
+
+    Le fichier est parsé et mis en cache s'il ne l'est pas encore. Aucun
+    memmap n'est gardé : utile pour parcourir une archive de plusieurs
+    centaines de jours sans épuiser les descripteurs de fichiers.
+
+    Returns:
+        dict: "epoques", "latitudes", "longitudes", "hauteurs", "exposant",
+        "champs" (cartes disponibles) et "cle" (empreinte du contenu).
+    """
+    entree = dossier_entree(dossier_cache, cle_source(chemin, dossier_cache))
+    if not os.path.exists(os.path.join(entree, "meta.json")):
+        charger_ionex(chemin, dossier_cache)
+    return _lire_meta(entree)
+
+
+def precharger_ionex(chemin, dossier_cache=DOSSIER_CACHE):
+    """
+    Parse un fichier et l'ajoute au cache sans toucher à l'index des chemins.
+
+    Prévu pour être exécuté dans un processus séparé : le résultat est
+    l'entrée d'index à enregistrer ensuite avec memoriser_cles().
+    """
+    st = os.stat(chemin)
+    with open(chemin, "rb") as f:
+        contenu = f.read()
+    ds = charger_ionex(contenu, dossier_cache, nom=chemin)
+    return {"taille": st.st_size, "mtime_ns": st.st_mtime_ns, "cle": ds["cle"]}
+
+
+def memoriser_cles(dossier_cache, entrees):
+    """Enregistre en une seule écriture les entrées d'index (chemin, entrée) produites par precharger_ionex."""
+    if not entrees:
+        return
+    _completer_index(dossier_cache, {os.path.abspath(chemin): entree for chemin, entree in entrees})
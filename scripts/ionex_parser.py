@@ -0,0 +1,284 @@
+import os
+import datetime
+import numpy as np
+from scripts.decompression import extension_compression, ouvrir_flux
+from scripts.profilage import etape
+
+# Les étiquettes IONEX occupent les colonnes 61 à 80 de chaque ligne
+COL_ETIQUETTE = 60
+LARGEUR_LIGNE = 80
+# Les blocs de données sont écrits en 16I5 (16 valeurs de 5 caractères par ligne)
+VALEURS_PAR_LIGNE = 16
+LARGEUR_CHAMP = 5
+
+_POIDS_I5 = np.array([10000, 1000, 100, 10, 1], dtype=np.int32)
+
+
+def _lire_octets(source, nom=None):
+    """
+    Lit le contenu d'un fichier IONEX : chemin, objet fichier binaire ou
+    octets déjà chargés (bytes, bytearray, memoryview).
+
+    Un contenu .gz/.Z est décompressé à la lecture et une archive .zip
+    rend son premier membre (voir ouvrir_flux) ; pour un objet fichier ou
+    des octets, le format est déduit de `nom`.
+    """
+    en_memoire = isinstance(source, (bytes, bytearray, memoryview))
+    if nom is None and not en_memoire:
+        nom = getattr(source, "name", "") if hasattr(source, "read") else os.fspath(source)
+    if nom and (extension_compression(str(nom)) or str(nom).lower().endswith(".zip")):
+        with ouvrir_flux(source, str(nom)) as f:
+            return f.read()
+    if en_memoire:
+        return bytes(source)
+    if hasattr(source, "read"):
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def _champs_fixes(ligne, n, largeur=6, decalage=2):
+    """Découpe une ligne d'en-tête au format 2X,nF6.x (champs de largeur fixe)."""
+    return [float(ligne[decalage + k * largeur:decalage + (k + 1) * largeur]) for k in range(n)]
+
+
+def _grille(debut, fin, pas):
+    n = int(round((fin - debut) / pas)) + 1
+    return debut + pas * np.arange(n)
+
+
+def _parser_entete(lignes):
+    """
+    Extrait les métadonnées de grille de l'en-tête IONEX.
+
+    Returns:
+        dict: latitudes, longitudes, hauteurs, exposant et nombre de cartes.
+    """
+    entete = {"exposant": -1, "dimension": 2, "n_cartes": None}
+    for ligne in lignes:
+        etiquette = ligne[COL_ETIQUETTE:].strip()
+        if etiquette == "LAT1 / LAT2 / DLAT":
+            entete["latitudes"] = _grille(*_champs_fixes(ligne, 3))
+        elif etiquette == "LON1 / LON2 / DLON":
+            entete["longitudes"] = _grille(*_champs_fixes(ligne, 3))
+        elif etiquette == "HGT1 / HGT2 / DHGT":
+            h1, h2, dh = _champs_fixes(ligne, 3)
+            entete["hauteurs"] = np.array([h1]) if dh == 0 else _grille(h1, h2, dh)
+        elif etiquette == "EXPONENT":
+            entete["exposant"] = int(ligne[:6])
+        elif etiquette == "MAP DIMENSION":
+            entete["dimension"] = int(ligne[:6])
+        elif etiquette == "# OF MAPS IN FILE":
+            entete["n_cartes"] = int(ligne[:6])
+
+    for cle in ("latitudes", "longitudes"):
+        if cle not in entete:
+            raise ValueError(f"En-tête IONEX incomplet : grille '{cle}' absente.")
+    if entete["dimension"] != 2:
+        raise ValueError("Seules les cartes IONEX 2D sont prises en charge.")
+    return entete
+
+
+def _decoder_i5(champs):
+    """
+    Convertit en bloc des champs I5 (tableau d'octets (..., 5)) en valeurs flottantes.
+    Les champs vides deviennent NaN.
+    """
+    chiffres = (champs >= 48) & (champs <= 57)
+    valeurs = ((champs.astype(np.int32) - 48) * chiffres) @ _POIDS_I5
+    valeurs = np.where((champs == 45).any(axis=-1), -valeurs, valeurs).astype(np.float32)
+    valeurs[~chiffres.any(axis=-1)] = np.nan
+    return valeurs
+
+
+def _valeurs_physiques(valeurs, exposants):
+    """Applique la valeur « pas de donnée » (9999 → NaN) puis l'exposant (scalaire ou par carte)."""
+    valeurs[valeurs == 9999] = np.nan
+    facteurs = np.asarray(10.0 ** np.asarray(exposants, dtype=np.float64), dtype=np.float32)
+    valeurs *= facteurs.reshape(facteurs.shape + (1,) * (valeurs.ndim - facteurs.ndim))
+    return valeurs
+
+
+def _parser_epoque(ligne):
+    annee, mois, jour, heure, minute, seconde = (int(ligne[6 * k:6 * (k + 1)]) for k in range(6))
+    return datetime.datetime(annee, mois, jour, heure, minute, seconde)
+
+
+def _extraire_cartes(octets, idx_donnees, idx_debuts, idx_fins, n_lat, n_lon):
+    """
+    Décode toutes les cartes d'un type donné (blocs START/END OF ... MAP).
+
+    Returns:
+        np.ndarray float32 (n_cartes, n_lat, n_lon) : valeurs brutes du fichier.
+    """
+    bloc = np.searchsorted(idx_debuts, idx_donnees, side="right") - 1
+    dans_bloc = (bloc >= 0) & (idx_donnees < idx_fins[np.clip(bloc, 0, len(idx_fins) - 1)])
+    idx_donnees = idx_donnees[dans_bloc]
+
+    lignes_par_rangee = -(-n_lon // VALEURS_PAR_LIGNE)
+    n_cartes = len(idx_debuts)
+    attendu = n_cartes * n_lat * lignes_par_rangee
+    if len(idx_donnees) != attendu:
+        raise ValueError(f"Structure IONEX inattendue : {len(idx_donnees)} lignes de données "
+                         f"au lieu de {attendu}.")
+
+    champs = octets[idx_donnees].reshape(-1, VALEURS_PAR_LIGNE, LARGEUR_CHAMP)
+    valeurs = _decoder_i5(champs).reshape(n_cartes, n_lat, lignes_par_rangee * VALEURS_PAR_LIGNE)
+    return np.ascontiguousarray(valeurs[..., :n_lon])
+
+
+@etape("parsing.ionex")
+def lire_ionex(source, nom=None):
+    """
+    Lit un fichier IONEX complet en un seul passage.
+
+    Les blocs de données 16I5 sont décodés en bloc avec NumPy, sans
+    conversion valeur par valeur. Les cartes TEC, RMS et de hauteur sont
+    extraites ensemble ; l'exposant déclaré (en-tête ou carte) est appliqué
+    et la valeur 9999 (« pas de donnée ») est remplacée par NaN.
+
+    Args:
+        source (str | bytes | memoryview | file): chemin vers le fichier IONEX,
+            son contenu brut ou un objet fichier binaire.
+        nom (str): nom servant à détecter la compression d'un contenu ou d'un objet fichier.
+
+    Returns:
+        dict: {
+            "tec": np.ndarray float32 (n_cartes, n_lat, n_lon) en TECU,
+            "rms": np.ndarray float32 (n_cartes, n_lat, n_lon) en TECU, ou None,
+            "cartes_hauteur": np.ndarray float32 (n_cartes, n_lat, n_lon) en km, ou None,
+            "epoques": np.ndarray datetime64[s] (n_cartes,),
+            "latitudes": np.ndarray (n_lat,),
+            "longitudes": np.ndarray (n_lon,),
+            "hauteurs": np.ndarray,
+            "exposant": int,
+        }
+    """
+    contenu = _lire_octets(source, nom)
+    lignes = contenu.splitlines()
+
+    fin_entete = next((i for i, l in enumerate(lignes) if b"END OF HEADER" in l[COL_ETIQUETTE:]), None)
+    if fin_entete is None:
+        raise ValueError("Fichier IONEX invalide : 'END OF HEADER' introuvable.")
+
+    entete = _parser_entete(l.decode("latin-1") for l in lignes[:fin_entete])
+    latitudes, longitudes = entete["latitudes"], entete["longitudes"]
+
+    # Corps du fichier sous forme de matrice d'octets (n_lignes, 80)
+    corps = np.array(lignes[fin_entete + 1:], dtype=f"S{LARGEUR_LIGNE}")
+    octets = corps.view(np.uint8).reshape(-1, LARGEUR_LIGNE)
+
+    # Une ligne de données ne contient que des chiffres, des espaces et des signes ;
+    # une ligne d'étiquette contient des majuscules dans les colonnes 61-80.
+    zone_etiquette = octets[:, COL_ETIQUETTE:]
+    est_etiquette = ((zone_etiquette >= 65) & (zone_etiquette <= 90)).any(axis=1)
+    idx_etiquettes = np.flatnonzero(est_etiquette)
+    etiquettes = np.char.strip(zone_etiquette[idx_etiquettes].copy().view(f"S{LARGEUR_LIGNE - COL_ETIQUETTE}").ravel())
+
+    fins_fichier = idx_etiquettes[etiquettes == b"END OF FILE"]
+    limite = fins_fichier[0] if len(fins_fichier) else len(corps)
+    octets = octets[:limite]
+    idx_donnees = np.flatnonzero(~est_etiquette[:limite] & (octets > 32).any(axis=1))
+
+    idx_exposants = idx_etiquettes[etiquettes == b"EXPONENT"]
+    idx_epoques = idx_etiquettes[etiquettes == b"EPOCH OF CURRENT MAP"]
+
+    cartes = {}
+    for cle, nom in (("tec", b"TEC"), ("rms", b"RMS"), ("cartes_hauteur", b"HEIGHT")):
+        idx_debuts = idx_etiquettes[etiquettes == b"START OF " + nom + b" MAP"]
+        idx_fins = idx_etiquettes[etiquettes == b"END OF " + nom + b" MAP"]
+        if len(idx_debuts) == 0:
+            cartes[cle] = None
+            continue
+
+        valeurs = _extraire_cartes(octets, idx_donnees, idx_debuts, idx_fins, len(latitudes), len(longitudes))
+
+        # Un enregistrement EXPONENT placé dans une carte remplace celui de l'en-tête
+        exposants = np.full(len(idx_debuts), entete["exposant"], dtype=np.int32)
+        for idx in idx_exposants:
+            k = np.searchsorted(idx_debuts, idx) - 1
+            if k >= 0 and idx < idx_fins[k]:
+                exposants[k] = int(corps[idx][:6])
+        cartes[cle] = _valeurs_physiques(valeurs, exposants)
+
+        if cle == "tec":
+            # Époques : la ligne EPOCH OF CURRENT MAP suit chaque START OF TEC MAP
+            epoques = [_parser_epoque(corps[idx_epoques[np.searchsorted(idx_epoques, debut)]].decode("latin-1"))
+                       for debut in idx_debuts]
+
+    if cartes["tec"] is None:
+        raise ValueError("Aucune carte TEC trouvée dans le fichier.")
+
+    return {
+        **cartes,
+        "epoques": np.array(epoques, dtype="datetime64[s]"),
+        "latitudes": latitudes,
+        "longitudes": longitudes,
+        "hauteurs": entete.get("hauteurs"),
+        "exposant": entete["exposant"],
+    }
+
+
+def _decoder_bloc(lignes, n_lat, n_lon):
+    """Décode les lignes de données d'une seule carte en tableau (n_lat, n_lon)."""
+    lignes_par_rangee = -(-n_lon // VALEURS_PAR_LIGNE)
+    if len(lignes) != n_lat * lignes_par_rangee:
+        raise ValueError(f"Structure IONEX inattendue : {len(lignes)} lignes de données "
+                         f"au lieu de {n_lat * lignes_par_rangee}.")
+    octets = np.array(lignes, dtype=f"S{LARGEUR_LIGNE}").view(np.uint8).reshape(-1, VALEURS_PAR_LIGNE, LARGEUR_CHAMP)
+    valeurs = _decoder_i5(octets).reshape(n_lat, lignes_par_rangee * VALEURS_PAR_LIGNE)
+    return np.ascontiguousarray(valeurs[:, :n_lon])
+
+
+def iterer_cartes_ionex(source, nom=None):
+    """
+    Lit un fichier IONEX (éventuellement .gz, .Z ou .zip) carte par carte.
+
+    Le flux est décompressé et parsé au fil de la lecture : la mémoire
+    utilisée reste bornée à une seule carte, sans fichier intermédiaire.
+
+    Args:
+        source (str | file): chemin ou objet fichier binaire.
+        nom (str): nom servant à détecter la compression (par défaut celui de la source).
+
+    Yields:
+        dict: {"type": "TEC" | "RMS" | "HEIGHT", "numero": int, "epoque": datetime,
+               "carte": np.ndarray float32 (n_lat, n_lon), "latitudes", "longitudes"}
+    """
+    with ouvrir_flux(source, nom) as flux:
+        lignes_entete = []
+        for ligne in flux:
+            if b"END OF HEADER" in ligne[COL_ETIQUETTE:]:
+                break
+            lignes_entete.append(ligne.decode("latin-1"))
+        entete = _parser_entete(lignes_entete)
+        latitudes, longitudes = entete["latitudes"], entete["longitudes"]
+
+        bloc = None
+        for ligne in flux:
+            ligne = ligne.rstrip(b"\r\n")
+            etiquette = ligne[COL_ETIQUETTE:].strip()
+            if etiquette.startswith(b"START OF") and etiquette.endswith(b"MAP"):
+                type_carte = etiquette[len(b"START OF "):-len(b" MAP")].decode("ascii")
+                bloc, epoque, exposant = [], None, entete["exposant"]
+                numero = int(ligne[:6])
+            elif bloc is None:
+                if etiquette == b"END OF FILE":
+                    break
+            elif etiquette.startswith(b"END OF") and etiquette.endswith(b"MAP"):
+                carte = _decoder_bloc(bloc, len(latitudes), len(longitudes))
+                yield {
+                    "type": type_carte,
+                    "numero": numero,
+                    "epoque": epoque,
+                    "carte": _valeurs_physiques(carte, exposant),
+                    "latitudes": latitudes,
+                    "longitudes": longitudes,
+                }
+                bloc = None
+            elif etiquette == b"EPOCH OF CURRENT MAP":
+                epoque = _parser_epoque(ligne.decode("latin-1"))
+            elif etiquette == b"EXPONENT":
+                exposant = int(ligne[:6])
+            elif etiquette != b"LAT/LON1/LON2/DLON/H" and ligne.strip():
+                bloc.append(ligne)
@@ -0,0 +1,23 @@
+import pandas as pd
+from scripts.decompression import ouvrir_flux
+
+# Colonnes utiles des fichiers ASCII Madrigal (YEAR MONTH DAY HOUR MIN SEC GDLAT GLON TEC DTEC)
+COLONNES_CARTE = ("HOUR", "GDLAT", "GLON", "TEC")
+
+
+def iterer_lignes_madrigal(source, taille_bloc=200_000, colonnes=COLONNES_CARTE, nom=None):
+    """
+    Lit un fichier ASCII Madrigal (éventuellement .gz, .Z ou .zip) par blocs de lignes.
+
+    Seules les colonnes utiles sont conservées et le fichier n'est jamais
+    décompressé sur disque : la mémoire reste bornée à un bloc.
+
+    Yields:
+        pd.DataFrame: bloc d'au plus `taille_bloc` lignes.
+    """
+    utiles = None if colonnes is None else set(colonnes)
+    with ouvrir_flux(source, nom) as flux:
+        lecteur = pd.read_csv(flux, sep=r"\s+", chunksize=taille_bloc,
+                              usecols=None if utiles is None else (lambda c: c in utiles))
+        for bloc in lecteur:
+            yield bloc
@@ -1,32 +1,86 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+from scripts.madrigal_ascii import iterer_lignes_madrigal
+from scripts.madrigal_hdf5 import lire_tec_hdf5
+from scripts.madrigal_grille import grille_madrigal, RESOLUTION_DEFAUT
+from scripts.fond_carte import ajouter_fond_de_carte
+from scripts.profilage import etape
 
-def lire_tec_ascii(fichier_txt, heure):
-    # Lecture du fichier ASCII
-    df = pd.read_csv(fichier_txt, delim_whitespace=True)
+def lire_tec_ascii(fichier_txt, heure, nom=None):
+    # Lecture du fichier ASCII (chemin, octets ou objet fichier) par blocs, en ne gardant que l'heure choisie
+    n_lignes = 0
+    morceaux = []
+    with etape("parsing.madrigal_ascii"):
+        for bloc in iterer_lignes_madrigal(fichier_txt, nom=nom):
+            n_lignes += len(bloc)
+            morceaux.append(bloc[bloc["HOUR"] == heure])
 
-    # Vérifie que le DataFrame contient des données
-    if df.empty:
+    # Vérifie que le fichier contient des données
+    if n_lignes == 0:
         raise ValueError("Le fichier ne contient aucune donnée.")
 
-    # Filtrer selon l'heure choisie
-    df_filtré = df[df["HOUR"] == heure]
+    df_filtré = pd.concat(morceaux)
 
     if df_filtré.empty:
         raise ValueError(f"Aucune donnée pour l'heure {heure} UTC.")
 
+    return tracer_carte_tec_madrigal(df_filtré, heure)
+
+def lire_tec_hdf5_carte(fichier_hdf5, heure):
+    """Carte TEC d'une heure lue directement dans un fichier Madrigal HDF5."""
+    df_filtré = lire_tec_hdf5(fichier_hdf5, heure=heure)
+
+    if df_filtré.empty:
+        raise ValueError(f"Aucune donnée pour l'heure {heure} UTC.")
+
+    return tracer_carte_tec_madrigal(df_filtré, heure)
+
+def lire_tec_grille_carte(fichier, heure, statistique="moyenne", resolution=RESOLUTION_DEFAUT, nom=None):
+    """Carte TEC d'une heure depuis la grille pré-calculée (et mise en cache) du fichier."""
+    grille = grille_madrigal(fichier, resolution=resolution, nom=nom)
+
+    if not grille["compte"][heure].any():
+        raise ValueError(f"Aucune donnée pour l'heure {heure} UTC.")
+
+    return tracer_grille_tec(grille, heure, statistique)
+
+@etape("rendu.madrigal_grille")
+def tracer_grille_tec(grille, heure, statistique="moyenne"):
+    """Trace une grille TEC (moyenne, mediane ou compte par cellule) avec pcolormesh."""
+    fig = plt.figure(figsize=(12, 6))
+    ax = plt.axes(projection=ccrs.PlateCarree())
+
+    ajouter_fond_de_carte(ax, "madrigal")
+    ax.gridlines(draw_labels=True, linestyle="--", alpha=0.5)
+
+    valeurs = grille[statistique][heure]
+    if statistique == "compte":
+        valeurs = np.ma.masked_equal(valeurs, 0)
+    else:
+        valeurs = np.ma.masked_invalid(valeurs)
+
+    # Une cellule par pas de grille : pas de triangulation des points dispersés
+    pm = ax.pcolormesh(grille["longitudes"], grille["latitudes"], valeurs,
+                       cmap='jet', shading='flat', transform=ccrs.PlateCarree())
+
+    cbar = plt.colorbar(pm, orientation='vertical', pad=0.05, shrink=0.8)
+    cbar.set_label("Nombre de mesures" if statistique == "compte" else f"TEC ({statistique})")
+
+    plt.title(f"Carte TEC - {heure}h UTC", fontsize=14)
+
+    return fig
+
+@etape("rendu.madrigal_points")
+def tracer_carte_tec_madrigal(df_filtré, heure):
+    """Trace les points TEC (GLON, GDLAT, TEC) d'une heure sur une carte du monde."""
     # Création de la carte avec projection
     fig = plt.figure(figsize=(12, 6))
     ax = plt.axes(projection=ccrs.PlateCarree())
 
-    # Arrière-plan : carte du monde
-    ax.set_global()
-    ax.coastlines()
-    ax.add_feature(cfeature.BORDERS, linestyle=':')
-    ax.add_feature(cfeature.LAND, facecolor='lightgray')
-    ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
+    # Arrière-plan : carte du monde (rastérisée une fois, en cache)
+    ajouter_fond_de_carte(ax, "madrigal")
     ax.gridlines(draw_labels=True, linestyle="--", alpha=0.5)
 
     # Tracé lisse avec tricontourf
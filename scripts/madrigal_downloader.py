@@ -3,6 +3,8 @@ import gzip
 import shutil
 import datetime
 import madrigalWeb.madrigalWeb as mw
+from scripts.manifeste import charger_manifeste, memoriser_produit, produit_a_jour
+from scripts.profilage import etape
 
 # =================== CONFIG ===================
 madrigal_url     = 'https://cedar.openmadrigal.org'
@@ -11,6 +13,8 @@ user_email       = 'omar@email.com'
 user_affiliation = 'Algeria University'
 # ==============================================
 
+SOURCE_MANIFESTE = "madrigal_tec"
+
 def decompress_gz(file_path):
     """Décompresse un .gz et supprime l’archive compressée."""
     if file_path.endswith(".gz"):
@@ -47,16 +51,30 @@ def download_hdf5(md, exp_id, out_dir):
             continue
     return None
 
-def traiter_date(date_obj, md, out_dir):
-    """
-    Recherche les expériences TEC d'une date et télécharge la première valide.
-    """
+def experiences_tec(md, date_obj):
+    """Expériences TEC publiées par Madrigal pour une date."""
     y, m, d = date_obj.year, date_obj.month, date_obj.day
     exps = md.getExperiments(
         0, y, m, d, 0, 0, 0,
         y, m, d, 23, 59, 59, 0
     )
-    tec_exps = [e for e in exps if "TEC" in e.name]
+    return [e for e in exps if "TEC" in e.name]
+
+def etat_distant(tec_exps):
+    """
+    Empreinte de l'état distant d'une date : identifiant et date de dernière
+    modification (uttimestamp) de chaque expérience TEC. Elle change si une
+    expérience est ajoutée, retirée ou retraitée sur le serveur.
+    """
+    return {"experiences": [[e.id, getattr(e, "uttimestamp", None)] for e in tec_exps]}
+
+@etape("telechargement.madrigal_jour")
+def traiter_date(date_obj, md, out_dir, tec_exps=None):
+    """
+    Recherche les expériences TEC d'une date (sauf si déjà fournies) et télécharge la première valide.
+    """
+    if tec_exps is None:
+        tec_exps = experiences_tec(md, date_obj)
     if not tec_exps:
         return None
 
@@ -66,34 +84,65 @@ def traiter_date(date_obj, md, out_dir):
             return local
     return None
 
+@etape("telechargement.madrigal")
 def telecharger_donnees_tec(start_date: datetime.date,
                             end_date:   datetime.date,
-                            output_dir: str) -> list[str]:
+                            output_dir: str,
+                            forcer:     bool = False,
+                            decompresser: bool = True,
+                            verifier_distant: bool = True) -> list[str]:
     """
     Télécharge tous les fichiers TEC entre deux dates.
-    Puis les décompresse s’ils sont .gz.
-    Retourne la liste des fichiers finaux (décompressés).
+    Puis les décompresse s’ils sont .gz ; `decompresser=False` les conserve
+    tels quels (les lecteurs les décompressent en flux).
+    Les jours déjà présents dans le manifeste du dossier, intacts
+    localement et dont les expériences Madrigal n'ont pas changé (voir
+    etat_distant) sont ignorés sans rien télécharger, sauf si `forcer` ;
+    `verifier_distant=False` évite aussi d'interroger Madrigal pour eux.
+    Le manifeste est sauvé après chaque jour récupéré.
+    Retourne la liste des fichiers finaux, dans l'ordre des dates.
     """
     os.makedirs(output_dir, exist_ok=True)
-    md = mw.MadrigalData(madrigal_url)
-    downloaded = []
+    manifeste = charger_manifeste(output_dir)
+    md = None
+    fichiers = []
     cur = start_date
 
     while cur <= end_date:
+        tec_exps = distant = ancien = None
+        if not forcer and produit_a_jour(manifeste, SOURCE_MANIFESTE, cur):
+            if verifier_distant:
+                if md is None:
+                    md = mw.MadrigalData(madrigal_url)
+                tec_exps = experiences_tec(md, cur)
+                distant = etat_distant(tec_exps)
+            chemin = manifeste[f"{SOURCE_MANIFESTE}:{cur.isoformat()}"]["chemin"]
+            if produit_a_jour(manifeste, SOURCE_MANIFESTE, cur, distant):
+                print(f"⏩ Déjà à jour : {os.path.basename(chemin)}")
+                fichiers.append(chemin)
+                cur += datetime.timedelta(days=1)
+                continue
+            # Expériences retraitées sur le serveur : l'ancien fichier sera remplacé
+            print(f"🔄 Modifié sur Madrigal : {cur.isoformat()}")
+            ancien = chemin
+
         print(f"📅 Traitement du {cur.isoformat()}")
-        result = traiter_date(cur, md, output_dir)
+        if md is None:
+            md = mw.MadrigalData(madrigal_url)
+        if tec_exps is None:
+            tec_exps = experiences_tec(md, cur)
+        result = traiter_date(cur, md, output_dir, tec_exps)
         if result:
             print(f"✅ Fichier téléchargé : {os.path.basename(result)}")
-            downloaded.append(result)
+            if ancien and ancien != result and os.path.exists(ancien):
+                os.remove(ancien)
+            # Décompression éventuelle du .gz, puis sauvegarde immédiate du manifeste
+            final_path = decompress_gz(result) if decompresser else result
+            print(f"📦 Fichier prêt : {os.path.basename(final_path)}")
+            memoriser_produit(output_dir, SOURCE_MANIFESTE, cur, final_path, etat_distant(tec_exps))
+            fichiers.append(final_path)
         else:
             print(f"❌ Aucun fichier TEC pour {cur.isoformat()}")
         cur += datetime.timedelta(days=1)
 
-    # Décompression de tous les fichiers .gz
-    decompressed = []
-    for f in downloaded:
-        final_path = decompress_gz(f)
-        print(f"📦 Fichier prêt : {os.path.basename(final_path)}")
-        decompressed.append(final_path)
-
-    return decompressed
+    return fichiers
@@ -0,0 +1,115 @@
+import os
+import numpy as np
+from scripts.ionex_cache import DOSSIER_CACHE, cle_source
+from scripts.madrigal_ascii import iterer_lignes_madrigal
+from scripts.madrigal_hdf5 import lire_tec_hdf5
+from scripts.profilage import etape
+
+RESOLUTION_DEFAUT = 1.0
+STATISTIQUES = ("moyenne", "mediane", "compte")
+
+
+def _axes(resolution):
+    bords_lat = np.arange(-90.0, 90.0 + resolution / 2, resolution)
+    bords_lon = np.arange(-180.0, 180.0 + resolution / 2, resolution)
+    return bords_lat, bords_lon
+
+
+@etape("extraction.binning_madrigal")
+def binner_tec(heures, lats, lons, tec, resolution=RESOLUTION_DEFAUT):
+    """
+    Regroupe des mesures TEC dispersées sur une grille lat/lon régulière, pour chaque heure.
+
+    Tout est calculé en une passe vectorisée : moyenne et effectif par
+    np.bincount, médiane par un tri unique (cellule, valeur).
+
+    Args:
+        heures, lats, lons, tec (array-like): mesures (heure UTC 0-23, GDLAT, GLON, TEC).
+        resolution (float): pas de la grille en degrés.
+
+    Returns:
+        dict: {"latitudes", "longitudes" (bords des cellules), "heures" (0..23),
+               "moyenne", "mediane" (float32, NaN si vide), "compte" (int32),
+               chacun de forme (24, n_lat, n_lon)}
+    """
+    heures = np.asarray(heures, dtype=np.int64)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = (np.asarray(lons, dtype=np.float64) + 180.0) % 360.0 - 180.0
+    tec = np.asarray(tec, dtype=np.float64)
+
+    bords_lat, bords_lon = _axes(resolution)
+    n_lat, n_lon = len(bords_lat) - 1, len(bords_lon) - 1
+    valides = np.isfinite(tec) & np.isfinite(lats) & np.isfinite(lons) & (heures >= 0) & (heures < 24)
+    heures, lats, lons, tec = heures[valides], lats[valides], lons[valides], tec[valides]
+
+    i = np.clip(((lats + 90.0) / resolution).astype(np.int64), 0, n_lat - 1)
+    j = np.clip(((lons + 180.0) / resolution).astype(np.int64), 0, n_lon - 1)
+    cellules = (heures * n_lat + i) * n_lon + j
+
+    taille = 24 * n_lat * n_lon
+    compte = np.bincount(cellules, minlength=taille)
+    somme = np.bincount(cellules, weights=tec, minlength=taille)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        moyenne = somme / compte
+
+    mediane = np.full(taille, np.nan)
+    if len(tec):
+        ordre = np.lexsort((tec, cellules))
+        c, v = cellules[ordre], tec[ordre]
+        debuts = np.flatnonzero(np.r_[True, c[1:] != c[:-1]])
+        n = np.diff(np.r_[debuts, len(c)])
+        mediane[c[debuts]] = (v[debuts + (n - 1) // 2] + v[debuts + n // 2]) / 2
+
+    forme = (24, n_lat, n_lon)
+    return {
+        "latitudes": bords_lat,
+        "longitudes": bords_lon,
+        "heures": np.arange(24),
+        "moyenne": moyenne.reshape(forme).astype(np.float32),
+        "mediane": mediane.reshape(forme).astype(np.float32),
+        "compte": compte.reshape(forme).astype(np.int32),
+    }
+
+
+@etape("parsing.madrigal")
+def _mesures(source, nom=None):
+    """Colonnes (HOUR, GDLAT, GLON, TEC) d'un fichier Madrigal ASCII ou HDF5."""
+    if nom is None:
+        nom = os.fspath(source) if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+    if str(nom).lower().endswith((".hdf5", ".h5")):
+        df = lire_tec_hdf5(source)
+        return df["HOUR"].to_numpy(), df["GDLAT"].to_numpy(), df["GLON"].to_numpy(), df["TEC"].to_numpy()
+
+    morceaux = [bloc for bloc in iterer_lignes_madrigal(source, nom=nom)]
+    colonnes = ("HOUR", "GDLAT", "GLON", "TEC")
+    return tuple(np.concatenate([b[c].to_numpy() for b in morceaux]) if morceaux else np.empty(0)
+                 for c in colonnes)
+
+
+def grille_madrigal(source, resolution=RESOLUTION_DEFAUT, dossier_cache=DOSSIER_CACHE, nom=None):
+    """
+    Grille horaire (moyenne, médiane, effectif) d'un fichier Madrigal, avec cache disque.
+
+    Le résultat est stocké dans `<dossier_cache>/madrigal_grilles/` sous la
+    clé (empreinte du contenu, résolution) : le binning n'est fait qu'une
+    fois par fichier.
+
+    Args:
+        source (str | file): chemin ou objet fichier binaire (seekable) d'un
+            fichier ASCII (éventuellement .gz) ou HDF5.
+        resolution (float): pas de la grille en degrés.
+        nom (str): nom d'origine, pour le format d'un objet fichier.
+    """
+    dossier = os.path.join(dossier_cache, "madrigal_grilles")
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, f"{cle_source(source, dossier_cache)}_{resolution:g}.npz")
+
+    if os.path.exists(chemin):
+        with np.load(chemin) as f:
+            return {cle: f[cle] for cle in f.files}
+
+    grille = binner_tec(*_mesures(source, nom), resolution=resolution)
+    tmp = chemin[:-4] + f".{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp, **grille)
+    os.replace(tmp, chemin)
+    return grille
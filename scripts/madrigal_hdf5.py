@@ -0,0 +1,78 @@
+import io
+import datetime
+import numpy as np
+import pandas as pd
+import h5py
+from scripts.profilage import etape
+
+# Table principale des fichiers Madrigal 3 (dataset composé, une ligne par mesure)
+CHEMIN_TABLE = "Data/Table Layout"
+COLONNES_CARTE = ("gdlat", "glon", "tec")
+
+
+def _bisection(colonne_temps, t, debut, fin):
+    """
+    Premier indice de [debut, fin) dont le temps est >= t.
+
+    Chaque accès ne lit qu'un élément : la recherche touche O(log n) blocs
+    du fichier au lieu de charger toute la colonne.
+    """
+    while debut < fin:
+        milieu = (debut + fin) // 2
+        if colonne_temps[milieu] < t:
+            debut = milieu + 1
+        else:
+            fin = milieu
+    return debut
+
+
+@etape("parsing.madrigal_hdf5")
+def lire_tec_hdf5(fichier, heure=None, debut=None, fin=None, colonnes=COLONNES_CARTE):
+    """
+    Lit une fenêtre temporelle d'un fichier TEC Madrigal HDF5.
+
+    Les lignes de la table étant triées par temps, la fenêtre est localisée
+    par bisection sur `ut1_unix`, puis seules les colonnes demandées des
+    lignes de cette fenêtre sont lues.
+
+    Args:
+        fichier (str | bytes | file): chemin, contenu en mémoire ou objet fichier
+            binaire (seekable) .hdf5.
+        heure (int | None): heure UTC du jour du fichier (fenêtre [h, h+1[).
+        debut, fin (datetime | None): fenêtre explicite (UTC), prioritaire sur `heure`.
+        colonnes (tuple): champs de la table à lire.
+
+    Returns:
+        pd.DataFrame: colonnes en majuscules (GDLAT, GLON, TEC...) plus HOUR et UT1_UNIX.
+    """
+    if isinstance(fichier, (bytes, bytearray, memoryview)):
+        fichier = io.BytesIO(fichier)
+    with h5py.File(fichier, "r") as h5:
+        if CHEMIN_TABLE not in h5:
+            raise ValueError(f"Table '{CHEMIN_TABLE}' absente : fichier Madrigal HDF5 inattendu.")
+        table = h5[CHEMIN_TABLE]
+        n = table.shape[0]
+        if n == 0:
+            raise ValueError("Le fichier ne contient aucune donnée.")
+
+        temps = table.fields("ut1_unix")
+        if debut is None and fin is None and heure is not None:
+            jour = datetime.datetime.fromtimestamp(float(temps[0]), tz=datetime.timezone.utc).replace(
+                hour=0, minute=0, second=0, microsecond=0)
+            debut = jour + datetime.timedelta(hours=heure)
+            fin = debut + datetime.timedelta(hours=1)
+
+        def _horodatage(t):
+            if t.tzinfo is None:
+                t = t.replace(tzinfo=datetime.timezone.utc)
+            return t.timestamp()
+
+        i0 = 0 if debut is None else _bisection(temps, _horodatage(debut), 0, n)
+        i1 = n if fin is None else _bisection(temps, _horodatage(fin), i0, n)
+
+        champs = list(dict.fromkeys(["ut1_unix", *colonnes]))
+        lignes = table.fields(champs)[i0:i1] if i1 > i0 else np.empty(0, dtype=table.dtype)
+
+    df = pd.DataFrame({c.upper(): np.asarray(lignes[c]) for c in champs})
+    df["HOUR"] = pd.to_datetime(df["UT1_UNIX"], unit="s").dt.hour
+    return df
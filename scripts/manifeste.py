@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+import tempfile
+import datetime
+from scripts.verrou import verrou_fichier
+
+NOM_MANIFESTE = "manifeste.json"
+
+
+def chemin_manifeste(dossier):
+    return os.path.join(dossier, NOM_MANIFESTE)
+
+
+def charger_manifeste(dossier):
+    """
+    Charge le manifeste d'un dossier d'archive.
+
+    Returns:
+        dict: {"<source>:<YYYY-MM-DD>": {date, source, chemin, taille, sha256, distant, maj}}
+    """
+    try:
+        with open(chemin_manifeste(dossier), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def sauver_manifeste(dossier, manifeste):
+    """Écrit le manifeste de façon atomique (fichier temporaire puis os.replace)."""
+    os.makedirs(dossier, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dossier, prefix=".manifeste_")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, indent=1, sort_keys=True)
+    os.replace(tmp, chemin_manifeste(dossier))
+
+
+def _cle(source, date_obj):
+    return f"{source}:{date_obj.isoformat()}"
+
+
+def sha256_fichier(chemin, taille_bloc=1024 * 1024):
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(taille_bloc), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def enregistrer_produit(manifeste, source, date_obj, chemin, distant=None):
+    """Ajoute ou met à jour l'entrée d'un produit téléchargé."""
+    manifeste[_cle(source, date_obj)] = {
+        "date": date_obj.isoformat(),
+        "source": source,
+        "chemin": os.path.abspath(chemin),
+        "taille": os.path.getsize(chemin),
+        "sha256": sha256_fichier(chemin),
+        "distant": distant,
+        "maj": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def memoriser_produit(dossier, source, date_obj, chemin, distant=None):
+    """
+    Enregistre un produit et sauve aussitôt le manifeste du dossier.
+
+    Prévu pour être appelé après chaque jour téléchargé, y compris depuis
+    plusieurs threads ou processus : le manifeste est relu puis réécrit
+    sous verrou, si bien qu'une exécution interrompue garde les jours déjà
+    récupérés et que les écritures concurrentes ne s'écrasent pas.
+    """
+    produit = {}
+    enregistrer_produit(produit, source, date_obj, chemin, distant)  # SHA-256 calculé hors verrou
+    os.makedirs(dossier, exist_ok=True)
+    with verrou_fichier(chemin_manifeste(dossier)):
+        manifeste = charger_manifeste(dossier)
+        manifeste.update(produit)
+        sauver_manifeste(dossier, manifeste)
+
+
+def produit_a_jour(manifeste, source, date_obj, distant=None, verifier_checksum=False):
+    """
+    Indique si le produit d'une date est déjà présent et inchangé.
+
+    Le fichier local doit exister avec la taille enregistrée (et le même
+    SHA-256 si `verifier_checksum`). Si des métadonnées distantes sont
+    fournies (taille, date de modification), elles doivent correspondre à
+    celles du téléchargement précédent.
+    """
+    entree = manifeste.get(_cle(source, date_obj))
+    if not entree:
+        return False
+    chemin = entree["chemin"]
+    if not os.path.isfile(chemin) or os.path.getsize(chemin) != entree["taille"]:
+        return False
+    if distant and entree.get("distant") and distant != entree["distant"]:
+        return False
+    if verifier_checksum and sha256_fichier(chemin) != entree["sha256"]:
+        return False
+    return True
+
+
+def dates_manquantes(manifeste, source, dates, verifier_checksum=False):
+    """Dates de la liste dont le produit est absent ou altéré localement."""
+    return [d for d in dates if not produit_a_jour(manifeste, source, d, verifier_checksum=verifier_checksum)]
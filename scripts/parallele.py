@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def nombre_workers(n_workers):
+    """Normalise le nombre de processus demandé (0 ou négatif → tous les cœurs)."""
+    if n_workers is None:
+        return 1
+    if n_workers <= 0:
+        return os.cpu_count() or 1
+    return n_workers
+
+
+def executer_par_fichier(fonction, fichiers, *args, n_workers=None, rappel=None):
+    """
+    Applique `fonction(fichier, *args)` à chaque fichier, en parallèle si demandé.
+
+    L'exécution reste séquentielle par défaut (n_workers=None ou 1). Au-delà,
+    les fichiers sont répartis sur un ProcessPoolExecutor ; `fonction` doit
+    donc être définie au niveau module et son résultat sérialisable.
+
+    Args:
+        fonction (callable): traitement d'un fichier.
+        fichiers (list[str]): fichiers à traiter.
+        n_workers (int | None): nombre de processus (0 → tous les cœurs).
+        rappel (callable | None): appelé dans le processus principal après chaque
+            fichier, dans l'ordre de fin, avec (fichier, résultat, message d'erreur) ;
+            l'un des deux derniers vaut None.
+
+    Returns:
+        tuple: (resultats, echecs) où resultats est la liste des
+        (fichier, résultat) dans l'ordre d'entrée et echecs la liste des
+        (fichier, message d'erreur).
+    """
+    n_workers = min(nombre_workers(n_workers), max(len(fichiers), 1))
+    resultats, echecs = {}, {}
+
+    if n_workers == 1:
+        for fichier in fichiers:
+            try:
+                resultats[fichier] = fonction(fichier, *args)
+            except Exception as e:
+                echecs[fichier] = str(e)
+            if rappel is not None:
+                rappel(fichier, resultats.get(fichier), echecs.get(fichier))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executeur:
+            futures = {executeur.submit(fonction, fichier, *args): fichier for fichier in fichiers}
+            for future in as_completed(futures):
+                fichier = futures[future]
+                try:
+                    resultats[fichier] = future.result()
+                except Exception as e:
+                    echecs[fichier] = str(e)
+                if rappel is not None:
+                    rappel(fichier, resultats.get(fichier), echecs.get(fichier))
+
+    # Fusion dans l'ordre d'entrée, indépendamment de l'ordre de fin des processus
+    return ([(f, resultats[f]) for f in fichiers if f in resultats],
+            [(f, echecs[f]) for f in fichiers if f in echecs])
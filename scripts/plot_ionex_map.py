@@ -1,88 +1,202 @@
+import io
+import os
+import warnings
 import numpy as np
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-import re
-
-def afficher_carte_TEC_fichier(fichier_ionex, heure_utc=12, epicenter_lat=None, epicenter_lon=None):
-    with open(fichier_ionex, "r") as f:
-        lines = f.readlines()
-
-    start_indices = [i for i, line in enumerate(lines) if "START OF TEC MAP" in line]
-    end_indices = [i for i, line in enumerate(lines) if "END OF TEC MAP" in line]
-
-    heure_maps = []
-    lats_total = []
-    longitudes = None
-
-    for start, end in zip(start_indices, end_indices):
-        # Vérifier l'heure
-        date_line = lines[start + 1]
-        parts = date_line.strip().split()
-        heure_carte = int(parts[3])
-        if heure_carte != heure_utc:
-            continue
-
-        tec_map = []
-        lats = []
-        i = start + 2
-        while i < end:
-            line = lines[i]
-            if "LAT/LON1/LON2/DLON/H" in line:
-                match = re.findall(r"(-?\d+\.\d+|-?\d+)", line)
-                if len(match) < 4:
-                    i += 1
-                    continue
-                lat = float(match[0])
-                lon1 = float(match[1])
-                lon2 = float(match[2])
-                dlon = float(match[3])
-                if longitudes is None:
-                    longitudes = np.arange(lon1, lon2 + dlon, dlon)
-
-                data_row = []
-                j = i + 1
-                while j < end and "LAT/LON1/LON2/DLON/H" not in lines[j] and "END OF TEC MAP" not in lines[j]:
-                    row_values = [float(val) for val in re.findall(r"-?\d+", lines[j])]
-                    data_row.extend(row_values)
-                    j += 1
-
-                tec_map.append(data_row[:len(longitudes)])
-                lats.append(lat)
-                i = j
-            else:
-                i += 1
-
-        if tec_map:
-            heure_maps.append(np.array(tec_map))
-            lats_total = lats
-
-
-    if not heure_maps:
-        raise ValueError("Aucune carte TEC trouvée pour l'heure UTC spécifiée.")
+from scripts.ionex_cache import DOSSIER_CACHE, charger_ionex
+from scripts.fond_carte import ajouter_fond_de_carte
+from scripts.decompression import extension_compression
+from scripts.index_ionex import lire_cartes_heure
+from scripts.profilage import etape
+
+STATISTIQUES_JOUR = ("moyenne", "min", "max")
+
+
+def _jeu(fichier_ionex, dossier_cache=DOSSIER_CACHE):
+    # Chemin, contenu brut ou jeu déjà chargé (dict renvoyé par charger_ionex)
+    return fichier_ionex if isinstance(fichier_ionex, dict) else charger_ionex(fichier_ionex, dossier_cache)
+
+
+def cartes_par_heure(ds):
+    """
+    Carte TEC moyenne de chaque heure UTC, calculée en un passage sur toutes les cartes.
+
+    Les cartes de même heure (ex. 00:00 et 24:00 d'un fichier journalier)
+    sont moyennées, les NaN étant ignorés.
+
+    Returns:
+        tuple: (heures (n,) présentes, cartes (n, n_lat, n_lon))
+    """
+    heures = ds["epoques"].astype("datetime64[h]").astype(np.int64) % 24
+    tec = np.asarray(ds["tec"], dtype=np.float64)
+    valides = np.isfinite(tec)
+
+    sommes = np.zeros((24,) + tec.shape[1:])
+    comptes = np.zeros((24,) + tec.shape[1:])
+    np.add.at(sommes, heures, np.where(valides, tec, 0.0))
+    np.add.at(comptes, heures, valides)
+
+    presentes = np.unique(heures)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        moyennes = sommes[presentes] / comptes[presentes]
+    return presentes, moyennes.astype(np.float32)
 
-    tec_mean = np.nanmean(np.stack(heure_maps), axis=0)
-    latitudes = np.array(lats_total)
-    longitudes = np.array(longitudes)
+
+def statistiques_journalieres(ds):
+    """Cartes minimum, maximum et moyenne du TEC sur toutes les époques du fichier (NaN si aucune donnée)."""
+    tec = np.asarray(ds["tec"])
+    with warnings.catch_warnings():
+        # Nœuds sans aucune donnée sur la journée : NaN, sans avertissement
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {
+            "moyenne": np.nanmean(tec, axis=0),
+            "min": np.nanmin(tec, axis=0),
+            "max": np.nanmax(tec, axis=0),
+        }
+
+
+def _tracer_carte(ax, carte, latitudes, longitudes, epicenter_lat=None, epicenter_lon=None,
+                  niveaux=100, legende=True, dossier_cache=DOSSIER_CACHE):
+    """Trace une carte TEC (contourf) sur des axes PlateCarree avec le fond de carte en cache."""
     lon_grid, lat_grid = np.meshgrid(longitudes, latitudes)
 
-    # === Affichage avec Cartopy ===
-    fig, ax = plt.subplots(figsize=(10, 6), subplot_kw={"projection": ccrs.PlateCarree()})
-    ax.set_global()
-    ax.coastlines()
-    ax.add_feature(cfeature.BORDERS, linestyle=':')
-    ax.add_feature(cfeature.LAND, facecolor='lightgray')
-    ax.add_feature(cfeature.OCEAN, facecolor='white')
+    # Fond de carte rastérisé une seule fois puis réutilisé
+    ajouter_fond_de_carte(ax, "carte_globale", dossier_cache=dossier_cache)
 
-    contour = ax.contourf(lon_grid, lat_grid, tec_mean, levels=100, cmap="jet", transform=ccrs.PlateCarree())
+    contour = ax.contourf(lon_grid, lat_grid, carte, levels=niveaux, cmap="jet", transform=ccrs.PlateCarree())
 
     if epicenter_lat is not None and epicenter_lon is not None:
         ax.plot(epicenter_lon, epicenter_lat, marker='*', color='black', markersize=12,
                 label="Épicentre", transform=ccrs.PlateCarree())
-        ax.legend(loc="upper right")
+        if legende:
+            ax.legend(loc="upper right")
+    return contour
 
-    ax.set_title(f"Carte TEC Globale - Heure UTC {heure_utc}", fontsize=14)
+
+def _figure_carte(carte, latitudes, longitudes, titre, epicenter_lat=None, epicenter_lon=None,
+                  dossier_cache=DOSSIER_CACHE):
+    fig, ax = plt.subplots(figsize=(10, 6), subplot_kw={"projection": ccrs.PlateCarree()})
+    contour = _tracer_carte(ax, carte, latitudes, longitudes, epicenter_lat, epicenter_lon,
+                            dossier_cache=dossier_cache)
+
+    ax.set_title(titre, fontsize=14)
     cbar = fig.colorbar(contour, ax=ax, orientation='horizontal', fraction=0.046, pad=0.04)
     cbar.set_label("TEC (TECU)", fontsize=12)
+    return fig
+
 
+def _cartes_heure(fichier_ionex, heure_utc, dossier_cache=DOSSIER_CACHE):
+    if isinstance(fichier_ionex, (str, os.PathLike)) and not extension_compression(os.fspath(fichier_ionex)):
+        # Fichier non compressé : seules les cartes de l'heure sont lues, via l'index des blocs
+        r = lire_cartes_heure(fichier_ionex, heure_utc, dossier_cache=dossier_cache)
+        return r["cartes"], r["latitudes"], r["longitudes"]
+
+    ds = _jeu(fichier_ionex, dossier_cache)
+    # Sélection des cartes dont l'heure correspond
+    heures = ds["epoques"].astype("datetime64[h]").astype(np.int64) % 24
+    return ds["tec"][heures == heure_utc], ds["latitudes"], ds["longitudes"]
+
+
+@etape("rendu.carte_heure")
+def afficher_carte_TEC_fichier(fichier_ionex, heure_utc=12, epicenter_lat=None, epicenter_lon=None,
+                               dossier_cache=DOSSIER_CACHE):
+    heure_maps, latitudes, longitudes = _cartes_heure(fichier_ionex, heure_utc, dossier_cache)
+
+    if len(heure_maps) == 0:
+        raise ValueError("Aucune carte TEC trouvée pour l'heure UTC spécifiée.")
+
+    tec_mean = np.nanmean(heure_maps, axis=0)
+
+    # === Affichage avec Cartopy ===
+    return _figure_carte(tec_mean, latitudes, longitudes, f"Carte TEC Globale - Heure UTC {heure_utc}",
+                         epicenter_lat, epicenter_lon, dossier_cache)
+
+
+@etape("rendu.carte_statistique")
+def afficher_carte_statistique(fichier_ionex, statistique="moyenne", epicenter_lat=None, epicenter_lon=None,
+                               dossier_cache=DOSSIER_CACHE):
+    """
+    Carte journalière du TEC minimum, maximum ou moyen (réduction sur l'axe du temps).
+
+    Args:
+        fichier_ionex (str | bytes | dict): fichier IONEX ou jeu déjà chargé.
+        statistique (str): "moyenne", "min" ou "max".
+        dossier_cache (str): cache des jeux IONEX et du fond de carte.
+    """
+    if statistique not in STATISTIQUES_JOUR:
+        raise ValueError(f"Statistique inconnue : {statistique}")
+    ds = _jeu(fichier_ionex, dossier_cache)
+    carte = statistiques_journalieres(ds)[statistique]
+    return _figure_carte(carte, ds["latitudes"], ds["longitudes"], f"Carte TEC Globale - {statistique} journalier",
+                         epicenter_lat, epicenter_lon, dossier_cache)
+
+
+@etape("rendu.mosaique")
+def afficher_cartes_TEC_toutes_heures(fichier_ionex, epicenter_lat=None, epicenter_lon=None, colonnes=6,
+                                      dossier_cache=DOSSIER_CACHE):
+    """
+    Mosaïque des cartes TEC de toutes les heures, à échelle de couleur commune.
+
+    Le fichier n'est lu qu'une fois ; les cartes horaires sont obtenues par
+    cartes_par_heure().
+
+    Returns:
+        matplotlib.figure.Figure
+    """
+    ds = _jeu(fichier_ionex, dossier_cache)
+    heures, cartes = cartes_par_heure(ds)
+    niveaux = np.linspace(np.nanmin(cartes), np.nanmax(cartes), 51)
+
+    lignes = -(-len(heures) // colonnes)
+    fig, axes = plt.subplots(lignes, colonnes, figsize=(3 * colonnes, 1.8 * lignes + 1),
+                             subplot_kw={"projection": ccrs.PlateCarree()}, squeeze=False)
+    for ax in axes.flat[len(heures):]:
+        ax.set_visible(False)
+
+    for ax, heure, carte in zip(axes.flat, heures, cartes):
+        contour = _tracer_carte(ax, carte, ds["latitudes"], ds["longitudes"], epicenter_lat, epicenter_lon,
+                                niveaux=niveaux, legende=False, dossier_cache=dossier_cache)
+        ax.set_title(f"{heure:02d}h UTC", fontsize=10)
+
+    cbar = fig.colorbar(contour, ax=axes, orientation='horizontal', fraction=0.03, pad=0.06)
+    cbar.set_label("TEC (TECU)", fontsize=12)
     return fig
+
+
+@etape("rendu.images_horaires")
+def images_par_heure(fichier_ionex, epicenter_lat=None, epicenter_lon=None, dpi=80, dossier_cache=DOSSIER_CACHE):
+    """
+    Images PNG pré-rendues de chaque heure, pour un curseur horaire.
+
+    Une seule figure est construite ; seul le tracé TEC et le titre sont
+    remplacés d'une heure à l'autre, sur une échelle de couleur commune.
+
+    Returns:
+        dict: {heure (int): octets PNG}
+    """
+    ds = _jeu(fichier_ionex, dossier_cache)
+    heures, cartes = cartes_par_heure(ds)
+    latitudes, longitudes = ds["latitudes"], ds["longitudes"]
+    niveaux = np.linspace(np.nanmin(cartes), np.nanmax(cartes), 101)
+
+    fig, ax = plt.subplots(figsize=(10, 6), subplot_kw={"projection": ccrs.PlateCarree()})
+    contour = _tracer_carte(ax, cartes[0], latitudes, longitudes, epicenter_lat, epicenter_lon, niveaux=niveaux,
+                            dossier_cache=dossier_cache)
+    cbar = fig.colorbar(contour, ax=ax, orientation='horizontal', fraction=0.046, pad=0.04)
+    cbar.set_label("TEC (TECU)", fontsize=12)
+    lon_grid, lat_grid = np.meshgrid(longitudes, latitudes)
+
+    images = {}
+    try:
+        for heure, carte in zip(heures, cartes):
+            contour.remove()
+            contour = ax.contourf(lon_grid, lat_grid, carte, levels=niveaux, cmap="jet",
+                                  transform=ccrs.PlateCarree())
+            ax.set_title(f"Carte TEC Globale - Heure UTC {heure}", fontsize=14)
+            tampon = io.BytesIO()
+            fig.savefig(tampon, format="png", dpi=dpi)
+            images[int(heure)] = tampon.getvalue()
+    finally:
+        plt.close(fig)
+    return images
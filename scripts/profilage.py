@@ -0,0 +1,195 @@
+"""
+Instrumentation légère des étapes de traitement (temps, CPU, octets lus, mémoire).
+
+Les étapes sont délimitées par `etape(nom)`, utilisable comme gestionnaire
+de contexte ou comme décorateur. Elles ne sont enregistrées que si un
+journal est actif dans le contexte courant (voir `activer_journal`) : sans
+journal, une étape ne coûte qu'une lecture de variable de contexte.
+
+Le journal est propre au contexte d'exécution (une session Streamlit, un
+script) ; les fonctions lancées dans des threads le reçoivent via
+`propager_contexte`. Les processus de calcul parallèles ne sont pas suivis.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+import functools
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_JOURNAL = contextvars.ContextVar("journal_profilage", default=None)
+_PARENTS = contextvars.ContextVar("etapes_parentes", default=())
+
+# ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+_UNITE_MAXRSS = 1 if sys.platform == "darwin" else 1024
+
+
+def octets_lus():
+    """Octets lus par le processus depuis son démarrage (fichiers et réseau), si le système l'expose."""
+    try:
+        with open("/proc/self/io", "rb") as f:
+            for ligne in f:
+                if ligne.startswith(b"rchar:"):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def pic_rss():
+    """Pic de mémoire résidente du processus (octets), si le système l'expose."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _UNITE_MAXRSS
+
+
+class Journal:
+    """Liste des étapes mesurées pendant une action (une exécution du script Streamlit, par exemple)."""
+
+    def __init__(self):
+        self.origine = time.perf_counter()
+        self.etapes = []
+        self._verrou = threading.Lock()
+
+    def ajouter(self, etape):
+        with self._verrou:
+            self.etapes.append(etape)
+
+    def lignes(self):
+        """Étapes triées par début, avec leurs mesures (dicts sérialisables)."""
+        with self._verrou:
+            return sorted(self.etapes, key=lambda e: e["debut_s"])
+
+    def resume(self):
+        """
+        Totaux par nom d'étape, dans l'ordre de première apparition.
+
+        Les étapes imbriquées sont comptées dans leur parent comme dans
+        elles-mêmes : les totaux ne s'additionnent pas d'un nom à l'autre.
+        """
+        totaux = {}
+        for e in self.lignes():
+            t = totaux.setdefault(e["nom"], {"nom": e["nom"], "appels": 0, "duree_s": 0.0, "cpu_s": 0.0,
+                                             "octets_lus": None, "hausse_pic_rss_octets": None})
+            t["appels"] += 1
+            t["duree_s"] += e["duree_s"]
+            t["cpu_s"] += e["cpu_s"]
+            for cle in ("octets_lus", "hausse_pic_rss_octets"):
+                if e[cle] is not None:
+                    t[cle] = (t[cle] or 0) + e[cle]
+        return list(totaux.values())
+
+    def exporter_json(self):
+        """Journal structuré : une étape par objet, durées en secondes et tailles en octets."""
+        return json.dumps({"pid": os.getpid(), "etapes": self.lignes()}, indent=2, ensure_ascii=False)
+
+    def exporter_chrome_trace(self):
+        """Trace au format Chrome Trace Event (chrome://tracing, Perfetto) : un événement « X » par étape."""
+        evenements = []
+        for e in self.lignes():
+            evenements.append({
+                "name": e["nom"],
+                "cat": e["nom"].split(".")[0],
+                "ph": "X",
+                "ts": e["debut_s"] * 1e6,
+                "dur": e["duree_s"] * 1e6,
+                "pid": os.getpid(),
+                "tid": e["thread"],
+                "args": {cle: valeur for cle, valeur in e.items()
+                         if cle not in ("nom", "debut_s", "duree_s", "thread")},
+            })
+        return json.dumps({"traceEvents": evenements, "displayTimeUnit": "ms"})
+
+
+def activer_journal(journal):
+    """
+    Installe `journal` (ou None pour ne rien mesurer) dans le contexte courant.
+
+    Returns:
+        jeton à passer à desactiver_journal() pour rétablir le journal précédent.
+    """
+    return _JOURNAL.set(journal)
+
+
+def desactiver_journal(jeton):
+    _JOURNAL.reset(jeton)
+
+
+class etape:
+    """
+    Étape mesurée : temps écoulé, temps CPU du processus, octets lus et pic RSS.
+
+    Exemples :
+        with etape("parsing.ionex", fichier=nom):
+            ...
+
+        @etape("rendu.carte_globale")
+        def afficher_carte(...):
+            ...
+
+    Les mesures CPU, octets lus et pic RSS portent sur tout le processus :
+    des traitements simultanés d'autres sessions peuvent s'y ajouter.
+    """
+
+    def __init__(self, nom, **attributs):
+        self.nom = nom
+        self.attributs = attributs
+        self._etat = None
+
+    def __call__(self, fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            with etape(self.nom, **self.attributs):
+                return fonction(*args, **kwargs)
+        return enveloppe
+
+    def __enter__(self):
+        journal = _JOURNAL.get()
+        if journal is None:
+            return self
+        parents = _PARENTS.get()
+        jeton = _PARENTS.set(parents + (self.nom,))
+        self._etat = (journal, jeton, len(parents), time.perf_counter(), time.process_time(),
+                      octets_lus(), pic_rss())
+        return self
+
+    def __exit__(self, type_erreur, erreur, trace):
+        if self._etat is None:
+            return False
+        journal, jeton, profondeur, debut, cpu, lus, rss = self._etat
+        fin = time.perf_counter()
+        cpu_fin, lus_fin, rss_fin = time.process_time(), octets_lus(), pic_rss()
+        _PARENTS.reset(jeton)
+        self._etat = None
+
+        journal.ajouter({
+            "nom": self.nom,
+            "debut_s": debut - journal.origine,
+            "duree_s": fin - debut,
+            "cpu_s": cpu_fin - cpu,
+            "octets_lus": None if lus is None or lus_fin is None else lus_fin - lus,
+            "pic_rss_octets": rss_fin,
+            "hausse_pic_rss_octets": None if rss is None else rss_fin - rss,
+            "profondeur": profondeur,
+            "thread": threading.get_ident(),
+            "erreur": None if erreur is None else f"{type_erreur.__name__}: {erreur}",
+            **self.attributs,
+        })
+        return False
+
+
+def propager_contexte(fonction):
+    """Enveloppe `fonction` pour qu'elle s'exécute (dans un thread) avec le journal du contexte appelant."""
+    contexte = contextvars.copy_context()
+
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        # Une copie par appel : un même contexte ne peut être actif dans deux threads à la fois
+        return contexte.copy().run(fonction, *args, **kwargs)
+    return enveloppe
@@ -0,0 +1,12 @@
+import io
+import matplotlib.pyplot as plt
+from scripts.profilage import etape
+
+
+@etape("rendu.png")
+def figure_en_png(fig, dpi=100):
+    """Sérialise une figure matplotlib en PNG puis la ferme."""
+    tampon = io.BytesIO()
+    fig.savefig(tampon, format="png", dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    return tampon.getvalue()
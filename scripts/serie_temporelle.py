@@ -2,33 +2,76 @@
 
 import pandas as pd
 import matplotlib.pyplot as plt
+from scripts.anomalies import ligne_de_base, FENETRE_DEFAUT
+from scripts.sortie_series import COLONNE_TEMPS, lire_series, colonnes_series, colonnes_numeriques
 
-def afficher_serie_temporelle_tec(excel_file, seisme_str, k=2):
+# Format long (generer_series_TEC_multi_sites) : une ligne par (date, site)
+COLONNE_SITE = "Site"
+COLONNE_TEC = "TEC"
+
+def _format_long(noms):
+    return COLONNE_SITE in noms and COLONNE_TEC in noms
+
+def series_disponibles(chemin):
+    """Séries affichables d'un fichier : les sites en format long, les colonnes numériques en format large."""
+    if _format_long(colonnes_series(chemin)):
+        sites = lire_series(chemin, colonnes=[COLONNE_SITE])[COLONNE_SITE]
+        return list(pd.unique(sites.astype(str)))
+    return colonnes_numeriques(chemin)
+
+def _lire_serie(chemin, serie=None):
+    """Colonnes (dates, TEC) de la série `serie` (par défaut la première disponible)."""
+    serie = serie or series_disponibles(chemin)[0]
+    if _format_long(colonnes_series(chemin)):
+        df = lire_series(chemin, colonnes=[COLONNE_TEMPS, COLONNE_SITE, COLONNE_TEC])
+        df = df[df[COLONNE_SITE].astype(str) == str(serie)].reset_index(drop=True)
+        return df[[COLONNE_TEMPS, COLONNE_TEC]]
+    return lire_series(chemin, colonnes=[colonnes_series(chemin)[0], serie])
+
+def afficher_serie_temporelle_tec(excel_file, seisme_str, k=2, methode="globale", fenetre=FENETRE_DEFAUT,
+                                  colonne=None):
     """
     Affiche la série temporelle du TEC avec la date du séisme,
     les limites de contrôle (UCL/LCL) et les anomalies détectées.
 
     Args:
-        excel_file (str): Chemin vers le fichier Excel contenant les données TEC.
+        excel_file (str): Chemin vers le fichier de séries TEC (.parquet, .feather, .xlsx ou .csv).
         seisme_str (str): Date et heure du séisme (format: "YYYY-MM-DD HH:MM:SS").
         k (int): Facteur pour les limites de contrôle (par défaut k=2 pour Mw >= 6.0).
+        methode (str): "globale" (moyenne ± kσ sur toute la série), ou ligne de base
+            glissante par heure UTC sur les `fenetre` jours précédents : "mediane" (± k·IQR)
+            ou "moyenne" (± kσ).
+        fenetre (int): Nombre de jours de la ligne de base glissante (ex. 15 ou 27).
+        colonne (str | None): Série à afficher : colonne en format large, site en
+            format long (par défaut la première de series_disponibles()) ; en
+            Parquet / Feather, seules les colonnes utiles sont lues.
 
     Returns:
         fig (matplotlib.figure.Figure): Figure contenant le graphique.
     """
-    df = pd.read_excel(excel_file)
+    df = _lire_serie(excel_file, colonne)
     df["Date"] = pd.to_datetime(df.iloc[:, 0])
     df["TEC"] = df.iloc[:, 1]
 
-    # Statistiques
-    mean_tec = df["TEC"].mean()
-    std_tec = df["TEC"].std()
-    UCL = mean_tec + k * std_tec
-    LCL = mean_tec - k * std_tec
+    if methode == "globale":
+        # Statistiques
+        mean_tec = df["TEC"].mean()
+        std_tec = df["TEC"].std()
+        UCL = mean_tec + k * std_tec
+        LCL = mean_tec - k * std_tec
 
-    # Z-score et détection d'anomalies
-    df["Z-score"] = (df["TEC"] - mean_tec) / std_tec
-    df["Anomalie"] = (df["TEC"] > UCL) | (df["TEC"] < LCL)
+        # Z-score et détection d'anomalies
+        df["Z-score"] = (df["TEC"] - mean_tec) / std_tec
+        df["Anomalie"] = (df["TEC"] > UCL) | (df["TEC"] < LCL)
+    else:
+        # Ligne de base par heure du jour : retire la variation diurne et saisonnière
+        df = df.sort_values("Date").reset_index(drop=True)
+        base = ligne_de_base(df["Date"].to_numpy(dtype="datetime64[s]"), df["TEC"].to_numpy(dtype=float),
+                             fenetre=fenetre, methode=methode, k=k)
+        df["UCL"] = base["haut"]
+        df["LCL"] = base["bas"]
+        df["Indice"] = base["indice"]
+        df["Anomalie"] = base["anomalie"]
 
     # Graphique
     seisme_date = pd.to_datetime(seisme_str)
@@ -36,8 +79,13 @@ def afficher_serie_temporelle_tec(excel_file, seisme_str, k=2):
 
     ax.plot(df["Date"], df["TEC"], label="TEC", color="blue")
     ax.axvline(x=seisme_date, color='red', linestyle='--', linewidth=2, label="Séisme")
-    ax.axhline(UCL, color='green', linestyle='--', linewidth=1.5, label=f'UCL (+{k}σ)')
-    ax.axhline(LCL, color='green', linestyle='--', linewidth=1.5, label=f'LCL (-{k}σ)')
+    if methode == "globale":
+        ax.axhline(UCL, color='green', linestyle='--', linewidth=1.5, label=f'UCL (+{k}σ)')
+        ax.axhline(LCL, color='green', linestyle='--', linewidth=1.5, label=f'LCL (-{k}σ)')
+    else:
+        centre, ecart = ("Médiane", "IQR") if methode == "mediane" else ("Moyenne", "σ")
+        ax.fill_between(df["Date"], df["LCL"], df["UCL"], color='green', alpha=0.2,
+                        label=f'{centre} glissante {fenetre} j ± {k}·{ecart}')
 
     # Anomalies en orange
     anomalies = df[df["Anomalie"]]
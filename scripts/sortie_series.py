@@ -0,0 +1,252 @@
+import os
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from scripts.profilage import etape
+
+# Format déduit de l'extension du fichier de sortie
+FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".xlsx": "excel",
+    ".csv": "csv",
+}
+COLONNE_TEMPS = "DateTime"
+# Lignes converties et écrites à la fois (un groupe de lignes Parquet / un lot Arrow)
+TAILLE_LOT = 500_000
+COMPRESSION = "zstd"
+
+
+def format_fichier(chemin, format_sortie=None):
+    """Format ("parquet", "feather", "excel" ou "csv") imposé ou déduit de l'extension."""
+    if format_sortie is None:
+        format_sortie = FORMATS.get(os.path.splitext(str(chemin))[1].lower())
+    if format_sortie not in FORMATS.values():
+        raise ValueError(f"Format de fichier de séries inconnu : {format_sortie or chemin}")
+    return format_sortie
+
+
+def _lots_existants(chemin, format_sortie):
+    """Lots Arrow d'un fichier Parquet / Feather existant, lus un par un."""
+    if format_sortie == "parquet":
+        yield from pq.ParquetFile(chemin).iter_batches(batch_size=TAILLE_LOT)
+    else:
+        with pa.memory_map(chemin) as source:
+            lecteur = ipc.open_file(source)
+            for i in range(lecteur.num_record_batches):
+                yield lecteur.get_batch(i)
+
+
+def _schema_existant(chemin, format_sortie):
+    if format_sortie == "parquet":
+        return pq.read_schema(chemin)
+    with pa.memory_map(chemin) as source:
+        return ipc.open_file(source).schema
+
+
+class EcrivainSeries:
+    """
+    Écrit un tableau de séries TEC par lots, en Parquet, Feather, Excel ou CSV.
+
+    Parquet et Feather sont écrits en flux : chaque appel à ajouter() produit
+    un ou plusieurs groupes de lignes, sans garder le tableau complet en
+    mémoire. Avec `ajouter_a_existant`, les lignes d'un fichier déjà présent
+    sont recopiées lot par lot avant les nouvelles (même schéma requis).
+    Le fichier final remplace l'ancien à la fermeture seulement, si bien
+    qu'une écriture interrompue ne laisse jamais de fichier tronqué.
+    L'export Excel, optionnel, est écrit en une fois à la fermeture.
+    """
+
+    def __init__(self, chemin, format_sortie=None, ajouter_a_existant=False, taille_lot=TAILLE_LOT):
+        self.chemin = chemin
+        self.format = format_fichier(chemin, format_sortie)
+        self.taille_lot = taille_lot
+        self.existant = ajouter_a_existant and os.path.exists(chemin)
+        self._ecrivain = None
+        self._schema = None
+        self._tableaux = []
+        self._entete_ecrite = self.existant
+
+        dossier = os.path.dirname(chemin) or "."
+        os.makedirs(dossier, exist_ok=True)
+        fd, self._temporaire = tempfile.mkstemp(dir=dossier, suffix=os.path.splitext(chemin)[1])
+        os.close(fd)
+
+        try:
+            if self.existant and self.format in ("parquet", "feather"):
+                self._schema = _schema_existant(chemin, self.format)
+                self._ouvrir(self._schema)
+                for lot in _lots_existants(chemin, self.format):
+                    self._ecrire_lot(lot)
+            elif self.existant and self.format == "excel":
+                self._tableaux.append(pd.read_excel(chemin))
+            elif self.existant:
+                # CSV : les nouvelles lignes sont ajoutées à une copie du fichier
+                with open(chemin, "rb") as src, open(self._temporaire, "wb") as dst:
+                    while bloc := src.read(1024 * 1024):
+                        dst.write(bloc)
+        except BaseException:
+            self.annuler()
+            raise
+
+    def _ouvrir(self, schema):
+        if self.format == "parquet":
+            self._ecrivain = pq.ParquetWriter(self._temporaire, schema, compression=COMPRESSION)
+        else:
+            options = ipc.IpcWriteOptions(compression=COMPRESSION)
+            self._ecrivain = ipc.new_file(self._temporaire, schema, options=options)
+
+    def _ecrire_lot(self, lot):
+        if self.format == "parquet":
+            self._ecrivain.write_batch(lot, row_group_size=self.taille_lot)
+        else:
+            self._ecrivain.write_batch(lot)
+
+    def ajouter(self, df):
+        """Ajoute les lignes d'un DataFrame (colonnes identiques à chaque appel)."""
+        if self.format == "excel":
+            self._tableaux.append(df)
+            return
+        if self.format == "csv":
+            df.to_csv(self._temporaire, mode="a", header=not self._entete_ecrite, index=False)
+            self._entete_ecrite = True
+            return
+
+        for debut in range(0, len(df), self.taille_lot):
+            table = pa.Table.from_pandas(df.iloc[debut:debut + self.taille_lot], preserve_index=False)
+            if self._schema is None:
+                self._schema = table.schema.remove_metadata()
+                self._ouvrir(self._schema)
+            elif table.schema.names != self._schema.names:
+                raise ValueError(f"Colonnes incompatibles avec {self.chemin} : "
+                                 f"{table.schema.names} au lieu de {self._schema.names}")
+            for lot in table.cast(self._schema).to_batches(max_chunksize=self.taille_lot):
+                self._ecrire_lot(lot)
+
+    def fermer(self):
+        """Termine l'écriture et remplace le fichier de sortie ; renvoie son chemin."""
+        if self.format == "excel":
+            pd.concat(self._tableaux, ignore_index=True).to_excel(self._temporaire, index=False)
+        elif self._ecrivain is not None:
+            self._ecrivain.close()
+            self._ecrivain = None
+        os.replace(self._temporaire, self.chemin)
+        return self.chemin
+
+    def annuler(self):
+        """Abandonne l'écriture : le fichier de sortie d'origine reste inchangé."""
+        if self._ecrivain is not None:
+            self._ecrivain.close()
+            self._ecrivain = None
+        if os.path.exists(self._temporaire):
+            os.remove(self._temporaire)
+
+
+@etape("sortie.ecriture")
+def ecrire_series(df, chemin, format_sortie=None, ajouter=False, taille_lot=TAILLE_LOT):
+    """
+    Écrit un DataFrame de séries TEC dans le format déduit de l'extension.
+
+    Args:
+        df (pd.DataFrame): tableau à écrire (colonne "DateTime" en tête).
+        chemin (str): fichier .parquet, .feather, .xlsx ou .csv.
+        format_sortie (str | None): format imposé, sinon déduit de l'extension.
+        ajouter (bool): ajoute les lignes à un fichier existant au lieu de le remplacer.
+        taille_lot (int): lignes par groupe de lignes / lot écrit.
+
+    Returns:
+        str: chemin du fichier écrit.
+    """
+    ecrivain = EcrivainSeries(chemin, format_sortie, ajouter_a_existant=ajouter, taille_lot=taille_lot)
+    try:
+        ecrivain.ajouter(df)
+    except BaseException:
+        ecrivain.annuler()
+        raise
+    return ecrivain.fermer()
+
+
+def colonnes_series(chemin, format_sortie=None):
+    """Noms des colonnes d'un fichier de séries (schéma seul pour Parquet / Feather)."""
+    format_sortie = format_fichier(chemin, format_sortie)
+    if format_sortie in ("parquet", "feather"):
+        return _schema_existant(chemin, format_sortie).names
+    if format_sortie == "excel":
+        return pd.read_excel(chemin, nrows=0).columns.tolist()
+    return pd.read_csv(chemin, nrows=0).columns.tolist()
+
+
+def colonnes_numeriques(chemin, format_sortie=None):
+    """Colonnes numériques d'un fichier de séries (schéma seul pour Parquet / Feather, aperçu sinon)."""
+    format_sortie = format_fichier(chemin, format_sortie)
+    if format_sortie in ("parquet", "feather"):
+        schema = _schema_existant(chemin, format_sortie)
+        return [c.name for c in schema if pa.types.is_integer(c.type) or pa.types.is_floating(c.type)]
+    apercu = pd.read_excel(chemin, nrows=100) if format_sortie == "excel" else pd.read_csv(chemin, nrows=100)
+    return [c for c in apercu.columns if c != COLONNE_TEMPS and pd.api.types.is_numeric_dtype(apercu[c])]
+
+
+@etape("sortie.lecture")
+def lire_series(chemin, colonnes=None, debut=None, fin=None, format_sortie=None):
+    """
+    Lit un fichier de séries TEC.
+
+    En Parquet et Feather seules les colonnes demandées sont lues ; en
+    Parquet, les groupes de lignes hors de [debut, fin] sont en outre
+    ignorés grâce à leurs statistiques.
+
+    Args:
+        chemin (str): fichier .parquet, .feather, .xlsx ou .csv.
+        colonnes (list | None): colonnes à lire (toutes par défaut).
+        debut, fin (str | datetime | None): bornes incluses sur "DateTime".
+
+    Returns:
+        pd.DataFrame
+    """
+    format_sortie = format_fichier(chemin, format_sortie)
+    debut = None if debut is None else pd.Timestamp(debut)
+    fin = None if fin is None else pd.Timestamp(fin)
+
+    if format_sortie == "parquet":
+        filtres = [(COLONNE_TEMPS, op, borne) for op, borne in ((">=", debut), ("<=", fin)) if borne is not None]
+        df = pq.read_table(chemin, columns=colonnes, filters=filtres or None).to_pandas()
+    elif format_sortie == "feather":
+        df = pd.read_feather(chemin, columns=colonnes)
+    elif format_sortie == "excel":
+        df = pd.read_excel(chemin, usecols=colonnes)
+    else:
+        df = pd.read_csv(chemin, usecols=colonnes)
+        if COLONNE_TEMPS in df:
+            df[COLONNE_TEMPS] = pd.to_datetime(df[COLONNE_TEMPS])
+
+    if (debut is not None or fin is not None) and format_sortie != "parquet" and COLONNE_TEMPS in df:
+        temps = pd.to_datetime(df[COLONNE_TEMPS])
+        garder = (temps >= debut if debut is not None else True) & (temps <= fin if fin is not None else True)
+        df = df[garder].reset_index(drop=True)
+    return df
+
+
+def derniere_date(chemin, format_sortie=None):
+    """Dernière date d'un fichier de séries existant (None s'il est absent ou vide)."""
+    if not os.path.exists(chemin):
+        return None
+    format_sortie = format_fichier(chemin, format_sortie)
+    if format_sortie == "parquet":
+        # Maximum lu dans les statistiques des groupes de lignes quand elles existent
+        fichier = pq.ParquetFile(chemin)
+        indice = fichier.schema_arrow.get_field_index(COLONNE_TEMPS)
+        maxima = []
+        for i in range(fichier.num_row_groups):
+            stats = fichier.metadata.row_group(i).column(indice).statistics
+            if stats is None or not stats.has_min_max:
+                maxima = None
+                break
+            maxima.append(pd.Timestamp(stats.max))
+        if maxima is not None:
+            return max(maxima) if maxima else None
+    temps = lire_series(chemin, colonnes=[COLONNE_TEMPS], format_sortie=format_sortie)[COLONNE_TEMPS]
+    return pd.Timestamp(temps.max()) if len(temps) else None
@@ -0,0 +1,42 @@
+"""
+Synchronisation incrémentale de l'archive locale (tâche planifiée).
+
+Exemple :
+    python -m scripts.sync_archive igs 2024-01-01 2024-12-31 ionex_files
+    python -m scripts.sync_archive madrigal 2024-01-01 2024-01-31 ionex_madrigal
+"""
+import argparse
+from datetime import datetime
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Récupère uniquement les jours absents ou modifiés.")
+    parser.add_argument("source", choices=["igs", "madrigal"])
+    parser.add_argument("debut", help="date de début YYYY-MM-DD")
+    parser.add_argument("fin", help="date de fin YYYY-MM-DD")
+    parser.add_argument("dossier", help="dossier de l'archive (contient manifeste.json)")
+    parser.add_argument("--paralleles", type=int, default=4, help="téléchargements simultanés (IGS)")
+    parser.add_argument("--sans-verification-distante", action="store_true",
+                        help="ne pas comparer l'état distant au manifeste (taille/date IGS, "
+                             "expériences Madrigal)")
+    parser.add_argument("--forcer", action="store_true", help="ignorer le manifeste (Madrigal)")
+    args = parser.parse_args(argv)
+
+    debut = datetime.strptime(args.debut, "%Y-%m-%d").date()
+    fin = datetime.strptime(args.fin, "%Y-%m-%d").date()
+
+    if args.source == "igs":
+        from scripts.igs_downloader import download_and_uncompress_ionex
+        logs = download_and_uncompress_ionex(debut, fin, args.dossier, n_paralleles=args.paralleles,
+                                             verifier_distant=not args.sans_verification_distante)
+        for log in logs:
+            print(log)
+    else:
+        from scripts.madrigal_downloader import telecharger_donnees_tec
+        fichiers = telecharger_donnees_tec(debut, fin, args.dossier, forcer=args.forcer,
+                                           verifier_distant=not args.sans_verification_distante)
+        print(f"📦 {len(fichiers)} fichier(s) disponibles")
+
+
+if __name__ == "__main__":
+    main()
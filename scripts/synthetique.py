@@ -0,0 +1,183 @@
+"""
+Fichiers IONEX et Madrigal synthétiques, générés hors ligne pour les mesures de performance.
+
+Les cartes IONEX reprennent la grille des fichiers CODE (temp_ionex.ionex) :
+latitudes 87.5 à -87.5 par -2.5°, longitudes -180 à 180 par 5°, une carte
+par heure de 00:00 à 24:00, TEC et RMS en 0.1 TECU.
+"""
+import os
+import datetime
+import numpy as np
+
+GRILLE_LAT = (87.5, -87.5, -2.5)
+GRILLE_LON = (-180.0, 180.0, 5.0)
+HAUTEUR = 450.0
+EXPOSANT = -1
+INTERVALLE_S = 3600
+
+
+def _axe(debut, fin, pas):
+    return debut + pas * np.arange(int(round((fin - debut) / pas)) + 1)
+
+
+def tec_synthetique(epoque, latitudes, longitudes, rng=None):
+    """
+    Carte TEC plausible (TECU) : maximum diurne qui suit le Soleil, décroissance
+    vers les pôles et bruit aléatoire optionnel.
+    """
+    heure = (epoque - epoque.astype("datetime64[D]")) / np.timedelta64(1, "h")
+    lat = np.radians(np.asarray(latitudes))[:, None]
+    heure_locale = (heure + np.asarray(longitudes)[None, :] / 15.0) % 24
+    diurne = np.clip(np.cos((heure_locale - 14.0) * np.pi / 12.0), 0, None)
+    tec = 5.0 + 40.0 * np.cos(lat) ** 2 * diurne + 5.0 * np.cos(lat)
+    if rng is not None:
+        tec = tec + rng.normal(0.0, 1.0, tec.shape)
+    return np.clip(tec, 0.0, None)
+
+
+def _ligne(contenu, etiquette):
+    return f"{contenu:<60}{etiquette:<20}\n"
+
+
+def _epoque_i6(epoque):
+    d = epoque.astype(datetime.datetime)
+    return "".join(f"{v:6d}" for v in (d.year, d.month, d.day, d.hour, d.minute, d.second))
+
+
+def _bloc_carte(type_carte, numero, epoque, valeurs, latitudes, lon):
+    """Bloc START/END OF ... MAP au format IONEX (16I5 par ligne, 2X,5F6.1 pour les rangées)."""
+    lignes = [_ligne(f"{numero:6d}", f"START OF {type_carte} MAP"),
+              _ligne(_epoque_i6(epoque), "EPOCH OF CURRENT MAP")]
+    for lat, rangee in zip(latitudes, valeurs):
+        lignes.append(_ligne("  " + "".join(f"{v:6.1f}" for v in (lat, *lon, HAUTEUR)), "LAT/LON1/LON2/DLON/H"))
+        for k in range(0, len(rangee), 16):
+            lignes.append("".join(f"{v:5d}" for v in rangee[k:k + 16]) + "\n")
+    lignes.append(_ligne(f"{numero:6d}", f"END OF {type_carte} MAP"))
+    return lignes
+
+
+def ecrire_ionex_synthetique(chemin, jour, intervalle_s=INTERVALLE_S, grille_lat=GRILLE_LAT,
+                             grille_lon=GRILLE_LON, rms=True, graine=0):
+    """
+    Écrit un fichier IONEX journalier synthétique (cartes de 00:00 à 24:00 incluses).
+
+    Args:
+        chemin (str): fichier de sortie.
+        jour (date | str): jour couvert.
+        intervalle_s (int): pas entre deux cartes (s) ; sa réduction augmente la taille du fichier.
+        grille_lat, grille_lon (tuple): (début, fin, pas) en degrés.
+        rms (bool): ajoute les cartes RMS.
+        graine (int): graine du bruit, pour des fichiers reproductibles.
+
+    Returns:
+        str: chemin du fichier écrit.
+    """
+    latitudes = _axe(*grille_lat)
+    longitudes = _axe(*grille_lon)
+    debut = np.datetime64(jour, "D").astype("datetime64[s]")
+    epoques = debut + np.arange(0, 86400 + 1, intervalle_s).astype("timedelta64[s]")
+    rng = np.random.default_rng(graine)
+
+    lignes = [
+        _ligne("     1.0            IONOSPHERE MAPS     GNSS", "IONEX VERSION / TYPE"),
+        _ligne("synthetique         iono-app", "PGM / RUN BY / DATE"),
+        _ligne(_epoque_i6(epoques[0]), "EPOCH OF FIRST MAP"),
+        _ligne(_epoque_i6(epoques[-1]), "EPOCH OF LAST MAP"),
+        _ligne(f"{intervalle_s:6d}", "INTERVAL"),
+        _ligne(f"{len(epoques):6d}", "# OF MAPS IN FILE"),
+        _ligne("  NONE", "MAPPING FUNCTION"),
+        _ligne("     0.0", "ELEVATION CUTOFF"),
+        _ligne("  6371.0", "BASE RADIUS"),
+        _ligne(f"{2:6d}", "MAP DIMENSION"),
+        _ligne("  " + "".join(f"{v:6.1f}" for v in (HAUTEUR, HAUTEUR, 0.0)), "HGT1 / HGT2 / DHGT"),
+        _ligne("  " + "".join(f"{v:6.1f}" for v in grille_lat), "LAT1 / LAT2 / DLAT"),
+        _ligne("  " + "".join(f"{v:6.1f}" for v in grille_lon), "LON1 / LON2 / DLON"),
+        _ligne(f"{EXPOSANT:6d}", "EXPONENT"),
+        _ligne("", "END OF HEADER"),
+    ]
+    facteur = 10.0 ** -EXPOSANT
+    cartes = [np.rint(tec_synthetique(e, latitudes, longitudes, rng) * facteur).astype(int) for e in epoques]
+    for numero, (epoque, carte) in enumerate(zip(epoques, cartes), start=1):
+        lignes += _bloc_carte("TEC", numero, epoque, carte, latitudes, grille_lon)
+    if rms:
+        for numero, (epoque, carte) in enumerate(zip(epoques, cartes), start=1):
+            lignes += _bloc_carte("RMS", numero, epoque, np.maximum(carte // 10, 1), latitudes, grille_lon)
+    lignes.append(_ligne("", "END OF FILE"))
+
+    with open(chemin, "w", encoding="ascii") as f:
+        f.writelines(lignes)
+    return chemin
+
+
+def generer_archive_ionex(dossier, debut, n_jours, **options):
+    """
+    Écrit `n_jours` fichiers IONEX synthétiques consécutifs nommés comme l'archive CODE (CODGddd0.yyi).
+
+    Returns:
+        list[str]: chemins écrits, dans l'ordre des jours.
+    """
+    os.makedirs(dossier, exist_ok=True)
+    premier = np.datetime64(debut, "D")
+    chemins = []
+    for k in range(n_jours):
+        jour = (premier + np.timedelta64(k, "D")).astype(datetime.date)
+        nom = f"CODG{jour.timetuple().tm_yday:03d}0.{jour.year % 100:02d}i"
+        chemins.append(ecrire_ionex_synthetique(os.path.join(dossier, nom), jour, graine=k, **options))
+    return chemins
+
+
+def mesures_madrigal(jour, n_mesures, graine=0):
+    """Mesures TEC dispersées d'une journée, au format des colonnes Madrigal (dict de tableaux)."""
+    rng = np.random.default_rng(graine)
+    debut = np.datetime64(jour, "D").astype("datetime64[s]")
+    secondes = np.sort(rng.integers(0, 86400, n_mesures))
+    temps = debut + secondes.astype("timedelta64[s]")
+    gdlat = np.round(rng.uniform(-90.0, 90.0, n_mesures), 1)
+    glon = np.round(rng.uniform(-180.0, 180.0, n_mesures), 1)
+
+    heure_locale = (secondes / 3600.0 + glon / 15.0) % 24
+    tec = 5.0 + 40.0 * np.cos(np.radians(gdlat)) ** 2 * np.clip(np.cos((heure_locale - 14.0) * np.pi / 12.0), 0, None)
+    tec = np.round(tec + rng.normal(0.0, 1.0, n_mesures), 2)
+    return {
+        "temps": temps,
+        "ut1_unix": temps.astype(np.int64).astype(np.float64),
+        "gdlat": gdlat,
+        "glon": glon,
+        "tec": tec,
+        "dtec": np.ones(n_mesures),
+    }
+
+
+def ecrire_madrigal_ascii(chemin, jour, n_mesures=500_000, graine=0):
+    """Écrit un fichier ASCII Madrigal synthétique (YEAR MONTH DAY HOUR MIN SEC GDLAT GLON TEC DTEC)."""
+    m = mesures_madrigal(jour, n_mesures, graine)
+    t = m["temps"]
+    heures = (t - t.astype("datetime64[D]")).astype(np.int64)
+    annee = t.astype("datetime64[Y]").astype(int) + 1970
+    mois = t.astype("datetime64[M]").astype(int) % 12 + 1
+    jour_mois = (t.astype("datetime64[D]") - t.astype("datetime64[M]")).astype(int) + 1
+    colonnes = np.column_stack([annee, mois, jour_mois, heures // 3600, heures % 3600 // 60, heures % 60,
+                                m["gdlat"], m["glon"], m["tec"], m["dtec"]])
+    np.savetxt(chemin, colonnes, fmt=["%d"] * 6 + ["%.1f", "%.1f", "%.2f", "%.1f"],
+               header="YEAR MONTH DAY HOUR MIN SEC GDLAT GLON TEC DTEC", comments="")
+    return chemin
+
+
+def ecrire_madrigal_hdf5(chemin, jour, n_mesures=500_000, graine=0):
+    """Écrit un fichier HDF5 Madrigal synthétique (table composée 'Data/Table Layout')."""
+    import h5py
+
+    m = mesures_madrigal(jour, n_mesures, graine)
+    t = m["temps"]
+    type_ligne = np.dtype([("year", "<i8"), ("hour", "<i8"), ("ut1_unix", "<f8"), ("ut2_unix", "<f8"),
+                           ("gdlat", "<f8"), ("glon", "<f8"), ("tec", "<f8"), ("dtec", "<f8")])
+    table = np.empty(n_mesures, dtype=type_ligne)
+    table["year"] = t.astype("datetime64[Y]").astype(int) + 1970
+    table["hour"] = (t - t.astype("datetime64[D]")).astype(np.int64) // 3600
+    table["ut1_unix"] = m["ut1_unix"]
+    table["ut2_unix"] = m["ut1_unix"] + 300.0
+    for champ in ("gdlat", "glon", "tec", "dtec"):
+        table[champ] = m[champ]
+    with h5py.File(chemin, "w") as h5:
+        h5.create_dataset("Data/Table Layout", data=table, chunks=True)
+    return chemin
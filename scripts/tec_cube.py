@@ -0,0 +1,294 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+from scripts.ionex_cache import (DOSSIER_CACHE, VERSION_CACHE, cle_connue, dossier_entree, entete_ionex,
+                                 memoriser_cles, ouvrir_champ, precharger_ionex)
+from scripts.parallele import executer_par_fichier
+from scripts.profilage import etape
+
+EXTENSIONS_IONEX = (".inx", ".i", ".ionex")
+# Noms courts CDDIS décompressés : CODGddd0.yyI
+_MOTIF_IONEX_COURT = re.compile(r"\.\d{2}i$", re.IGNORECASE)
+
+
+def est_fichier_ionex(nom):
+    """Indique si un nom de fichier correspond à un produit IONEX décompressé."""
+    return nom.lower().endswith(EXTENSIONS_IONEX) or bool(_MOTIF_IONEX_COURT.search(nom))
+
+
+def dossier_cube_par_defaut(dossier_ionex, dossier_cache=DOSSIER_CACHE):
+    """Emplacement du cube associé à un dossier d'archive IONEX."""
+    empreinte = hashlib.sha1(os.path.abspath(dossier_ionex).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(dossier_cache, "cubes", empreinte)
+
+
+def _lister_fichiers(dossier_ionex):
+    return [os.path.join(dossier_ionex, f) for f in sorted(os.listdir(dossier_ionex))
+            if est_fichier_ionex(f)]
+
+
+def _charger_meta(dossier_cube):
+    try:
+        with open(os.path.join(dossier_cube, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"blocs": {}}
+
+
+@etape("parsing.cube")
+def construire_cube(dossier_ionex, dossier_cube=None, dossier_cache=DOSSIER_CACHE, n_workers=None):
+    """
+    Consolide tous les jours IONEX d'un dossier dans un cube TEC (temps, lat, lon).
+
+    Le cube est découpé en blocs annuels `tec_<année>.npy` (memmap) accompagnés
+    de leurs époques `temps_<année>.npy`. Seuls les blocs dont les fichiers
+    sources ont changé sont réécrits. Les époques en double (carte de minuit
+    présente dans deux fichiers consécutifs) sont dédupliquées en gardant
+    celle du fichier le plus récent.
+
+    Seules les époques et la grille de chaque jour sont gardées en mémoire ;
+    les cartes d'un fichier sont ouvertes (memmap du cache), copiées dans le
+    bloc puis refermées, si bien que le nombre de descripteurs ouverts ne
+    dépend pas de la taille de l'archive.
+
+    Args:
+        dossier_ionex (str): dossier contenant les fichiers IONEX.
+        dossier_cube (str): dossier de sortie du cube (par défaut dans le cache).
+        dossier_cache (str): dossier racine du cache binaire.
+        n_workers (int | None): nombre de processus pour parser les nouveaux
+            fichiers (None ou 1 : séquentiel, 0 : tous les cœurs).
+
+    Returns:
+        dict: cube ouvert (voir ouvrir_cube), plus "echecs" : liste des
+        (fichier, message) non intégrés.
+    """
+    if dossier_cube is None:
+        dossier_cube = dossier_cube_par_defaut(dossier_ionex, dossier_cache)
+    os.makedirs(dossier_cube, exist_ok=True)
+
+    # Parsing des fichiers absents du cache, éventuellement en parallèle
+    fichiers = _lister_fichiers(dossier_ionex)
+    os.makedirs(dossier_cache, exist_ok=True)
+    nouveaux = [f for f in fichiers if cle_connue(f, dossier_cache) is None]
+    prets, echecs = executer_par_fichier(precharger_ionex, nouveaux, dossier_cache, n_workers=n_workers)
+    memoriser_cles(dossier_cache, prets)
+
+    # Époques et grille de chaque jour (sans ouvrir les cartes), triées par première époque
+    en_echec = {f for f, _ in echecs}
+    entrees = [(chemin, entete_ionex(chemin, dossier_cache)) for chemin in fichiers if chemin not in en_echec]
+    entrees.sort(key=lambda e: e[1]["epoques"][0])
+
+    if not entrees:
+        raise ValueError("Aucun fichier IONEX exploitable dans le dossier.")
+
+    latitudes, longitudes = entrees[0][1]["latitudes"], entrees[0][1]["longitudes"]
+    compatibles = []
+    for chemin, ds in entrees:
+        if np.array_equal(ds["latitudes"], latitudes) and np.array_equal(ds["longitudes"], longitudes):
+            compatibles.append(ds)
+        else:
+            echecs.append((chemin, "grille différente du reste de l'archive"))
+
+    temps = np.concatenate([ds["epoques"] for ds in compatibles])
+    src_fichier = np.concatenate([np.full(len(ds["epoques"]), k) for k, ds in enumerate(compatibles)])
+    src_carte = np.concatenate([np.arange(len(ds["epoques"])) for ds in compatibles])
+
+    ordre = np.argsort(temps, kind="stable")
+    temps, src_fichier, src_carte = temps[ordre], src_fichier[ordre], src_carte[ordre]
+    garder = np.r_[temps[1:] != temps[:-1], True]
+    temps, src_fichier, src_carte = temps[garder], src_fichier[garder], src_carte[garder]
+
+    annees = temps.astype("datetime64[Y]").astype(np.int64) + 1970
+    meta = _charger_meta(dossier_cube)
+    # Grille ou version du cache différente : tous les blocs sont réécrits
+    if (meta.get("latitudes") != latitudes.tolist() or meta.get("longitudes") != longitudes.tolist()
+            or meta.get("version") != VERSION_CACHE):
+        meta = {"blocs": {}}
+
+    blocs = {}
+    for annee in np.unique(annees):
+        masque = annees == annee
+        cles = sorted({compatibles[k]["cle"] for k in np.unique(src_fichier[masque])})
+        nom = str(annee)
+        chemin_tec = os.path.join(dossier_cube, f"tec_{nom}.npy")
+        blocs[nom] = {"cles": cles, "n": int(masque.sum())}
+        if meta["blocs"].get(nom) == blocs[nom] and os.path.exists(chemin_tec):
+            continue
+
+        sortie = np.lib.format.open_memmap(chemin_tec + ".tmp", mode="w+", dtype=np.float32,
+                                           shape=(int(masque.sum()), len(latitudes), len(longitudes)))
+        fichiers_bloc, cartes_bloc = src_fichier[masque], src_carte[masque]
+        for k in np.unique(fichiers_bloc):
+            lignes = np.flatnonzero(fichiers_bloc == k)
+            tec = ouvrir_champ(dossier_entree(dossier_cache, compatibles[k]["cle"]))
+            sortie[lignes] = tec[cartes_bloc[lignes]]
+            del tec
+        sortie.flush()
+        del sortie
+        os.replace(chemin_tec + ".tmp", chemin_tec)
+        np.save(os.path.join(dossier_cube, f"temps_{nom}.npy"), temps[masque].astype("datetime64[s]"))
+
+    for nom in set(meta["blocs"]) - set(blocs):
+        for prefixe in ("tec", "temps"):
+            chemin = os.path.join(dossier_cube, f"{prefixe}_{nom}.npy")
+            if os.path.exists(chemin):
+                os.remove(chemin)
+
+    meta = {"latitudes": latitudes.tolist(), "longitudes": longitudes.tolist(), "version": VERSION_CACHE,
+            "blocs": blocs}
+    with open(os.path.join(dossier_cube, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    cube = ouvrir_cube(dossier_cube)
+    cube["echecs"] = echecs
+    return cube
+
+
+def ouvrir_cube(dossier_cube):
+    """
+    Ouvre un cube TEC en mémoire mappée.
+
+    Returns:
+        dict: {
+            "temps": np.ndarray datetime64[s] (n_temps,),
+            "blocs": liste de memmaps (n_temps_bloc, n_lat, n_lon),
+            "bornes": np.ndarray des indices de début de chaque bloc dans "temps",
+            "latitudes": np.ndarray, "longitudes": np.ndarray,
+        }
+    """
+    meta = _charger_meta(dossier_cube)
+    if not meta["blocs"]:
+        raise ValueError(f"Cube TEC vide ou introuvable : {dossier_cube}")
+
+    noms = sorted(meta["blocs"])
+    blocs = [np.load(os.path.join(dossier_cube, f"tec_{nom}.npy"), mmap_mode="r") for nom in noms]
+    temps = [np.load(os.path.join(dossier_cube, f"temps_{nom}.npy")) for nom in noms]
+    return {
+        "temps": np.concatenate(temps),
+        "blocs": blocs,
+        "bornes": np.cumsum([0] + [len(t) for t in temps]),
+        "latitudes": np.array(meta["latitudes"]),
+        "longitudes": np.array(meta["longitudes"]),
+    }
+
+
+def indices_proches(grille, valeurs):
+    """Indices des nœuds de grille les plus proches de chaque valeur (vectorisé)."""
+    grille = np.asarray(grille)
+    valeurs = np.atleast_1d(np.asarray(valeurs, dtype=float))
+    return np.abs(grille[None, :] - valeurs[:, None]).argmin(axis=1)
+
+
+def _tranches_temps(cube, debut, fin):
+    """Itère sur (bloc, tranche locale, tranche globale) couvrant [debut, fin]."""
+    temps = cube["temps"]
+    i0 = 0 if debut is None else np.searchsorted(temps, np.datetime64(debut, "s"), side="left")
+    i1 = len(temps) if fin is None else np.searchsorted(temps, np.datetime64(fin, "s"), side="right")
+    for b, bloc in enumerate(cube["blocs"]):
+        b0, b1 = cube["bornes"][b], cube["bornes"][b + 1]
+        d, f = max(i0, b0), min(i1, b1)
+        if d < f:
+            yield bloc, slice(d - b0, f - b0), slice(d, f)
+
+
+def _lire(cube, debut, fin, selection):
+    morceaux = [bloc[(tranche,) + selection] for bloc, tranche, _ in _tranches_temps(cube, debut, fin)]
+    temps = np.concatenate([cube["temps"][g] for _, _, g in _tranches_temps(cube, debut, fin)] or
+                           [np.array([], dtype="datetime64[s]")])
+    valeurs = np.concatenate(morceaux) if morceaux else np.empty((0,), dtype=np.float32)
+    return temps, np.asarray(valeurs, dtype=np.float32)
+
+
+@etape("extraction.points")
+def serie_points(cube, lats, lons, debut=None, fin=None):
+    """
+    Séries temporelles TEC pour une liste de points (nœud de grille le plus proche).
+
+    Returns:
+        tuple: (temps (n_temps,), valeurs (n_temps, n_points))
+    """
+    i = indices_proches(cube["latitudes"], lats)
+    j = indices_proches(cube["longitudes"], lons)
+    return _lire(cube, debut, fin, (i, j))
+
+
+def serie_point(cube, lat, lon, debut=None, fin=None):
+    """Série temporelle TEC au nœud de grille le plus proche d'un point."""
+    temps, valeurs = serie_points(cube, [lat], [lon], debut, fin)
+    return temps, valeurs[:, 0]
+
+
+def serie_boite(cube, lat_min, lat_max, lon_min, lon_max, debut=None, fin=None):
+    """
+    Cube TEC restreint à une boîte lat/lon.
+
+    Returns:
+        tuple: (temps, valeurs (n_temps, n_lat_boite, n_lon_boite), latitudes, longitudes)
+    """
+    lats, lons = cube["latitudes"], cube["longitudes"]
+    i = np.flatnonzero((lats >= lat_min) & (lats <= lat_max))
+    j = np.flatnonzero((lons >= lon_min) & (lons <= lon_max))
+    if len(i) == 0 or len(j) == 0:
+        raise ValueError("La boîte demandée ne contient aucun nœud de grille.")
+    temps, valeurs = _lire(cube, debut, fin, (slice(i[0], i[-1] + 1), slice(j[0], j[-1] + 1)))
+    return temps, valeurs, lats[i[0]:i[-1] + 1], lons[j[0]:j[-1] + 1]
+
+
+@etape("extraction.zones")
+def serie_zones(cube, lats, lons, rayon=1, debut=None, fin=None):
+    """
+    Moyennes TEC sur les fenêtres (2*rayon+1)² de nœuds centrées sur chaque point,
+    tronquées aux bords de la grille, calculées en une seule lecture par bloc.
+
+    Returns:
+        tuple: (temps (n_temps,), valeurs (n_temps, n_points))
+    """
+    i = indices_proches(cube["latitudes"], lats)
+    j = indices_proches(cube["longitudes"], lons)
+    decalages = np.arange(-rayon, rayon + 1)
+    ii = (i[:, None, None] + decalages[None, :, None]).repeat(len(decalages), axis=2).reshape(len(i), -1)
+    jj = (j[:, None, None] + decalages[None, None, :]).repeat(len(decalages), axis=1).reshape(len(j), -1)
+    valides = (ii >= 0) & (ii < len(cube["latitudes"])) & (jj >= 0) & (jj < len(cube["longitudes"]))
+
+    temps, valeurs = _lire(cube, debut, fin, (np.clip(ii, 0, len(cube["latitudes"]) - 1),
+                                              np.clip(jj, 0, len(cube["longitudes"]) - 1)))
+    if len(valeurs) == 0:
+        return temps, np.empty((0, len(i)), dtype=np.float32)
+    valeurs = np.where(valides[None], valeurs, np.nan)
+    return temps, np.nanmean(valeurs, axis=2)
+
+
+def serie_zone(cube, lat, lon, rayon=1, debut=None, fin=None):
+    """
+    Moyenne TEC sur la fenêtre (2*rayon+1)² de nœuds centrée sur le point,
+    tronquée aux bords de la grille.
+    """
+    temps, valeurs = serie_zones(cube, [lat], [lon], rayon, debut, fin)
+    return temps, valeurs[:, 0]
+
+
+def iterer_cartes(cube, debut=None, fin=None, taille_lot=24):
+    """
+    Parcourt les cartes TEC de [debut, fin] par lots, sans charger toute la période.
+
+    Yields:
+        tuple: (temps (n,), cartes (n, n_lat, n_lon)) avec n <= taille_lot.
+    """
+    for bloc, tranche, globale in _tranches_temps(cube, debut, fin):
+        for d in range(tranche.start, tranche.stop, taille_lot):
+            f = min(d + taille_lot, tranche.stop)
+            g = globale.start + (d - tranche.start)
+            yield cube["temps"][g:g + (f - d)], np.asarray(bloc[d:f], dtype=np.float32)
+
+
+@etape("extraction.grille")
+def serie_grille(cube, debut=None, fin=None, lignes=slice(None)):
+    """
+    Cartes TEC complètes (ou une bande de lignes de latitude) sur [debut, fin].
+
+    Returns:
+        tuple: (temps (n_temps,), valeurs (n_temps, n_lat_bande, n_lon))
+    """
+    return _lire(cube, debut, fin, (lignes, slice(None)))
@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Verrous entre threads d'un même processus, un par fichier protégé
+_VERROUS = {}
+_GARDE = threading.Lock()
+
+
+def _verrouiller(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            time.sleep(0.05)
+
+
+def _deverrouiller(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def verrou_fichier(chemin):
+    """
+    Verrou exclusif associé à un fichier, entre threads et entre processus.
+
+    Le verrou système est pris sur `<chemin>.lock`, jamais supprimé ; le
+    fichier protégé peut donc être remplacé (os.replace) pendant qu'il est
+    tenu. Non réentrant : ne pas l'imbriquer sur le même chemin.
+    """
+    chemin = os.path.abspath(chemin)
+    with _GARDE:
+        verrou = _VERROUS.setdefault(chemin, threading.Lock())
+    with verrou, open(chemin + ".lock", "a+b") as f:
+        _verrouiller(f)
+        try:
+            yield
+        finally:
+            _deverrouiller(f)
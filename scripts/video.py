@@ -1,130 +1,329 @@
+import os
+import shutil
+import subprocess
+import tempfile
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.interpolate import griddata
-import re
-import matplotlib.animation as animation
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from PIL import Image
-from io import BytesIO
-import tempfile
-import os
-from PIL import Image
+from PIL import Image, GifImagePlugin
+from scripts.ionex_cache import DOSSIER_CACHE, charger_ionex
+from scripts.tec_cube import construire_cube, iterer_cartes
+from scripts.fond_carte import ajouter_fond_de_carte
+from scripts.profilage import etape
+
+RESOLUTION_ANIMATION = 300
+DPI_ANIMATION = 80
+INTERVALLE_MS = 400
+
+
+def matrice_interpolation(axe, cible):
+    """
+    Opérateur d'interpolation linéaire 1D d'un axe régulier vers un autre.
+
+    Chaque ligne ne contient que deux poids non nuls (les deux nœuds qui
+    encadrent le point cible) ; l'axe source peut être décroissant, comme
+    les latitudes IONEX.
+
+    Returns:
+        np.ndarray: matrice (len(cible), len(axe)).
+    """
+    axe = np.asarray(axe, dtype=np.float64)
+    cible = np.asarray(cible, dtype=np.float64)
+    ordre = np.argsort(axe)
+    trie = axe[ordre]
+
+    k = np.clip(np.searchsorted(trie, cible, side="right") - 1, 0, len(trie) - 2)
+    poids = np.clip((cible - trie[k]) / (trie[k + 1] - trie[k]), 0.0, 1.0)
+
+    lignes = np.arange(len(cible))
+    matrice = np.zeros((len(cible), len(axe)))
+    matrice[lignes, ordre[k]] = 1.0 - poids
+    matrice[lignes, ordre[k + 1]] += poids
+    return matrice
+
 
-def generer_animation_tec(filepath, seisme_lat, seisme_lon):
+def operateurs_interpolation(latitudes, longitudes, n_points=RESOLUTION_ANIMATION):
+    """Opérateurs (m_lat, m_lon) vers la grille fine n_points x n_points, à réutiliser d'une pile à l'autre."""
+    lat_fine = np.linspace(np.min(latitudes), np.max(latitudes), n_points)
+    lon_fine = np.linspace(np.min(longitudes), np.max(longitudes), n_points)
+    return matrice_interpolation(latitudes, lat_fine), matrice_interpolation(longitudes, lon_fine)
+
+
+@etape("video.interpolation")
+def interpoler_pile(pile, latitudes, longitudes, n_points=RESOLUTION_ANIMATION, operateurs=None):
     """
-    Génère une animation GIF des cartes TEC à partir d'un fichier IONEX.
+    Interpolation bilinéaire d'une pile de cartes (T, n_lat, n_lon) vers une grille fine.
+
+    La grille IONEX étant régulière, l'interpolation est séparable : les deux
+    opérateurs 1D sont calculés une fois (ou fournis via `operateurs`) et
+    appliqués à toute la pile en un seul produit tensoriel, sans triangulation.
+
+    Les nœuds sans donnée (NaN) sont exclus du produit : seuls les pixels
+    dont l'un des quatre nœuds voisins manque deviennent NaN.
+
+    Returns:
+        tuple: (cartes (T, n_points, n_points) en latitudes croissantes,
+                lat_fine, lon_fine)
+    """
+    m_lat, m_lon = operateurs or operateurs_interpolation(latitudes, longitudes, n_points)
+    lat_fine = np.linspace(np.min(latitudes), np.max(latitudes), len(m_lat))
+    lon_fine = np.linspace(np.min(longitudes), np.max(longitudes), len(m_lon))
+    pile = np.asarray(pile, dtype=np.float64)
+    manquants = np.isnan(pile)
+    # 0·NaN = NaN : sans ce masque, un seul nœud manquant rendrait toute l'image NaN
+    cartes = np.einsum("ai,tij,bj->tab", m_lat, np.where(manquants, 0.0, pile), m_lon, optimize=True)
+    if manquants.any():
+        voisins = np.einsum("ai,tij,bj->tab", (m_lat != 0).astype(np.float64), manquants.astype(np.float64),
+                            (m_lon != 0).astype(np.float64), optimize=True)
+        cartes[voisins > 0] = np.nan
+    return cartes, lat_fine, lon_fine
+
+
+def ffmpeg_disponible():
+    """Chemin de l'exécutable ffmpeg s'il est installé, sinon None."""
+    return shutil.which(plt.rcParams["animation.ffmpeg_path"]) or shutil.which("ffmpeg")
+
+
+class EncodeurGIF:
+    """
+    Écrit un GIF image par image avec PIL, sans garder les images en mémoire.
+
+    La palette est calculée sur la première image puis réutilisée : les
+    images suivantes sont seulement projetées sur cette palette globale et
+    leurs données LZW sont ajoutées au fichier au fur et à mesure.
+    """
+
+    def __init__(self, chemin, intervalle_ms=INTERVALLE_MS):
+        self.chemin = chemin
+        self.intervalle_ms = intervalle_ms
+        self._fichier = None
+        self._palette = None
+
+    def ajouter(self, rgb):
+        image = Image.fromarray(rgb)
+        if self._palette is None:
+            image = image.quantize(colors=256)
+            self._palette = image
+            entete, _ = GifImagePlugin.getheader(
+                image, info={"loop": 0, "duration": self.intervalle_ms, "optimize": False})
+            self._fichier = open(self.chemin, "wb")
+            self._fichier.writelines(entete)
+        else:
+            image = image.quantize(palette=self._palette, dither=Image.Dither.NONE)
+        self._fichier.writelines(GifImagePlugin.getdata(image, duration=self.intervalle_ms))
+
+    def fermer(self):
+        if self._fichier is None:
+            raise ValueError("Aucune image à encoder.")
+        self._fichier.write(b";")  # fin du flux GIF
+        self._fichier.close()
+        self._fichier = None
+        return self.chemin
+
+class EncodeurMP4:
+    """Envoie les images RVB brutes à ffmpeg (H.264) par un tube."""
+
+    def __init__(self, chemin, intervalle_ms=INTERVALLE_MS, ffmpeg=None):
+        self.chemin = chemin
+        self.fps = 1000.0 / intervalle_ms
+        self.ffmpeg = ffmpeg or ffmpeg_disponible()
+        if not self.ffmpeg:
+            raise RuntimeError("ffmpeg introuvable : export MP4 indisponible.")
+        self._processus = None
+
+    def _demarrer(self, hauteur, largeur):
+        commande = [
+            self.ffmpeg, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{largeur}x{hauteur}", "-r", f"{self.fps:g}",
+            "-i", "-",
+            # H.264 / yuv420p exige des dimensions paires
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            self.chemin,
+        ]
+        self._processus = subprocess.Popen(commande, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def ajouter(self, rgb):
+        if self._processus is None:
+            self._demarrer(*rgb.shape[:2])
+        self._processus.stdin.write(np.ascontiguousarray(rgb).tobytes())
+
+    def fermer(self):
+        if self._processus is None:
+            raise ValueError("Aucune image à encoder.")
+        self._processus.stdin.close()
+        erreurs = self._processus.stderr.read()
+        if self._processus.wait() != 0:
+            raise RuntimeError(f"ffmpeg a échoué : {erreurs.decode(errors='replace').strip()}")
+        return self.chemin
+
+
+ENCODEURS = {"gif": EncodeurGIF, "mp4": EncodeurMP4}
+
+
+def _image_rvb(fig):
+    """Rend la figure et renvoie ses pixels RVB (H, L, 3)."""
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba())[..., :3]
+
+
+def _etiquette_temps(epoque):
+    """Libellé d'une époque de carte, ex. '2023-02-06 01:00'."""
+    return np.datetime_as_string(np.datetime64(epoque, "m")).replace("T", " ")
+
+
+@etape("video.animation")
+def _rendre_animation(lots, latitudes, longitudes, seisme_lat, seisme_lon, format_sortie="gif",
+                      resolution=RESOLUTION_ANIMATION, dpi=DPI_ANIMATION, echelle=None, dossier_cache=DOSSIER_CACHE):
+    """
+    Rend et encode une animation à partir de lots (époques, cartes).
+
+    Les opérateurs d'interpolation sont calculés une fois ; chaque lot est
+    interpolé d'un bloc puis ses images sont rendues et transmises une à une
+    à l'encodeur. Seul le lot courant est en mémoire.
 
     Args:
-        filepath (str): chemin vers le fichier IONEX (.INX)
-        seisme_lat (float): latitude de l'épicentre
-        seisme_lon (float): longitude de l'épicentre
+        lots (iterable): lots (époques (n,), cartes (n, n_lat, n_lon)).
+        echelle (tuple | None): (vmin, vmax) de la palette ; par défaut celle de la première carte.
+        dossier_cache (str): cache du fond de carte.
 
     Returns:
-        PIL.Image.Image: animation au format GIF
+        str: chemin du fichier temporaire de l'animation
     """
-    # Lecture du fichier
-    with open(filepath, "r") as f:
-        lines = f.readlines()
-
-    start_indices = [i for i, line in enumerate(lines) if "START OF TEC MAP" in line]
-    end_indices = [i for i, line in enumerate(lines) if "END OF TEC MAP" in line]
-
-    frames = []
-    times = []
-    longitudes, latitudes = None, None
-
-    for idx, (start, end) in enumerate(zip(start_indices, end_indices)):
-        tec_maps = []
-        lats = []
-        longs = None
-
-        i = start + 1
-        while i < end:
-            line = lines[i]
-            if "LAT/LON1/LON2/DLON/H" in line:
-                meta = list(map(float, re.findall(r"-?\d+\.\d+|-?\d+", line)))
-                lat = meta[0]
-                lon1, lon2, dlon = meta[1], meta[2], meta[3]
-
-                if longs is None:
-                    longs = np.arange(lon1, lon2 + dlon, dlon)
-
-                data_row = []
-                j = i + 1
-                while j < end and "LAT/LON1/LON2/DLON/H" not in lines[j] and "END OF TEC MAP" not in lines[j]:
-                    row_values = [float(x) for x in re.findall(r"-?\d+", lines[j])]
-                    data_row.extend(row_values)
-                    j += 1
-
-                row_padded = np.pad(data_row, (0, len(longs) - len(data_row)), constant_values=np.nan)
-                tec_maps.append(row_padded)
-                lats.append(lat)
-                i = j
-            else:
-                i += 1
-
-        if not tec_maps:
-            continue
-
-        lats = np.array(lats)
-        tec_map = np.array(tec_maps)
-
-        lon_grid, lat_grid = np.meshgrid(longs, lats)
-        lon_fine = np.linspace(longs.min(), longs.max(), 300)
-        lat_fine = np.linspace(lats.min(), lats.max(), 300)
-        lon_fine_grid, lat_fine_grid = np.meshgrid(lon_fine, lat_fine)
-
-        points = np.array([lon_grid.flatten(), lat_grid.flatten()]).T
-        values = tec_map.flatten()
-        tec_interp = griddata(points, values, (lon_fine_grid, lat_fine_grid), method='linear')
-
-        frames.append(tec_interp)
-        times.append(f"{idx:02d}:00")
-
-        if longitudes is None:
-            longitudes, latitudes = longs, lats
-
-    if not frames:
-        raise ValueError("Aucune donnée TEC trouvée dans le fichier.")
+    if format_sortie not in ENCODEURS:
+        raise ValueError(f"Format d'animation inconnu : {format_sortie}")
+
+    operateurs = operateurs_interpolation(latitudes, longitudes, resolution)
+
+    fig = None
+    tmpfile_path = None
+    try:
+        for epoques, cartes in lots:
+            frames, _, _ = interpoler_pile(cartes, latitudes, longitudes, operateurs=operateurs)
+            for epoque, frame in zip(epoques, frames):
+                if fig is None:
+                    # Création de la figure à la première image, réutilisée ensuite
+                    fig, img, time_text = _preparer_figure(frame, latitudes, longitudes,
+                                                           seisme_lat, seisme_lon, dpi, echelle, dossier_cache)
+                    with tempfile.NamedTemporaryFile(suffix=f".{format_sortie}", delete=False) as tmpfile:
+                        tmpfile_path = tmpfile.name
+                    encodeur = ENCODEURS[format_sortie](tmpfile_path, INTERVALLE_MS)
+                with etape("video.image"):
+                    img.set_array(frame)
+                    time_text.set_text(f"Heure UTC : {_etiquette_temps(epoque)}")
+                    image = _image_rvb(fig)
+                with etape("video.encodage", format=format_sortie):
+                    encodeur.ajouter(image)
+
+        if fig is None:
+            raise ValueError("Aucune donnée TEC trouvée pour l'animation.")
+        with etape("video.encodage", format=format_sortie):
+            encodeur.fermer()
+    except Exception:
+        if tmpfile_path and os.path.exists(tmpfile_path):
+            os.remove(tmpfile_path)
+        raise
+    finally:
+        if fig is not None:
+            plt.close(fig)
 
-    # Création de l'animation
-    fig = plt.figure(figsize=(12, 6))
+    return tmpfile_path
+
+
+def _preparer_figure(premiere, latitudes, longitudes, seisme_lat, seisme_lon, dpi, echelle=None,
+                     dossier_cache=DOSSIER_CACHE):
+    """Construit la figure de l'animation ; renvoie (fig, image TEC, texte de l'heure)."""
+    fig = plt.figure(figsize=(12, 6), dpi=dpi)
     proj = ccrs.PlateCarree()
     ax = plt.axes(projection=proj)
 
-    ax.set_global()
-    ax.coastlines(resolution='110m')
-    ax.add_feature(cfeature.BORDERS, edgecolor='gray')
-    ax.add_feature(cfeature.LAND, facecolor='lightgray')
-    ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
+    ajouter_fond_de_carte(ax, "animation", dossier_cache=dossier_cache)
     ax.gridlines(draw_labels=True, linestyle='--', alpha=0.5)
 
-    img = ax.imshow(frames[0], extent=[longitudes.min(), longitudes.max(), latitudes.min(), latitudes.max()],
-                    origin='lower', transform=proj, cmap='jet', aspect='auto')
+    vmin, vmax = echelle if echelle is not None else (None, None)
+    img = ax.imshow(premiere, extent=[np.min(longitudes), np.max(longitudes), np.min(latitudes), np.max(latitudes)],
+                    origin='lower', transform=proj, cmap='jet', aspect='auto', vmin=vmin, vmax=vmax)
 
     time_text = ax.text(0.02, 0.95, '', transform=ax.transAxes, fontsize=13, color='white',
                         bbox=dict(facecolor='black', alpha=0.5))
 
-    epicentre_marker, = ax.plot([seisme_lon], [seisme_lat], marker='*', color='black', markersize=15, transform=proj)
+    ax.plot([seisme_lon], [seisme_lat], marker='*', color='black', markersize=15, transform=proj)
 
     plt.title("Animation des Cartes TEC avec Épicentre et Carte du Monde 🌍")
     plt.tight_layout()
+    return fig, img, time_text
+
 
-    def update(frame_idx):
-        img.set_array(frames[frame_idx])
-        time_text.set_text(f"Heure UTC : {times[frame_idx]}")
-        return img, time_text, epicentre_marker
+def generer_animation_tec(filepath, seisme_lat, seisme_lon, format_sortie="gif",
+                          resolution=RESOLUTION_ANIMATION, dpi=DPI_ANIMATION, dossier_cache=DOSSIER_CACHE):
+    """
+    Génère une animation des cartes TEC à partir d'un fichier IONEX.
+
+    Toutes les cartes sont interpolées en une fois (opérateur bilinéaire
+    pré-calculé), puis la figure, construite une seule fois, est rendue
+    image par image et transmise directement à l'encodeur. Les heures
+    affichées sont les époques des cartes (EPOCH OF CURRENT MAP).
 
-    ani = animation.FuncAnimation(fig, update, frames=len(frames), interval=400)
+    Args:
+        filepath (str | bytes | memoryview | file | dict): chemin vers le fichier
+            IONEX (.INX), son contenu en mémoire, un objet fichier binaire, ou
+            jeu déjà chargé par charger_ionex
+        seisme_lat (float): latitude de l'épicentre
+        seisme_lon (float): longitude de l'épicentre
+        format_sortie (str): "gif" (PIL) ou "mp4" (nécessite ffmpeg)
+        resolution (int): nombre de points de la grille fine par axe
+        dpi (int): résolution des images
+        dossier_cache (str): cache des jeux IONEX et du fond de carte
 
-    # Création d'un fichier temporaire pour sauvegarder le GIF
-    with tempfile.NamedTemporaryFile(suffix=".gif", delete=False) as tmpfile:
-        ani.save(tmpfile.name, writer='pillow', dpi=80)
-        tmpfile_path = tmpfile.name
+    Returns:
+        str: chemin du fichier temporaire de l'animation
+    """
+    # Lecture du fichier
+    ds = filepath if isinstance(filepath, dict) else charger_ionex(filepath, dossier_cache)
 
+    if len(ds["tec"]) == 0:
+        raise ValueError("Aucune donnée TEC trouvée dans le fichier.")
 
+    return _rendre_animation([(ds["epoques"], ds["tec"])], ds["latitudes"], ds["longitudes"],
+                             seisme_lat, seisme_lon, format_sortie, resolution, dpi, dossier_cache=dossier_cache)
 
-    plt.close(fig)
-    return tmpfile_path
 
+def generer_animation_archive(dossier_ionex, debut, fin, seisme_lat, seisme_lon, format_sortie="gif",
+                              resolution=RESOLUTION_ANIMATION, dpi=DPI_ANIMATION, n_workers=None,
+                              taille_lot=24, echecs=None, dossier_cache=DOSSIER_CACHE):
+    """
+    Génère une animation TEC sur plusieurs jours à partir d'un dossier d'archive IONEX.
+
+    Les cartes sont lues dans le cube TEC du dossier (construit ou mis à
+    jour au besoin) par lots de `taille_lot`, puis rendues et encodées une à
+    une : la mémoire utilisée ne dépend pas du nombre de jours. La palette
+    est fixée sur le minimum et le maximum de la période, calculés au
+    préalable par un premier parcours du cube.
+
+    Args:
+        dossier_ionex (str): dossier contenant les fichiers IONEX
+        debut, fin (datetime | str): bornes incluses de la période
+        seisme_lat, seisme_lon (float): épicentre
+        format_sortie (str): "gif" (PIL) ou "mp4" (nécessite ffmpeg)
+        n_workers (int | None): processus pour la construction du cube
+        echecs (list | None): reçoit les (fichier, message) des fichiers
+            ignorés lors de la construction du cube
+        dossier_cache (str): cache des jeux IONEX et du fond de carte
+
+    Returns:
+        str: chemin du fichier temporaire de l'animation
+    """
+    cube = construire_cube(dossier_ionex, dossier_cache=dossier_cache, n_workers=n_workers)
+    if echecs is not None:
+        echecs.extend(cube["echecs"])
+
+    vmin, vmax = np.inf, -np.inf
+    for _, cartes in iterer_cartes(cube, debut, fin, taille_lot):
+        if np.isfinite(cartes).any():
+            vmin, vmax = min(vmin, np.nanmin(cartes)), max(vmax, np.nanmax(cartes))
+    if vmin > vmax:
+        raise ValueError("Aucune donnée TEC trouvée sur la période demandée.")
+
+    return _rendre_animation(iterer_cartes(cube, debut, fin, taille_lot), cube["latitudes"], cube["longitudes"],
+                             seisme_lat, seisme_lon, format_sortie, resolution, dpi, echelle=(vmin, vmax),
+                             dossier_cache=dossier_cache)
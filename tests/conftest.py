@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Le cache IONEX est lu à l'import des modules : il est redirigé avant tout import de scripts.*
+os.environ["IONEX_CACHE_DIR"] = tempfile.mkdtemp(prefix="iono_tests_cache_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.synthetique import generer_archive_ionex  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def archive_ionex(tmp_path_factory):
+    """Trois fichiers IONEX synthétiques consécutifs (CODGddd0.yyi)."""
+    dossier = tmp_path_factory.mktemp("archive")
+    return generer_archive_ionex(str(dossier), "2023-02-06", 3)
+
+
+@pytest.fixture
+def dossier_cache(tmp_path):
+    return str(tmp_path / "cache")
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.anomalies import grille_journaliere, ligne_de_base
+
+
+def _serie(n_jours=60, lacunes=0.1, graine=0):
+    rng = np.random.default_rng(graine)
+    temps = np.datetime64("2023-01-01T00:00:00") + np.arange(n_jours * 24) * np.timedelta64(3600, "s")
+    heure = np.arange(n_jours * 24) % 24
+    valeurs = 20.0 + 10.0 * np.sin(heure * np.pi / 12) + rng.normal(0.0, 2.0, len(temps))
+    valeurs[rng.random(len(temps)) < lacunes] = np.nan
+    return temps, valeurs.astype(np.float32)
+
+
+def _reference(temps, valeurs, fenetre, min_valides, statistique):
+    """Même heure UTC des `fenetre` jours précédents, par pandas.Series.rolling."""
+    df = pd.DataFrame({"t": pd.to_datetime(temps), "v": valeurs})
+    resultat = pd.Series(np.nan, index=df.index)
+    for _, groupe in df.groupby(df["t"].dt.hour):
+        glissant = groupe["v"].rolling(fenetre, min_periods=min_valides)
+        valeur = {"mediane": glissant.median(), "q1": glissant.quantile(0.25), "q3": glissant.quantile(0.75),
+                  "moyenne": glissant.mean(), "ecart": glissant.std()}[statistique]
+        resultat[groupe.index] = valeur.shift(1)
+    return resultat.to_numpy()
+
+
+@pytest.mark.parametrize("lacunes", [0.0, 0.1])
+@pytest.mark.parametrize("fenetre,min_valides", [(15, 7), (27, 13), (15, 1), (5, 5)])
+def test_mediane_comme_pandas(fenetre, min_valides, lacunes):
+    temps, valeurs = _serie(lacunes=lacunes)
+    base = ligne_de_base(temps, valeurs, fenetre=fenetre, methode="mediane", k=1.0, min_valides=min_valides)
+    mediane = _reference(temps, valeurs, fenetre, min_valides, "mediane")
+    iqr = (_reference(temps, valeurs, fenetre, min_valides, "q3")
+           - _reference(temps, valeurs, fenetre, min_valides, "q1"))
+
+    np.testing.assert_array_equal(np.isnan(base["centre"]), np.isnan(mediane))
+    np.testing.assert_allclose(base["centre"], mediane, rtol=1e-5, equal_nan=True)
+    np.testing.assert_allclose(base["haut"] - base["centre"], iqr, rtol=1e-4, atol=1e-4, equal_nan=True)
+
+
+@pytest.mark.parametrize("fenetre,min_valides", [(15, 7), (15, 2)])
+def test_moyenne_comme_pandas(fenetre, min_valides):
+    temps, valeurs = _serie()
+    base = ligne_de_base(temps, valeurs, fenetre=fenetre, methode="moyenne", k=1.0, min_valides=min_valides)
+    moyenne = _reference(temps, valeurs, fenetre, min_valides, "moyenne")
+    ecart = _reference(temps, valeurs, fenetre, min_valides, "ecart")
+
+    np.testing.assert_allclose(base["centre"], moyenne, rtol=1e-5, equal_nan=True)
+    np.testing.assert_allclose(base["haut"] - base["centre"], ecart, rtol=1e-4, atol=1e-4, equal_nan=True)
+
+
+def test_debut_de_serie_selon_min_valides():
+    temps, valeurs = _serie(lacunes=0.0)
+    base = ligne_de_base(temps, valeurs, fenetre=15, methode="mediane", min_valides=3)
+    centre = grille_journaliere(temps, base["centre"])[0]
+    # Trois jours précédents suffisent : la ligne de base commence au jour 3, pas au jour 15
+    assert np.isnan(centre[:3]).all()
+    assert np.isfinite(centre[3:]).all()
+
+
+def test_points_multiples_et_anomalie():
+    temps, valeurs = _serie(lacunes=0.0)
+    pile = np.stack([valeurs, valeurs + 5.0], axis=1)
+    pile[-1, 1] += 100.0
+    base = ligne_de_base(temps, pile, fenetre=15, methode="mediane")
+    assert base["centre"].shape == pile.shape
+    disponibles = np.isfinite(base["centre"][:, 0])
+    np.testing.assert_array_equal(np.isfinite(base["centre"][:, 1]), disponibles)
+    np.testing.assert_allclose(base["centre"][disponibles, 1] - base["centre"][disponibles, 0], 5.0, rtol=1e-5)
+    assert base["anomalie"][-1, 1]
+    assert base["indice"][-1, 1] > 1
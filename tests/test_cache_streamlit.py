@@ -0,0 +1,136 @@
+import gzip
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+
+from scripts import cache_streamlit  # noqa: E402
+from scripts.cache_streamlit import empreinte_upload, jeu_ionex, taille_jeu  # noqa: E402
+
+
+@pytest.fixture
+def contenus(archive_ionex):
+    resultat = []
+    for chemin in archive_ionex:
+        with open(chemin, "rb") as f:
+            contenu = f.read()
+        resultat.append((cache_streamlit.cle_contenu(contenu), contenu))
+    return resultat
+
+
+@pytest.fixture
+def chargements(monkeypatch, dossier_cache):
+    """Cache des jeux vidé ; compte les chargements effectifs (cache disque isolé)."""
+    appels = []
+    charger_ionex = cache_streamlit.charger_ionex
+
+    def charger(contenu, nom=None):
+        appels.append(nom)
+        return charger_ionex(contenu, dossier_cache, nom=nom)
+
+    monkeypatch.setattr(cache_streamlit, "_JEUX", OrderedDict())
+    monkeypatch.setattr(cache_streamlit, "charger_ionex", charger)
+    return appels
+
+
+def test_jeu_partage_entre_appels(contenus, chargements):
+    cle, contenu = contenus[0]
+    ds = jeu_ionex(cle, contenu, "CODG0370.23i")
+    assert jeu_ionex(cle, memoryview(contenu)) is ds
+    assert chargements == ["CODG0370.23i"] and ds["cle"] == cle
+
+    class Depose:
+        def getbuffer(self):
+            return memoryview(contenu)
+
+    assert empreinte_upload(Depose()) == cle
+
+
+def test_jeux_bornes_en_nombre(contenus, chargements, monkeypatch):
+    monkeypatch.setattr(cache_streamlit, "MAX_JEUX", 2)
+    for cle, contenu in contenus:
+        jeu_ionex(cle, contenu)
+    assert list(cache_streamlit._JEUX) == [contenus[1][0], contenus[2][0]]
+
+    # Le jeu évincé est rechargé, le plus ancien restant part à son tour
+    jeu_ionex(*contenus[0])
+    assert len(chargements) == 4
+    assert list(cache_streamlit._JEUX) == [contenus[2][0], contenus[0][0]]
+
+
+def test_jeux_bornes_en_octets(contenus, chargements, monkeypatch):
+    octets = taille_jeu(jeu_ionex(*contenus[0]))
+    assert octets > 0
+    monkeypatch.setattr(cache_streamlit, "MAX_OCTETS_JEUX", 2 * octets)
+
+    jeu_ionex(*contenus[1])
+    jeu_ionex(*contenus[0])  # le plus récemment utilisé
+    jeu_ionex(*contenus[2])
+    assert list(cache_streamlit._JEUX) == [contenus[0][0], contenus[2][0]]
+    assert sum(o for _, o in cache_streamlit._JEUX.values()) <= cache_streamlit.MAX_OCTETS_JEUX
+
+    # Un jeu plus gros que le budget reste servi : seul le dernier chargé est gardé
+    monkeypatch.setattr(cache_streamlit, "MAX_OCTETS_JEUX", octets // 2)
+    ds = jeu_ionex(*contenus[1])
+    assert list(cache_streamlit._JEUX) == [contenus[1][0]] and jeu_ionex(*contenus[1]) is ds
+    assert len(chargements) == 4
+
+
+def test_decompression_deversee_au_dela_du_seuil(contenus, tmp_path):
+    contenu = contenus[0][1]
+    compresse, nom = gzip.compress(contenu), "CODG0370.23i.gz"
+
+    # Sous le seuil : tout reste en mémoire
+    with cache_streamlit.decompresser_en_memoire(compresse, nom, str(tmp_path)) as sortie:
+        assert not sortie._rolled and sortie.read() == contenu
+
+    # Au-delà : bascule sur disque dans le dossier de session, contenu identique
+    with cache_streamlit.decompresser_en_memoire(compresse, nom, str(tmp_path), seuil=1024) as sortie:
+        assert sortie._rolled
+        if os.path.isdir("/proc/self/fd"):
+            assert os.readlink(f"/proc/self/fd/{sortie.fileno()}").startswith(str(tmp_path))
+        assert sortie.tell() == 0 and sortie.read() == contenu
+
+
+def test_dossier_session_supprime_a_l_arret(monkeypatch):
+    enregistres = []
+    monkeypatch.setattr(cache_streamlit.st, "session_state", {})
+    monkeypatch.setattr(cache_streamlit.atexit, "register",
+                        lambda fonction, *args, **kwargs: enregistres.append((fonction, args, kwargs)))
+
+    dossier = cache_streamlit.dossier_session()
+    assert os.path.isdir(dossier) and cache_streamlit.dossier_session() == dossier
+    assert len(enregistres) == 1
+
+    with open(os.path.join(dossier, "CODG0370.23i"), "wb") as f:
+        f.write(b"x" * 100)
+    fonction, args, kwargs = enregistres[0]
+    fonction(*args, **kwargs)
+    assert not os.path.exists(dossier)
+
+
+def test_fichier_local_lu_via_index(archive_ionex, monkeypatch):
+    from scripts.ionex_parser import lire_ionex
+
+    chemin = archive_ionex[1]
+    ds = lire_ionex(chemin)
+    signature = cache_streamlit.signature_fichier(chemin)
+    epoque, valeur = cache_streamlit.tec_point_fichier(chemin, signature, 6, 23.0, 96.0)
+    i, j = np.abs(ds["latitudes"] - 23.0).argmin(), np.abs(ds["longitudes"] - 96.0).argmin()
+    k = int(np.flatnonzero(ds["epoques"] == epoque)[0])
+    assert epoque.astype("datetime64[h]").astype(int) % 24 == 6 and valeur == ds["tec"][k, i, j]
+
+    pytest.importorskip("cartopy")
+    from scripts import fond_carte, plot_ionex_map
+
+    lectures = []
+    lire_cartes_heure = plot_ionex_map.lire_cartes_heure
+    monkeypatch.setattr(plot_ionex_map, "lire_cartes_heure",
+                        lambda *args, **kwargs: lectures.append(args) or lire_cartes_heure(*args, **kwargs))
+    monkeypatch.setattr(fond_carte, "couches_fond",
+                        lambda style, largeur, *args, **kwargs: (np.zeros((largeur // 2, largeur, 4), np.uint8),) * 2)
+    png = cache_streamlit.carte_heure_fichier_png(chemin, signature, 6, 23.0, 96.0)
+    assert png.startswith(b"\x89PNG") and lectures == [(chemin, 6)]
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+import pytest
+
+from scripts import corecteur_du_fichier
+from scripts.corecteur_du_fichier import (corriger_dossier_ionex, corriger_fichier_ionex, corriger_ligne_lat,
+                                          resumer_corrections)
+from scripts.ionex_parser import lire_ionex
+from scripts.synthetique import generer_archive_ionex
+
+ETIQUETTE = b"LAT/LON1/LON2/DLON/H"
+
+
+def _lignes_lat(chemin):
+    with open(chemin, "rb") as f:
+        return [ligne for ligne in f if ETIQUETTE in ligne]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Deux jours au format CODE : toutes les lignes LAT ont des champs collés ('87.5-180.0')."""
+    return generer_archive_ionex(str(tmp_path / "ionex"), "2023-02-06", 2)
+
+
+@pytest.mark.parametrize("ligne, attendu", [
+    (b"    87.5-180.0 180.0   5.0 450.0", [87.5, -180.0, 180.0, 5.0, 450.0]),
+    (b"   -87.5-180.0 180.0   5.0 450.0", [-87.5, -180.0, 180.0, 5.0, 450.0]),
+    # Ligne déjà décalée par une ancienne correction : valeurs relues dans le texte
+    (b"  87.5 -180.0 180.0 5.0 450.0", [87.5, -180.0, 180.0, 5.0, 450.0]),
+])
+def test_corriger_ligne_lat(ligne, attendu):
+    for fin in (b"\n", b"\r\n", b""):
+        corrigee = corriger_ligne_lat(ligne.ljust(60) + ETIQUETTE + fin)
+        assert corrigee.endswith(ETIQUETTE + fin)
+        assert corrigee.index(ETIQUETTE) == 60
+        assert [float(v) for v in corrigee[:60].split()] == attendu
+
+
+def test_ligne_lat_illisible():
+    with pytest.raises(ValueError, match="illisible"):
+        corriger_ligne_lat(b"  87.5 -180.0".ljust(60) + ETIQUETTE + b"\n")
+
+
+@pytest.mark.parametrize("taille_bloc", [7, 97, 4096])
+def test_lignes_coupees_entre_deux_blocs(archive, tmp_path, monkeypatch, taille_bloc):
+    source = archive[0]
+    reference = str(tmp_path / "reference.23i")
+    corriger_fichier_ionex(source, reference)
+
+    # Petits blocs : des lignes LAT et leur étiquette sont coupées à la frontière de deux lectures
+    monkeypatch.setattr(corecteur_du_fichier, "TAILLE_BLOC", taille_bloc)
+
+    sortie = str(tmp_path / "sortie.23i")
+    statistiques = corriger_fichier_ionex(source, sortie)
+    assert statistiques["statut"] == "corrige"
+    assert statistiques["lignes_corrigees"] == len(_lignes_lat(source))
+    with open(sortie, "rb") as f, open(reference, "rb") as g:
+        assert f.read() == g.read()
+
+
+def test_en_place_et_dossier_de_sortie(archive, tmp_path):
+    source = archive[0]
+    with open(source, "rb") as f:
+        original = f.read()
+    tec = lire_ionex(source)["tec"]
+
+    sortie = str(tmp_path / "corrige" / os.path.basename(source))
+    os.makedirs(os.path.dirname(sortie))
+    statistiques = corriger_fichier_ionex(source, sortie)
+    assert statistiques["sortie"] == sortie and statistiques["statut"] == "corrige"
+    with open(source, "rb") as f:
+        assert f.read() == original
+    assert all(len(ligne[:60].split()) == 5 for ligne in _lignes_lat(sortie))
+    assert statistiques["octets_lus"] == len(original) and statistiques["octets_ecrits"] == os.path.getsize(sortie)
+
+    statistiques = corriger_fichier_ionex(source)
+    assert statistiques["sortie"] == source and statistiques["statut"] == "corrige"
+    with open(source, "rb") as f, open(sortie, "rb") as g:
+        assert f.read() == g.read()
+    np.testing.assert_array_equal(lire_ionex(source)["tec"], tec)
+    assert [f for f in os.listdir(os.path.dirname(source)) if f.endswith(".tmp")] == []
+
+
+def test_fichier_valide_lie_sans_copie(archive, tmp_path):
+    source = archive[0]
+    corriger_fichier_ionex(source)
+    mtime = os.stat(source).st_mtime_ns
+
+    # Second passage en place : rien n'est réécrit
+    statistiques = corriger_fichier_ionex(source)
+    assert statistiques["statut"] == "valide" and statistiques["octets_ecrits"] == 0
+    assert os.stat(source).st_mtime_ns == mtime
+
+    # Vers un autre dossier : lien physique, aucun octet copié (même s'il existait déjà)
+    sortie = str(tmp_path / "valide.23i")
+    for _ in range(2):
+        statistiques = corriger_fichier_ionex(source, sortie)
+        assert statistiques["statut"] == "valide" and statistiques["octets_ecrits"] == 0
+        assert os.path.samefile(source, sortie)
+
+
+def test_verifier_seulement(archive, tmp_path):
+    source = archive[0]
+    with open(source, "rb") as f:
+        original = f.read()
+    mtime = os.stat(source).st_mtime_ns
+    sortie = str(tmp_path / "sortie")
+
+    corriges, echecs = corriger_dossier_ionex(os.path.dirname(source), sortie, extensions=("i",),
+                                              verifier_seulement=True)
+    assert echecs == [] and [f for f, _ in corriges] == archive
+    assert all(s["statut"] == "a_corriger" and s["octets_ecrits"] == 0 for _, s in corriges)
+    assert corriges[0][1]["lignes_corrigees"] == len(_lignes_lat(source))
+    assert not os.path.exists(sortie)
+    with open(source, "rb") as f:
+        assert f.read() == original
+    assert os.stat(source).st_mtime_ns == mtime
+
+    corriger_fichier_ionex(source)
+    assert corriger_fichier_ionex(source, verifier_seulement=True)["statut"] == "valide"
+
+
+def test_dossier_et_resume(archive, tmp_path):
+    dossier = os.path.dirname(archive[0])
+    with open(os.path.join(dossier, "CODG0390.23i"), "w") as f:
+        f.write("pas un fichier IONEX\n".ljust(60) + "LAT/LON1/LON2/DLON/H\n")
+    corriger_fichier_ionex(archive[1])
+    suivi = []
+
+    corriges, echecs = corriger_dossier_ionex(dossier, str(tmp_path / "sortie"), extensions=("i",),
+                                              rappel=lambda n, total, s: suivi.append((n, total)))
+    assert [os.path.basename(f) for f, _ in echecs] == ["CODG0390.23i"]
+    assert [s["statut"] for _, s in corriges] == ["corrige", "valide"]
+    assert suivi == [(1, 3), (2, 3), (3, 3)]
+
+    resume = resumer_corrections(corriges)
+    assert resume["corriges"] == 1 and resume["valides"] == 1 and resume["a_corriger"] == 0
+    assert resume["lignes_corrigees"] == corriges[0][1]["lignes_corrigees"] > 0
+    assert resume["octets_lus"] == sum(os.path.getsize(f) for f in archive)
+    assert resume["octets_ecrits"] == corriges[0][1]["octets_ecrits"]
@@ -0,0 +1,79 @@
+import gzip
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from scripts.decompression import (DecompresseurLZW, ErreurDecompression, decompresser_fichier, decompresseur_pour,
+                                   extension_compression, nom_decompresse, ouvrir_flux)
+from scripts.synthetique import ecrire_ionex_synthetique
+
+ncompress = pytest.importorskip("ncompress")
+
+
+def _contenus():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as dossier:
+        with open(ecrire_ionex_synthetique(os.path.join(dossier, "CODG0370.23i"), "2023-02-06"), "rb") as f:
+            ionex = f.read()
+    return {
+        "vide": b"",
+        "octet": b"a",
+        "repetitif": b"ab" * 50_000,
+        "aleatoire": rng.integers(0, 256, 300_000, dtype=np.uint8).tobytes(),
+        # Assez de codes distincts pour atteindre 16 bits puis la réinitialisation de la table
+        "texte_long": ionex,
+    }
+
+
+CONTENUS = _contenus()
+
+
+def _decompresser_par_blocs(compresse, taille):
+    decompresseur = DecompresseurLZW()
+    morceaux = [decompresseur.decompress(compresse[i:i + taille]) for i in range(0, len(compresse), taille)]
+    return b"".join(morceaux) + decompresseur.flush()
+
+
+@pytest.mark.parametrize("nom", CONTENUS)
+def test_identique_a_ncompress(nom):
+    contenu = CONTENUS[nom]
+    assert ncompress.decompress(ncompress.compress(contenu)) == contenu
+    assert _decompresser_par_blocs(ncompress.compress(contenu), 1 << 20) == contenu
+
+
+@pytest.mark.parametrize("taille", [1, 2, 3, 7, 4096])
+def test_blocs_quelconques(taille):
+    contenu = CONTENUS["texte_long"][:200_000] if taille < 8 else CONTENUS["texte_long"]
+    assert _decompresser_par_blocs(ncompress.compress(contenu), taille) == contenu
+
+
+def test_fichier_et_flux(tmp_path):
+    contenu = CONTENUS["texte_long"]
+    chemin = tmp_path / "CODG0370.23i.Z"
+    chemin.write_bytes(ncompress.compress(contenu))
+
+    with ouvrir_flux(str(chemin)) as flux:
+        assert flux.read() == contenu
+    sortie = decompresser_fichier(str(chemin), taille_bloc=10_000)
+    assert sortie == str(tmp_path / "CODG0370.23i")
+    assert (tmp_path / "CODG0370.23i").read_bytes() == contenu
+
+
+def test_noms_et_gzip(tmp_path):
+    assert extension_compression("CODG0370.23I.Z") == ".z"
+    assert extension_compression("COD0OPSFIN_20230370000_01D_01H_GIM.INX.gz") == ".gz"
+    assert extension_compression("CODG0370.23i") is None
+    assert nom_decompresse("CODG0370.23i.Z") == "CODG0370.23i"
+
+    contenu = CONTENUS["repetitif"]
+    decompresseur = decompresseur_pour("x.gz")
+    assert decompresseur.decompress(gzip.compress(contenu)) + decompresseur.flush() == contenu
+    assert decompresseur_pour("x.txt").decompress(contenu) == contenu
+
+
+@pytest.mark.parametrize("compresse", [b"\x1f\x8b\x08", b"\x1f\x9d\x08" + b"\x00" * 4, b"\x1f\x9d\x90\xff\xff\xff"])
+def test_flux_invalide(compresse):
+    with pytest.raises(ErreurDecompression):
+        _decompresser_par_blocs(compresse, 1 << 20)
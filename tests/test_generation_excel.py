@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.generation_excel import _normaliser_sites, generer_series_TEC_multi_sites, lire_catalogue_seismes
+from scripts.sortie_series import lire_series
+from scripts.tec_cube import construire_cube, serie_zone
+
+
+def _catalogue(tmp_path, entetes, lignes):
+    chemin = tmp_path / "catalogue.csv"
+    pd.DataFrame(lignes, columns=entetes).to_csv(chemin, index=False)
+    return str(chemin)
+
+
+@pytest.mark.parametrize("entetes", [
+    ["Name", "Latitude", "Longitude"],
+    [" event ", "LAT", "Long"],
+    ["id", "lat", "lon", "magnitude"],
+])
+def test_catalogue_alias_de_colonnes(tmp_path, entetes):
+    lignes = [["Turquie", 37.2, 37.0] + [7.8] * (len(entetes) - 3), ["Maroc", 31.1, -8.4] + [6.8] * (len(entetes) - 3)]
+    sites = lire_catalogue_seismes(_catalogue(tmp_path, entetes, lignes))
+    assert sites.columns.tolist() == ["Site", "Latitude", "Longitude"]
+    assert sites["Site"].tolist() == ["Turquie", "Maroc"]
+    np.testing.assert_array_equal(sites[["Latitude", "Longitude"]].to_numpy(), [[37.2, 37.0], [31.1, -8.4]])
+
+
+def test_catalogue_sans_nom_ni_coordonnees(tmp_path):
+    sites = lire_catalogue_seismes(_catalogue(tmp_path, ["latitude", "longitude"], [[37.2, 37.0]]))
+    assert sites["Site"].tolist() == ["TEC_zone_37N_37E"]
+
+    with pytest.raises(ValueError, match="latitude et longitude"):
+        lire_catalogue_seismes(_catalogue(tmp_path, ["nom", "latitude", "profondeur"], [["Turquie", 37.2, 10.0]]))
+
+
+def test_sites_en_double_renommes():
+    sites = _normaliser_sites([("A", 10.0, 20.0), ("A", -5.0, 40.0), (10.0, 20.0), (10.0, 20.0), ("B", 0.0, 0.0)])
+    assert sites["Site"].tolist() == ["A_0", "A_1", "TEC_zone_10N_20E_2", "TEC_zone_10N_20E_3", "B"]
+    assert sites["Site"].is_unique
+    np.testing.assert_array_equal(sites["Latitude"], [10.0, -5.0, 10.0, 10.0, 0.0])
+
+
+def test_sortie_large_et_longue(tmp_path, archive_ionex, dossier_cache):
+    dossier = os.path.dirname(archive_ionex[0])
+    catalogue = _catalogue(tmp_path, ["nom", "lat", "lon"], [["Nord", 40.0, 30.0], ["Sud", -20.0, 60.0],
+                                                             ["Nord", 10.0, -100.0]])
+    large = lire_series(generer_series_TEC_multi_sites(dossier, catalogue, str(tmp_path / "large.csv")))
+    assert large.columns.tolist() == ["DateTime", "Nord_0", "Sud", "Nord_2"]
+
+    # Chaque colonne est la moyenne de zone du site, comme pour un épicentre unique
+    cube = construire_cube(dossier, dossier_cache=dossier_cache)
+    for site, lat, lon in [("Nord_0", 40.0, 30.0), ("Sud", -20.0, 60.0), ("Nord_2", 10.0, -100.0)]:
+        temps, attendu = serie_zone(cube, lat, lon, rayon=1)
+        assert len(large) == len(temps)
+        np.testing.assert_allclose(large[site].to_numpy(float), attendu, rtol=1e-6)
+
+    longue = lire_series(generer_series_TEC_multi_sites(dossier, catalogue, str(tmp_path / "long.csv"),
+                                                        format_sortie="long"))
+    assert longue.columns.tolist() == ["DateTime", "Site", "Latitude", "Longitude", "TEC"]
+    assert len(longue) == 3 * len(large)
+    sud = longue[longue["Site"] == "Sud"]
+    assert (sud["Latitude"] == -20.0).all() and (sud["Longitude"] == 60.0).all()
+    np.testing.assert_allclose(sud["TEC"].to_numpy(float), large["Sud"].to_numpy(float))
+
+    with pytest.raises(ValueError, match="Format de sortie inconnu"):
+        generer_series_TEC_multi_sites(dossier, catalogue, str(tmp_path / "x.csv"), format_sortie="large_long")
@@ -0,0 +1,77 @@
+import gzip
+import os
+
+import numpy as np
+import pytest
+
+from scripts import index_ionex
+from scripts.index_ionex import DOSSIER_INDEX, charger_index_cartes, lire_carte, lire_cartes_heure, valeur_point
+from scripts.ionex_parser import lire_ionex
+from scripts.synthetique import ecrire_ionex_synthetique
+
+
+@pytest.fixture
+def fichier(tmp_path):
+    return ecrire_ionex_synthetique(str(tmp_path / "CODG0370.23i"), "2023-02-06")
+
+
+def _compter_indexations(monkeypatch):
+    appels = []
+    indexer = index_ionex.indexer_ionex
+
+    def espion(chemin):
+        appels.append(chemin)
+        return indexer(chemin)
+
+    monkeypatch.setattr(index_ionex, "indexer_ionex", espion)
+    return appels
+
+
+def test_cartes_identiques_au_parsing_complet(fichier, dossier_cache):
+    ds = lire_ionex(fichier)
+    for k in (0, 7, len(ds["epoques"]) - 1):
+        np.testing.assert_array_equal(lire_carte(fichier, ds["epoques"][k], dossier_cache=dossier_cache), ds["tec"][k])
+        np.testing.assert_array_equal(lire_carte(fichier, ds["epoques"][k], "RMS", dossier_cache), ds["rms"][k])
+
+    heures = ds["epoques"].astype("datetime64[h]").astype(np.int64) % 24
+    for heure in (0, 13):
+        r = lire_cartes_heure(fichier, heure, dossier_cache=dossier_cache)
+        np.testing.assert_array_equal(r["epoques"], ds["epoques"][heures == heure])
+        np.testing.assert_array_equal(r["cartes"], ds["tec"][heures == heure])
+        np.testing.assert_array_equal(r["latitudes"], ds["latitudes"])
+        np.testing.assert_array_equal(r["longitudes"], ds["longitudes"])
+    # 00:00 et 24:00 du fichier journalier
+    assert len(lire_cartes_heure(fichier, 0, dossier_cache=dossier_cache)["cartes"]) == 2
+
+    i, j = np.abs(ds["latitudes"] - 23.1).argmin(), np.abs(ds["longitudes"] - 96.2).argmin()
+    assert valeur_point(fichier, 23.1, 96.2, ds["epoques"][5], dossier_cache=dossier_cache) == ds["tec"][5, i, j]
+
+    with pytest.raises(ValueError, match="Aucune carte"):
+        lire_carte(fichier, "2023-02-07T12:00", dossier_cache=dossier_cache)
+
+
+def test_index_persistant_et_invalide(fichier, dossier_cache, monkeypatch):
+    appels = _compter_indexations(monkeypatch)
+    charger_index_cartes(fichier, dossier_cache)
+    lire_cartes_heure(fichier, 12, dossier_cache=dossier_cache)
+    assert len(appels) == 1
+    assert len(os.listdir(os.path.join(dossier_cache, DOSSIER_INDEX))) == 1
+
+    # Même taille, date de modification différente : l'index est reconstruit
+    stat = os.stat(fichier)
+    os.utime(fichier, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    charger_index_cartes(fichier, dossier_cache)
+    assert len(appels) == 2
+
+    # Fichier réécrit avec une autre grille (taille différente) : les cartes lues suivent
+    ecrire_ionex_synthetique(fichier, "2023-02-06", grille_lon=(-180.0, 180.0, 10.0), graine=3)
+    ds = lire_ionex(fichier)
+    np.testing.assert_array_equal(lire_carte(fichier, ds["epoques"][3], dossier_cache=dossier_cache), ds["tec"][3])
+    assert len(appels) == 3
+
+
+def test_fichier_compresse_refuse(fichier, dossier_cache):
+    with open(fichier, "rb") as f_in, gzip.open(fichier + ".gz", "wb") as f_out:
+        f_out.write(f_in.read())
+    with pytest.raises(ValueError, match="non compressé"):
+        lire_cartes_heure(fichier + ".gz", 12, dossier_cache=dossier_cache)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from scripts.interpolation import interpoler_cube, interpoler_jeu, interpoler_tec
+from scripts.ionex_parser import lire_ionex
+from scripts.synthetique import GRILLE_LAT, GRILLE_LON, _axe, generer_archive_ionex, tec_synthetique
+from scripts.tec_cube import construire_cube
+
+LATITUDES, LONGITUDES = _axe(*GRILLE_LAT), _axe(*GRILLE_LON)
+
+
+def _cartes(n=6, debut="2023-02-06T00:00:00", pas_s=3600):
+    temps = np.datetime64(debut, "s") + np.arange(n) * np.timedelta64(pas_s, "s")
+    return temps, np.stack([tec_synthetique(t, LATITUDES, LONGITUDES) for t in temps]).astype(np.float32)
+
+
+def _points(temps, n, graine=0):
+    rng = np.random.default_rng(graine)
+    t = temps[0] + rng.integers(0, (temps[-1] - temps[0]).astype(np.int64) + 1, n).astype("timedelta64[s]")
+    return t, rng.uniform(-87.5, 87.5, n), rng.uniform(-180.0, 180.0, n)
+
+
+def test_identique_a_scipy_sans_rotation():
+    interpolate = pytest.importorskip("scipy.interpolate")
+    temps, cartes = _cartes()
+    t, lats, lons = _points(temps, 20_000)
+
+    # scipy attend des axes croissants : latitudes retournées
+    reference = interpolate.RegularGridInterpolator(
+        (temps.astype(np.int64).astype(float), LATITUDES[::-1], LONGITUDES), cartes[:, ::-1, :].astype(np.float64))
+    attendu = reference(np.column_stack([t.astype(np.int64).astype(float), lats, lons]))
+    obtenu = interpoler_tec(temps, cartes, LATITUDES, LONGITUDES, t, lats, lons, rotation=False)
+    np.testing.assert_allclose(obtenu, attendu, rtol=1e-5, atol=1e-4)
+
+
+@pytest.mark.parametrize("rotation", [False, True])
+def test_valeurs_exactes_aux_noeuds(rotation):
+    temps, cartes = _cartes()
+    k, i, j = np.meshgrid(np.arange(len(temps)), np.arange(len(LATITUDES)), np.arange(len(LONGITUDES)),
+                          indexing="ij")
+    obtenu = interpoler_tec(temps, cartes, LATITUDES, LONGITUDES, temps[k], LATITUDES[i], LONGITUDES[j],
+                            rotation=rotation)
+    np.testing.assert_allclose(obtenu, cartes, rtol=1e-6)
+
+
+def test_longitudes_periodiques():
+    temps, cartes = _cartes()
+    t = np.full(3, temps[2] + np.timedelta64(1200, "s"))
+    lats = np.full(3, 12.3)
+    a = interpoler_tec(temps, cartes, LATITUDES, LONGITUDES, t, lats, [-177.5, 182.5, 542.5])
+    np.testing.assert_allclose(a, a[0], rtol=1e-6)
+    bords = interpoler_tec(temps, cartes, LATITUDES, LONGITUDES, temps[:1], [30.0, 30.0], [-180.0, 180.0])
+    assert bords[0] == bords[1]
+
+
+def test_rotation_suit_le_soleil():
+    # Le champ synthétique est fixe par rapport au Soleil : la rotation réduit l'erreur entre deux cartes
+    temps, cartes = _cartes(pas_s=7200)
+    t, lats, lons = _points(temps, 5_000, graine=1)
+    lats = np.clip(lats, -60.0, 60.0)
+    vrai = np.array([tec_synthetique(ti, [la], [lo])[0, 0] for ti, la, lo in zip(t, lats, lons)])
+    erreurs = {rotation: np.abs(interpoler_tec(temps, cartes, LATITUDES, LONGITUDES, t, lats, lons,
+                                               rotation=rotation) - vrai).mean()
+               for rotation in (False, True)}
+    assert erreurs[True] < 0.5 * erreurs[False]
+
+
+def test_hors_periode_et_formes():
+    temps, cartes = _cartes()
+    dehors = interpoler_tec(temps, cartes, LATITUDES, LONGITUDES,
+                            [temps[0] - np.timedelta64(1, "s"), temps[-1] + np.timedelta64(1, "s")], 0.0, 0.0)
+    assert np.isnan(dehors).all()
+
+    # Diffusion : une série temporelle pour une grille de stations
+    grille = interpoler_tec(temps, cartes, LATITUDES, LONGITUDES, temps[:, None], [10.0, 20.0, 30.0], 5.0)
+    assert grille.shape == (len(temps), 3) and grille.dtype == np.float32
+
+    seule = interpoler_tec(temps[:1], cartes[:1], LATITUDES, LONGITUDES, [temps[0], temps[1]], 10.0, 5.0)
+    assert np.isfinite(seule[0]) and np.isnan(seule[1])
+
+
+def test_jeu_et_cube(tmp_path):
+    fichiers = generer_archive_ionex(str(tmp_path / "ionex"), "2022-12-31", 2)
+    cube = construire_cube(str(tmp_path / "ionex"), dossier_cube=str(tmp_path / "cube"),
+                           dossier_cache=str(tmp_path / "cache"))
+    assert len(cube["blocs"]) == 2
+    jeux = [lire_ionex(f) for f in fichiers]
+    t, lats, lons = _points(cube["temps"], 10_000, graine=2)
+
+    # Le cube garde la carte de minuit du jour suivant
+    temps = np.concatenate([jeux[0]["epoques"][:-1], jeux[1]["epoques"]])
+    cartes = np.concatenate([jeux[0]["tec"][:-1], jeux[1]["tec"]])
+    np.testing.assert_array_equal(cube["temps"], temps)
+    np.testing.assert_array_equal(interpoler_cube(cube, t, lats, lons, taille_lot=3_000),
+                                  interpoler_tec(temps, cartes, LATITUDES, LONGITUDES, t, lats, lons))
+
+    dans_le_jour = (t >= jeux[1]["epoques"][0]) & (t <= jeux[1]["epoques"][-1])
+    np.testing.assert_array_equal(interpoler_cube(cube, t[dans_le_jour], lats[dans_le_jour], lons[dans_le_jour]),
+                                  interpoler_jeu(jeux[1], t[dans_le_jour], lats[dans_le_jour], lons[dans_le_jour]))
+
+    rms = interpoler_jeu(jeux[0], jeux[0]["epoques"][:1], LATITUDES[3], LONGITUDES[4], champ="rms")
+    assert rms[0] == jeux[0]["rms"][0, 3, 4]
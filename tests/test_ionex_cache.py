@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scripts import ionex_cache, tec_cube
+from scripts.ionex_cache import FICHIER_INDEX, charger_ionex, cle_connue, cle_source, memoriser_cles
+from scripts.ionex_parser import lire_ionex
+
+
+def _compter_parsings(monkeypatch):
+    appels = []
+
+    def lire(contenu, nom=None):
+        appels.append(nom)
+        return lire_ionex(contenu, nom)
+
+    monkeypatch.setattr(ionex_cache, "lire_ionex", lire)
+    return appels
+
+
+def test_entrees_reconstruites_au_changement_de_version(archive_ionex, dossier_cache, monkeypatch):
+    appels = _compter_parsings(monkeypatch)
+    fichier = archive_ionex[0]
+    ds = charger_ionex(fichier, dossier_cache)
+    assert isinstance(ds["tec"], np.memmap) and len(appels) == 1
+    charger_ionex(fichier, dossier_cache)
+    assert len(appels) == 1
+
+    monkeypatch.setattr(ionex_cache, "VERSION_CACHE", ionex_cache.VERSION_CACHE + 1)
+    reconstruit = charger_ionex(fichier, dossier_cache)
+    assert len(appels) == 2 and reconstruit["cle"] == ds["cle"]
+    np.testing.assert_array_equal(reconstruit["tec"], ds["tec"])
+    # Les entrées de l'ancienne version restent lisibles par les processus qui les utilisent encore
+    assert {f for f in os.listdir(dossier_cache) if f.startswith("v")} == {
+        f"v{ionex_cache.VERSION_CACHE - 1}", f"v{ionex_cache.VERSION_CACHE}"}
+
+
+def test_cube_reecrit_au_changement_de_version(archive_ionex, tmp_path, monkeypatch):
+    dossier_ionex = os.path.dirname(archive_ionex[0])
+    options = {"dossier_cube": str(tmp_path / "cube"), "dossier_cache": str(tmp_path / "cache")}
+    tec_cube.construire_cube(dossier_ionex, **options)
+    bloc = str(tmp_path / "cube" / "tec_2023.npy")
+    os.utime(bloc, (1e9, 1e9))
+    tec_cube.construire_cube(dossier_ionex, **options)
+    assert os.path.getmtime(bloc) == 1e9
+
+    monkeypatch.setattr(ionex_cache, "VERSION_CACHE", ionex_cache.VERSION_CACHE + 1)
+    monkeypatch.setattr(tec_cube, "VERSION_CACHE", ionex_cache.VERSION_CACHE)
+    tec_cube.construire_cube(dossier_ionex, **options)
+    assert os.path.getmtime(bloc) != 1e9
+    with open(tmp_path / "cube" / "meta.json") as f:
+        assert json.load(f)["version"] == ionex_cache.VERSION_CACHE
+
+
+def test_index_complete_en_concurrence(dossier_cache, tmp_path):
+    os.makedirs(dossier_cache)
+    fichiers = [str(tmp_path / f"f{k}.txt") for k in range(24)]
+    for k, chemin in enumerate(fichiers):
+        with open(chemin, "w") as f:
+            f.write(f"contenu {k}\n")
+
+    # Processus et threads indexent chacun leurs fichiers : aucune entrée n'est perdue
+    entrees = [(chemin, {"taille": 0, "mtime_ns": 0, "cle": str(k)}) for k, chemin in enumerate(fichiers[:12])]
+    with ProcessPoolExecutor(max_workers=4) as executeur:
+        list(executeur.map(memoriser_cles, [dossier_cache] * 12, [[e] for e in entrees]))
+    threads = [threading.Thread(target=cle_source, args=(chemin, dossier_cache)) for chemin in fichiers[12:]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(os.path.join(dossier_cache, FICHIER_INDEX)) as f:
+        index = json.load(f)
+    assert sorted(index) == sorted(os.path.abspath(c) for c in fichiers)
+    assert all(cle_connue(chemin, dossier_cache) for chemin in fichiers[12:])
+    assert [f for f in os.listdir(dossier_cache) if f.startswith(".index_")] == []
@@ -0,0 +1,148 @@
+import gzip
+import zipfile
+
+import numpy as np
+import pytest
+
+from scripts.ionex_parser import iterer_cartes_ionex, lire_ionex
+from scripts.synthetique import (EXPOSANT, GRILLE_LAT, GRILLE_LON, _axe, ecrire_ionex_synthetique,
+                                 tec_synthetique)
+
+JOUR = "2023-02-06"
+
+
+def _attendu(jour=JOUR, graine=0):
+    """Cartes TEC (TECU) écrites par ecrire_ionex_synthetique, arrondies comme dans le fichier."""
+    latitudes, longitudes = _axe(*GRILLE_LAT), _axe(*GRILLE_LON)
+    epoques = np.datetime64(jour, "D").astype("datetime64[s]") + np.arange(0, 86401, 3600).astype("timedelta64[s]")
+    rng = np.random.default_rng(graine)
+    facteur = 10.0 ** -EXPOSANT
+    cartes = [np.rint(tec_synthetique(e, latitudes, longitudes, rng) * facteur) / facteur for e in epoques]
+    return epoques, np.array(cartes)
+
+
+def _modifier(chemin, modification):
+    with open(chemin) as f:
+        lignes = f.readlines()
+    modification(lignes)
+    with open(chemin, "w") as f:
+        f.writelines(lignes)
+
+
+def _indice(lignes, etiquette, depart=0):
+    return next(k for k in range(depart, len(lignes)) if lignes[k][60:].strip() == etiquette)
+
+
+@pytest.fixture
+def fichier(tmp_path):
+    return ecrire_ionex_synthetique(str(tmp_path / "CODG0370.23i"), JOUR)
+
+
+def test_valeurs_et_grille(fichier):
+    ds = lire_ionex(fichier)
+    epoques, cartes = _attendu()
+    np.testing.assert_array_equal(ds["epoques"], epoques)
+    np.testing.assert_array_equal(ds["latitudes"], _axe(*GRILLE_LAT))
+    np.testing.assert_array_equal(ds["longitudes"], _axe(*GRILLE_LON))
+    assert ds["tec"].dtype == np.float32 and ds["exposant"] == EXPOSANT
+    np.testing.assert_allclose(ds["tec"], cartes, atol=1e-4)
+    np.testing.assert_allclose(ds["rms"], np.maximum(np.rint(cartes * 10) // 10, 1) / 10, atol=1e-4)
+    assert ds["cartes_hauteur"] is None
+
+
+def test_lecture_en_flux_identique(fichier):
+    ds = lire_ionex(fichier)
+    cartes = list(iterer_cartes_ionex(fichier))
+    tec = [c for c in cartes if c["type"] == "TEC"]
+    rms = [c for c in cartes if c["type"] == "RMS"]
+    assert [c["numero"] for c in tec] == list(range(1, len(ds["epoques"]) + 1))
+    np.testing.assert_array_equal(np.array([c["epoque"] for c in tec], dtype="datetime64[s]"), ds["epoques"])
+    np.testing.assert_array_equal(np.stack([c["carte"] for c in tec]), ds["tec"])
+    np.testing.assert_array_equal(np.stack([c["carte"] for c in rms]), ds["rms"])
+
+
+def test_valeur_manquante(fichier):
+    def lacune(lignes):
+        rangee = _indice(lignes, "LAT/LON1/LON2/DLON/H", _indice(lignes, "START OF TEC MAP"))
+        lignes[rangee + 1] = " 9999" + lignes[rangee + 1][5:]
+
+    _modifier(fichier, lacune)
+    ds = lire_ionex(fichier)
+    flux = next(iterer_cartes_ionex(fichier))["carte"]
+    for carte in (ds["tec"][0], flux):
+        assert np.isnan(carte[0, 0])
+        assert np.isfinite(carte).sum() == carte.size - 1
+
+
+def test_exposant_propre_a_une_carte(fichier):
+    def exposant(lignes):
+        epoque = _indice(lignes, "EPOCH OF CURRENT MAP", _indice(lignes, "START OF TEC MAP"))
+        lignes.insert(epoque + 1, f"{-2:6d}".ljust(60) + "EXPONENT".ljust(20) + "\n")
+
+    _modifier(fichier, exposant)
+    ds = lire_ionex(fichier)
+    flux = [c["carte"] for c in iterer_cartes_ionex(fichier) if c["type"] == "TEC"]
+    _, cartes = _attendu()
+    np.testing.assert_allclose(ds["tec"][0], cartes[0] / 10, atol=1e-5)
+    np.testing.assert_allclose(ds["tec"][1:], cartes[1:], atol=1e-4)
+    np.testing.assert_array_equal(np.stack(flux), ds["tec"])
+
+
+def test_cartes_de_hauteur(fichier):
+    rms = lire_ionex(fichier)["rms"]
+
+    def hauteur(lignes):
+        for k, ligne in enumerate(lignes):
+            for type_carte in ("START OF", "END OF"):
+                if ligne[60:].strip() == f"{type_carte} RMS MAP":
+                    lignes[k] = ligne[:60] + f"{type_carte} HEIGHT MAP".ljust(20) + "\n"
+
+    _modifier(fichier, hauteur)
+    ds = lire_ionex(fichier)
+    assert ds["rms"] is None
+    np.testing.assert_array_equal(ds["cartes_hauteur"], rms)
+    assert {c["type"] for c in iterer_cartes_ionex(fichier)} == {"TEC", "HEIGHT"}
+
+
+@pytest.mark.parametrize("compression", ["gz", "zip"])
+def test_fichier_compresse(fichier, tmp_path, compression):
+    with open(fichier, "rb") as f:
+        contenu = f.read()
+    if compression == "gz":
+        chemin = str(tmp_path / "CODG0370.23i.gz")
+        with gzip.open(chemin, "wb") as f:
+            f.write(contenu)
+        np.testing.assert_array_equal(lire_ionex(chemin)["tec"], lire_ionex(fichier)["tec"])
+        with open(chemin, "rb") as f:
+            np.testing.assert_array_equal(lire_ionex(f.read(), nom=chemin)["tec"], lire_ionex(fichier)["tec"])
+    else:
+        chemin = str(tmp_path / "CODG0370.23i.zip")
+        with zipfile.ZipFile(chemin, "w", compression=zipfile.ZIP_DEFLATED) as z:
+            z.writestr("CODG0370.23i", contenu)
+    attendu = lire_ionex(fichier)
+    with open(chemin, "rb") as f:
+        octets = f.read()
+    for source in (chemin, octets):
+        ds = lire_ionex(source, nom=chemin)
+        np.testing.assert_array_equal(ds["epoques"], attendu["epoques"])
+        np.testing.assert_array_equal(ds["tec"], attendu["tec"])
+        np.testing.assert_array_equal(ds["rms"], attendu["rms"])
+    flux = np.stack([c["carte"] for c in iterer_cartes_ionex(chemin) if c["type"] == "TEC"])
+    np.testing.assert_array_equal(flux, lire_ionex(fichier)["tec"])
+
+
+def test_structure_incomplete(fichier):
+    def retirer_ligne(lignes):
+        rangee = _indice(lignes, "LAT/LON1/LON2/DLON/H", _indice(lignes, "START OF TEC MAP"))
+        del lignes[rangee + 1]
+
+    _modifier(fichier, retirer_ligne)
+    with pytest.raises(ValueError, match="Structure IONEX"):
+        lire_ionex(fichier)
+
+
+def test_fichier_invalide(tmp_path):
+    chemin = tmp_path / "vide.23i"
+    chemin.write_text("pas un fichier IONEX\n")
+    with pytest.raises(ValueError):
+        lire_ionex(str(chemin))
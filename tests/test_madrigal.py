@@ -0,0 +1,50 @@
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+
+from scripts.madrigal_grille import binner_tec, grille_madrigal
+from scripts.synthetique import ecrire_madrigal_ascii, ecrire_madrigal_hdf5, mesures_madrigal
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_grille_sans_couche_de_trace():
+    # Le maillage ne doit dépendre ni du module de tracé ni de cartopy
+    code = ("import sys, scripts.madrigal_grille; "
+            "assert 'scripts.madrigal_carte' not in sys.modules; assert 'cartopy' not in sys.modules")
+    subprocess.run([sys.executable, "-c", code], cwd=RACINE, check=True)
+
+
+def test_binning_reference():
+    m = mesures_madrigal("2023-01-01", 20_000)
+    heures = (m["temps"] - m["temps"].astype("datetime64[D]")).astype(np.int64) // 3600
+    grille = binner_tec(heures, m["gdlat"], m["glon"], m["tec"], resolution=5.0)
+
+    assert grille["compte"].sum() == 20_000
+    h, i, j = np.unravel_index(np.argmax(grille["compte"]), grille["compte"].shape)
+    lat0, lon0 = grille["latitudes"][i], grille["longitudes"][j]
+    dans = ((heures == h) & (m["gdlat"] >= lat0) & (m["gdlat"] < lat0 + 5.0)
+            & (m["glon"] >= lon0) & (m["glon"] < lon0 + 5.0))
+    assert grille["compte"][h, i, j] == dans.sum() > 1
+    np.testing.assert_allclose(grille["moyenne"][h, i, j], m["tec"][dans].mean(), rtol=1e-5)
+    np.testing.assert_allclose(grille["mediane"][h, i, j], np.median(m["tec"][dans]), rtol=1e-5)
+
+
+def test_ascii_gz_et_hdf5_identiques(tmp_path, dossier_cache):
+    ascii_ = ecrire_madrigal_ascii(str(tmp_path / "m.txt"), "2023-01-01", 20_000)
+    with open(ascii_, "rb") as src, gzip.open(str(tmp_path / "m.txt.gz"), "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    hdf5 = ecrire_madrigal_hdf5(str(tmp_path / "m.hdf5"), "2023-01-01", 20_000)
+
+    g_ascii = grille_madrigal(ascii_, resolution=5.0, dossier_cache=dossier_cache)
+    g_gz = grille_madrigal(str(tmp_path / "m.txt.gz"), resolution=5.0, dossier_cache=dossier_cache)
+    g_hdf5 = grille_madrigal(hdf5, resolution=5.0, dossier_cache=dossier_cache)
+
+    for g in (g_gz, g_hdf5):
+        np.testing.assert_array_equal(g["compte"], g_ascii["compte"])
+        np.testing.assert_allclose(g["moyenne"], g_ascii["moyenne"], rtol=1e-5, equal_nan=True)
+    assert os.listdir(os.path.join(dossier_cache, "madrigal_grilles"))
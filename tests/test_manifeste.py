@@ -0,0 +1,272 @@
+import datetime
+import functools
+import gzip
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts.manifeste import (charger_manifeste, chemin_manifeste, dates_manquantes, enregistrer_produit,
+                               memoriser_produit, produit_a_jour, sauver_manifeste)
+
+JOUR = datetime.date(2023, 2, 6)
+
+
+@pytest.fixture
+def produit(tmp_path):
+    chemin = tmp_path / "CODG0370.23i"
+    chemin.write_bytes(b"contenu IONEX\n" * 100)
+    return str(chemin)
+
+
+def test_aller_retour(tmp_path, produit):
+    dossier = str(tmp_path / "archive")
+    assert charger_manifeste(dossier) == {}
+
+    manifeste = {}
+    enregistrer_produit(manifeste, "igs_codg", JOUR, produit, {"taille": "1400", "modifie": "hier"})
+    sauver_manifeste(dossier, manifeste)
+    assert charger_manifeste(dossier) == manifeste
+    assert os.listdir(dossier) == ["manifeste.json"]
+
+    entree = manifeste["igs_codg:2023-02-06"]
+    assert entree["chemin"] == os.path.abspath(produit) and entree["taille"] == 1400
+
+    with open(chemin_manifeste(dossier), "w") as f:
+        f.write("{ tronqué")
+    assert charger_manifeste(dossier) == {}
+
+
+def test_produit_a_jour(tmp_path, produit):
+    distant = {"taille": "1400", "modifie": "hier"}
+    manifeste = {}
+    assert not produit_a_jour(manifeste, "igs_codg", JOUR)
+    enregistrer_produit(manifeste, "igs_codg", JOUR, produit, distant)
+
+    assert produit_a_jour(manifeste, "igs_codg", JOUR)
+    assert produit_a_jour(manifeste, "igs_codg", JOUR, distant, verifier_checksum=True)
+    assert not produit_a_jour(manifeste, "madrigal_tec", JOUR)
+    assert not produit_a_jour(manifeste, "igs_codg", JOUR + datetime.timedelta(days=1))
+    # Changement côté serveur
+    assert not produit_a_jour(manifeste, "igs_codg", JOUR, {"taille": "1400", "modifie": "aujourd'hui"})
+
+    # Altération locale de même taille : seule la somme de contrôle la détecte
+    with open(produit, "r+b") as f:
+        f.write(b"C")
+    assert produit_a_jour(manifeste, "igs_codg", JOUR)
+    assert not produit_a_jour(manifeste, "igs_codg", JOUR, verifier_checksum=True)
+    assert dates_manquantes(manifeste, "igs_codg", [JOUR], verifier_checksum=True) == [JOUR]
+
+    with open(produit, "ab") as f:
+        f.write(b"x")
+    assert not produit_a_jour(manifeste, "igs_codg", JOUR)
+    os.remove(produit)
+    assert dates_manquantes(manifeste, "igs_codg", [JOUR]) == [JOUR]
+
+
+def test_memoriser_produit_concurrent(tmp_path, produit):
+    dossier = str(tmp_path / "archive")
+    jours = [JOUR + datetime.timedelta(days=k) for k in range(40)]
+
+    def memoriser(depart):
+        for jour in jours[depart::8]:
+            memoriser_produit(dossier, "igs_codg", jour, produit)
+
+    threads = [threading.Thread(target=memoriser, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    manifeste = charger_manifeste(dossier)
+    assert sorted(manifeste) == sorted(f"igs_codg:{j.isoformat()}" for j in jours)
+    assert dates_manquantes(manifeste, "igs_codg", jours) == []
+
+
+class ArchiveLocale:
+    """Serveur HTTP local servant un dossier (GET et HEAD avec Content-Length / Last-Modified)."""
+
+    def __init__(self, racine):
+        self.requetes = []
+        archive = self
+
+        class Gestionnaire(SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_head(self):
+                archive.requetes.append((self.command, self.path))
+                return super().send_head()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Gestionnaire, directory=racine))
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def get(self):
+        return [chemin for commande, chemin in self.requetes if commande == "GET"]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _publier(racine, jour, graine=0):
+    from scripts.igs_downloader import build_cddis_filename_and_url
+    from scripts.synthetique import ecrire_ionex_synthetique
+
+    nom, url = build_cddis_filename_and_url(jour, "")
+    chemin = os.path.join(racine, url.lstrip("/"))
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    ecrire_ionex_synthetique(chemin + ".brut", jour, graine=graine)
+    with open(chemin + ".brut", "rb") as f_in, gzip.open(chemin, "wb") as f_out:
+        f_out.write(f_in.read())
+    os.remove(chemin + ".brut")
+    return chemin
+
+
+def test_synchronisation_igs(tmp_path):
+    pytest.importorskip("streamlit")
+    from scripts import igs_downloader
+
+    racine, dossier = str(tmp_path / "serveur"), str(tmp_path / "archive")
+    jours = [JOUR, JOUR + datetime.timedelta(days=1)]
+    publies = [_publier(racine, j) for j in jours]
+
+    def synchroniser(**options):
+        return igs_downloader.download_and_uncompress_ionex(jours[0], jours[-1], dossier, n_paralleles=2,
+                                                           base_url=serveur.url, auth=("u", "p"), **options)
+
+    with ArchiveLocale(racine) as serveur:
+        synchroniser()
+        assert len(serveur.get()) == 2
+        assert dates_manquantes(charger_manifeste(dossier), igs_downloader.SOURCE_MANIFESTE, jours) == []
+
+        # Rien de changé : seules les requêtes HEAD sont émises
+        serveur.requetes.clear()
+        logs = synchroniser()
+        assert serveur.get() == [] and len(serveur.requetes) == 2
+        assert all(log.startswith("⏩") for log in logs)
+
+        # Un jour retraité sur le serveur est seul récupéré à nouveau
+        os.remove(publies[1])
+        _publier(racine, jours[1], graine=5)
+        os.utime(publies[1], (1e9, 1e9))
+        serveur.requetes.clear()
+        synchroniser()
+        assert len(serveur.get()) == 1 and serveur.get()[0].endswith(os.path.basename(publies[1]))
+
+        serveur.requetes.clear()
+        synchroniser(verifier_distant=False)
+        assert serveur.requetes == []
+
+
+def test_manifeste_sauve_apres_chaque_jour(tmp_path, monkeypatch):
+    pytest.importorskip("streamlit")
+    from scripts import igs_downloader
+
+    racine, dossier = str(tmp_path / "serveur"), str(tmp_path / "archive")
+    jours = [JOUR, JOUR + datetime.timedelta(days=1)]
+    for jour in jours:
+        _publier(racine, jour)
+    telecharger = igs_downloader.try_download_ionex_for_day
+
+    def interrompre(date_obj, *args, **kwargs):
+        if date_obj == jours[1]:
+            raise KeyboardInterrupt
+        return telecharger(date_obj, *args, **kwargs)
+
+    monkeypatch.setattr(igs_downloader, "try_download_ionex_for_day", interrompre)
+    with ArchiveLocale(racine) as serveur:
+        with pytest.raises(KeyboardInterrupt):
+            igs_downloader.download_and_uncompress_ionex(jours[0], jours[1], dossier, n_paralleles=1,
+                                                         base_url=serveur.url, auth=("u", "p"))
+    assert dates_manquantes(charger_manifeste(dossier), igs_downloader.SOURCE_MANIFESTE, jours) == jours[1:]
+
+
+class FauxMadrigal:
+    """Serveur Madrigal minimal : une expérience TEC par jour, datée par uttimestamp."""
+
+    experiences = {}
+    extension = ".hdf5"
+    telechargements = []
+    interrogations = []
+
+    def __init__(self, url):
+        pass
+
+    def getExperiments(self, code, y, m, d, *args):
+        jour = datetime.date(y, m, d)
+        FauxMadrigal.interrogations.append(jour)
+        if jour not in self.experiences:
+            return []
+        identifiant, date_maj = self.experiences[jour]
+        return [type("Experience", (), {"id": identifiant, "name": "World-wide GNSS Receiver Network TEC",
+                                        "uttimestamp": date_maj})()]
+
+    def getExperimentFiles(self, identifiant):
+        return [type("Fichier", (), {"name": f"/experiments/gps{identifiant}{self.extension}"})()]
+
+    def downloadFile(self, nom, chemin, *identite):
+        FauxMadrigal.telechargements.append(nom)
+        contenu = nom.encode() * 10
+        with open(chemin, "wb") as f:
+            f.write(gzip.compress(contenu) if nom.endswith(".gz") else contenu)
+
+
+def test_synchronisation_madrigal(tmp_path, monkeypatch, capsys):
+    mw = pytest.importorskip("madrigalWeb.madrigalWeb")
+    from scripts import sync_archive
+
+    monkeypatch.setattr(mw, "MadrigalData", FauxMadrigal)
+    monkeypatch.setattr(FauxMadrigal, "experiences", {JOUR: (101, 1000),
+                                                      JOUR + datetime.timedelta(days=1): (102, 1000)})
+    monkeypatch.setattr(FauxMadrigal, "telechargements", [])
+    monkeypatch.setattr(FauxMadrigal, "interrogations", [])
+    dossier = str(tmp_path / "madrigal")
+
+    def synchroniser(*options):
+        FauxMadrigal.telechargements.clear()
+        FauxMadrigal.interrogations.clear()
+        sync_archive.main(["madrigal", "2023-02-06", "2023-02-07", dossier, *options])
+
+    synchroniser()
+    assert len(FauxMadrigal.telechargements) == 2
+    manifeste = charger_manifeste(dossier)
+    assert manifeste["madrigal_tec:2023-02-06"]["distant"] == {"experiences": [[101, 1000]]}
+
+    synchroniser()
+    assert FauxMadrigal.telechargements == [] and len(FauxMadrigal.interrogations) == 2
+
+    # Expérience retraitée sur le serveur : seul ce jour est téléchargé à nouveau
+    FauxMadrigal.experiences[JOUR] = (101, 2000)
+    synchroniser()
+    assert FauxMadrigal.telechargements == ["/experiments/gps101.hdf5"]
+
+    FauxMadrigal.experiences[JOUR] = (101, 3000)
+    synchroniser("--sans-verification-distante")
+    assert FauxMadrigal.telechargements == [] and FauxMadrigal.interrogations == []
+    assert "2 fichier(s)" in capsys.readouterr().out
+
+
+def test_madrigal_fichiers_decompresses_dans_l_ordre_des_dates(tmp_path, monkeypatch):
+    mw = pytest.importorskip("madrigalWeb.madrigalWeb")
+    from scripts import madrigal_downloader
+
+    lendemain = JOUR + datetime.timedelta(days=1)
+    monkeypatch.setattr(mw, "MadrigalData", FauxMadrigal)
+    monkeypatch.setattr(FauxMadrigal, "experiences", {JOUR: (101, 1000), lendemain: (102, 1000)})
+    monkeypatch.setattr(FauxMadrigal, "extension", ".hdf5.gz")
+    monkeypatch.setattr(FauxMadrigal, "telechargements", [])
+    monkeypatch.setattr(FauxMadrigal, "interrogations", [])
+    dossier = str(tmp_path / "madrigal")
+
+    # Le second jour est déjà présent : il reste à sa place dans la liste renvoyée
+    madrigal_downloader.telecharger_donnees_tec(lendemain, lendemain, dossier)
+    fichiers = madrigal_downloader.telecharger_donnees_tec(JOUR, lendemain, dossier)
+    assert [os.path.basename(f) for f in fichiers] == ["gps101.hdf5", "gps102.hdf5"]
+    with open(fichiers[0], "rb") as f:
+        assert f.read() == b"/experiments/gps101.hdf5.gz" * 10
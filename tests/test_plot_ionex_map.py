@@ -0,0 +1,68 @@
+import warnings
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cartopy")
+
+from scripts import fond_carte  # noqa: E402
+from scripts.plot_ionex_map import (afficher_carte_statistique, cartes_par_heure, images_par_heure,  # noqa: E402
+                                    statistiques_journalieres)
+
+
+@pytest.fixture
+def ds():
+    """Cartes toutes les 30 min sur un jour et demi (00:00 à 12:00 du lendemain), avec des lacunes."""
+    epoques = np.arange(np.datetime64("2023-02-06T00:00"), np.datetime64("2023-02-07T12:30"),
+                        np.timedelta64(30, "m")).astype("datetime64[s]")
+    rng = np.random.default_rng(0)
+    tec = rng.uniform(5.0, 80.0, (len(epoques), 15, 24)).astype(np.float32)
+    tec[rng.random(tec.shape) < 0.1] = np.nan
+    tec[:, 2, 3] = np.nan  # nœud sans aucune donnée
+    heures = epoques.astype("datetime64[h]").astype(np.int64) % 24
+    tec[heures == 5, 4, 4] = np.nan  # nœud sans donnée à 05h seulement
+    return {"epoques": epoques, "tec": tec,
+            "latitudes": np.linspace(87.5, -87.5, 15), "longitudes": np.linspace(-180.0, 165.0, 24)}
+
+
+def _sans_avertissement(fonction, *args, **kwargs):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # tranches entièrement NaN
+        return fonction(*args, **kwargs)
+
+
+def test_cartes_par_heure(ds):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        heures, cartes = cartes_par_heure(ds)
+    np.testing.assert_array_equal(heures, np.arange(24))
+    assert cartes.dtype == np.float32 and cartes.shape == (24,) + ds["tec"].shape[1:]
+
+    heures_epoques = ds["epoques"].astype("datetime64[h]").astype(np.int64) % 24
+    for heure, carte in zip(heures, cartes):
+        attendu = _sans_avertissement(np.nanmean, ds["tec"][heures_epoques == heure].astype(np.float64), axis=0)
+        np.testing.assert_allclose(carte, attendu, rtol=1e-6, equal_nan=True)
+    assert np.isnan(cartes[:, 2, 3]).all()
+    assert np.isnan(cartes[5, 4, 4]) and np.isfinite(cartes[6, 4, 4])
+
+
+def test_statistiques_journalieres(ds):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        stats = statistiques_journalieres(ds)
+    for nom, reference in (("moyenne", np.nanmean), ("min", np.nanmin), ("max", np.nanmax)):
+        np.testing.assert_allclose(stats[nom], _sans_avertissement(reference, ds["tec"], axis=0), rtol=1e-6,
+                                   equal_nan=True)
+    assert np.isnan(stats["max"][2, 3]) and np.isfinite(stats["max"][4, 4])
+
+    with pytest.raises(ValueError, match="Statistique inconnue"):
+        afficher_carte_statistique(ds, "mediane")
+
+
+def test_images_par_heure(ds, monkeypatch):
+    monkeypatch.setattr(fond_carte, "couches_fond",
+                        lambda style, largeur, *args, **kwargs: (np.zeros((largeur // 2, largeur, 4), np.uint8),) * 2)
+    images = _sans_avertissement(images_par_heure, ds, 23.0, 96.0, dpi=20)
+    assert sorted(images) == list(range(24))
+    assert all(png.startswith(b"\x89PNG") for png in images.values())
+    assert len(set(images.values())) == 24
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scripts.profilage import Journal, activer_journal, desactiver_journal, etape, propager_contexte
+
+
+@pytest.fixture
+def journal():
+    journal = Journal()
+    jeton = activer_journal(journal)
+    yield journal
+    desactiver_journal(jeton)
+
+
+@etape("calcul.feuille", niveau="bas")
+def _feuille(x):
+    return x * 2
+
+
+def test_sans_journal_rien_n_est_mesure():
+    assert _feuille(3) == 6
+    with etape("hors_journal") as mesure:
+        assert mesure._etat is None
+
+
+def test_etapes_imbriquees(journal):
+    with etape("action", fichier="CODG0370.23i"):
+        with etape("action.lecture"):
+            _feuille(1)
+        _feuille(2)
+    with pytest.raises(ValueError):
+        with etape("action.echec"):
+            raise ValueError("fichier illisible")
+
+    lignes = journal.lignes()
+    assert [(e["nom"], e["profondeur"]) for e in lignes] == [
+        ("action", 0), ("action.lecture", 1), ("calcul.feuille", 2), ("calcul.feuille", 1), ("action.echec", 0)]
+    parent, lecture, feuille = lignes[:3]
+    assert parent["fichier"] == "CODG0370.23i" and feuille["niveau"] == "bas"
+    # Chaque étape est comprise dans l'intervalle de son parent
+    for enfant, englobante in ((lecture, parent), (feuille, lecture), (lignes[3], parent)):
+        assert englobante["debut_s"] <= enfant["debut_s"]
+        assert enfant["debut_s"] + enfant["duree_s"] <= englobante["debut_s"] + englobante["duree_s"]
+    assert lignes[-1]["erreur"] == "ValueError: fichier illisible" and parent["erreur"] is None
+    assert all(e["duree_s"] >= 0 and e["cpu_s"] >= 0 for e in lignes)
+
+    resume = {t["nom"]: t for t in journal.resume()}
+    assert list(resume) == ["action", "action.lecture", "calcul.feuille", "action.echec"]
+    assert resume["calcul.feuille"]["appels"] == 2
+    assert resume["calcul.feuille"]["duree_s"] == pytest.approx(feuille["duree_s"] + lignes[3]["duree_s"])
+
+
+def test_journal_desactive_et_retabli():
+    exterieur, interieur = Journal(), Journal()
+    jeton = activer_journal(exterieur)
+    try:
+        jeton_interieur = activer_journal(interieur)
+        _feuille(1)
+        desactiver_journal(jeton_interieur)
+        _feuille(2)
+    finally:
+        desactiver_journal(jeton)
+    _feuille(3)
+    assert len(interieur.etapes) == 1 and len(exterieur.etapes) == 1
+
+
+def test_propagation_aux_threads(journal):
+    with etape("action"):
+        with ThreadPoolExecutor(max_workers=4) as executeur:
+            # Sans propagation, les threads ne voient pas le journal
+            list(executeur.map(_feuille, range(4)))
+            assert [e["nom"] for e in journal.etapes] == []
+
+            resultats = list(executeur.map(propager_contexte(_feuille), range(8)))
+    assert resultats == [2 * k for k in range(8)]
+
+    feuilles = [e for e in journal.lignes() if e["nom"] == "calcul.feuille"]
+    assert len(feuilles) == 8
+    # Les étapes des threads sont rattachées à l'étape appelante
+    assert all(e["profondeur"] == 1 for e in feuilles)
+    assert threading.get_ident() not in {e["thread"] for e in feuilles}
+    assert {e["thread"] for e in journal.lignes() if e["nom"] == "action"} == {threading.get_ident()}
+
+
+def test_export_chrome_trace(journal):
+    with etape("rendu.carte", heure=12):
+        _feuille(1)
+
+    trace = json.loads(journal.exporter_chrome_trace())
+    assert trace["displayTimeUnit"] == "ms"
+    evenements = trace["traceEvents"]
+    assert [e["name"] for e in evenements] == ["rendu.carte", "calcul.feuille"]
+    assert [e["cat"] for e in evenements] == ["rendu", "calcul"]
+    for evenement, ligne in zip(evenements, journal.lignes()):
+        assert set(evenement) == {"name", "cat", "ph", "ts", "dur", "pid", "tid", "args"}
+        assert evenement["ph"] == "X" and evenement["pid"] == os.getpid() and evenement["tid"] == ligne["thread"]
+        assert evenement["ts"] == pytest.approx(ligne["debut_s"] * 1e6)
+        assert evenement["dur"] == pytest.approx(ligne["duree_s"] * 1e6)
+        assert not {"nom", "debut_s", "duree_s", "thread"} & set(evenement["args"])
+    parent, enfant = evenements
+    assert parent["args"]["heure"] == 12 and parent["args"]["profondeur"] == 0
+    assert parent["ts"] <= enfant["ts"] and enfant["ts"] + enfant["dur"] <= parent["ts"] + parent["dur"]
+
+    structure = json.loads(journal.exporter_json())
+    assert structure["pid"] == os.getpid()
+    assert [e["nom"] for e in structure["etapes"]] == ["rendu.carte", "calcul.feuille"]
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from scripts.sortie_series import (EcrivainSeries, colonnes_numeriques, colonnes_series, derniere_date,  # noqa: E402
+                                   ecrire_series, lire_series)
+
+FORMATS = ["parquet", "feather", "csv", "xlsx"]
+
+
+def _series(debut="2023-02-06", n=48, sites=("A", "B")):
+    temps = pd.date_range(debut, periods=n, freq="h")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({site: rng.uniform(5.0, 50.0, n).astype(np.float32) for site in sites})
+    df.insert(0, "DateTime", temps)
+    return df
+
+
+@pytest.mark.parametrize("extension", FORMATS)
+def test_aller_retour(tmp_path, extension):
+    df = _series()
+    chemin = ecrire_series(df, str(tmp_path / f"series.{extension}"))
+    lu = lire_series(chemin)
+    assert lu.columns.tolist() == df.columns.tolist()
+    pd.testing.assert_series_equal(pd.to_datetime(lu["DateTime"]), df["DateTime"], check_dtype=False,
+                                   check_names=False)
+    np.testing.assert_allclose(lu[["A", "B"]].to_numpy(float), df[["A", "B"]].to_numpy(float), rtol=1e-6)
+
+
+@pytest.mark.parametrize("extension", FORMATS)
+def test_ajout(tmp_path, extension):
+    chemin = str(tmp_path / f"series.{extension}")
+    ecrire_series(_series(n=24), chemin)
+    ecrire_series(_series("2023-02-07", n=24), chemin, ajouter=True)
+    lu = lire_series(chemin)
+    assert len(lu) == 48
+    assert derniere_date(chemin) == pd.Timestamp("2023-02-07 23:00")
+
+
+@pytest.mark.parametrize("extension", ["parquet", "feather"])
+def test_ecriture_par_lots_et_schema(tmp_path, extension):
+    chemin = str(tmp_path / f"series.{extension}")
+    ecrivain = EcrivainSeries(chemin, taille_lot=10)
+    df = _series(n=35)
+    ecrivain.ajouter(df.iloc[:20])
+    ecrivain.ajouter(df.iloc[20:])
+    ecrivain.fermer()
+    assert colonnes_series(chemin) == ["DateTime", "A", "B"]
+    assert len(lire_series(chemin)) == 35
+
+    ecrivain = EcrivainSeries(chemin, ajouter_a_existant=True)
+    with pytest.raises(ValueError):
+        ecrivain.ajouter(df.rename(columns={"A": "C"}))
+    ecrivain.annuler()
+    # Une écriture abandonnée laisse le fichier d'origine intact
+    assert len(lire_series(chemin)) == 35
+
+
+@pytest.mark.parametrize("extension", FORMATS)
+def test_lecture_selective(tmp_path, extension):
+    chemin = ecrire_series(_series(), str(tmp_path / f"series.{extension}"))
+    lu = lire_series(chemin, colonnes=["DateTime", "B"], debut="2023-02-06 12:00", fin="2023-02-06 17:00")
+    assert lu.columns.tolist() == ["DateTime", "B"]
+    assert len(lu) == 6
+
+
+@pytest.mark.parametrize("extension", FORMATS)
+def test_colonnes_numeriques(tmp_path, extension):
+    df = _series()
+    df.insert(1, "Site", "X")
+    chemin = ecrire_series(df, str(tmp_path / f"series.{extension}"))
+    assert colonnes_numeriques(chemin) == ["A", "B"]
+
+
+def test_serie_par_defaut_format_long(tmp_path):
+    from scripts.serie_temporelle import _lire_serie, series_disponibles
+
+    large = _series()
+    long = large.melt(id_vars="DateTime", var_name="Site", value_name="TEC")
+    long["Latitude"], long["Longitude"] = 10.0, 20.0
+    long = long[["DateTime", "Site", "Latitude", "Longitude", "TEC"]]
+    chemin = ecrire_series(long, str(tmp_path / "long.parquet"))
+
+    assert series_disponibles(chemin) == ["A", "B"]
+    serie = _lire_serie(chemin)
+    assert len(serie) == len(large)
+    np.testing.assert_allclose(serie["TEC"].to_numpy(float), large["A"].to_numpy(float), rtol=1e-6)
+    np.testing.assert_allclose(_lire_serie(chemin, "B")["TEC"].to_numpy(float), large["B"].to_numpy(float),
+                               rtol=1e-6)
+
+
+def test_serie_par_defaut_format_large(tmp_path):
+    from scripts.serie_temporelle import _lire_serie, series_disponibles
+
+    chemin = ecrire_series(_series(), str(tmp_path / "large.csv"))
+    assert series_disponibles(chemin) == ["A", "B"]
+    assert _lire_serie(chemin).columns.tolist() == ["DateTime", "A"]
+
+
+def test_multi_sites_format_long_affichage(tmp_path, archive_ionex):
+    import os
+    import matplotlib.pyplot as plt
+    from scripts.generation_excel import generer_series_TEC_multi_sites
+    from scripts.serie_temporelle import afficher_serie_temporelle_tec, series_disponibles
+
+    dossier = os.path.dirname(archive_ionex[0])
+    chemin = generer_series_TEC_multi_sites(dossier, [("Nord", 40.0, 30.0), ("Sud", -20.0, 60.0)],
+                                            str(tmp_path / "sites.parquet"), format_sortie="long")
+    assert colonnes_series(chemin) == ["DateTime", "Site", "Latitude", "Longitude", "TEC"]
+    assert series_disponibles(chemin) == ["Nord", "Sud"]
+
+    fig = afficher_serie_temporelle_tec(chemin, "2023-02-07 03:00:00")
+    ligne = fig.axes[0].lines[0]
+    assert np.isfinite(np.asarray(ligne.get_ydata(), dtype=float)).all()
+    assert len(ligne.get_ydata()) == len(lire_series(chemin)) // 2
+    plt.close(fig)
+
+    # Complément sans nouvelle époque : le fichier est laissé tel quel
+    assert generer_series_TEC_multi_sites(dossier, [("Nord", 40.0, 30.0), ("Sud", -20.0, 60.0)], chemin,
+                                          format_sortie="long", ajouter=True) == chemin
+    assert len(lire_series(chemin)) == 2 * len(ligne.get_ydata())
+
+
+def test_series_zone_unique(tmp_path, archive_ionex):
+    import os
+    from scripts import generation_excel
+    from scripts.generation_excel import generer_series_TEC_par_heure
+
+    dossier = os.path.dirname(archive_ionex[0])
+    chemin = generer_series_TEC_par_heure(dossier, 21.0, 96.0, str(tmp_path / "zone.parquet"))
+    assert colonnes_series(chemin) == ["DateTime", "TEC_zone_21N_96E"]
+    assert np.isfinite(lire_series(chemin)["TEC_zone_21N_96E"].to_numpy(float)).all()
+
+    # Anciens noms conservés
+    assert generation_excel.generer_excel_TEC_par_heure is generer_series_TEC_par_heure
+    assert generation_excel.generer_excel_TEC_multi_sites is generation_excel.generer_series_TEC_multi_sites
@@ -0,0 +1,140 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from scripts.ionex_parser import lire_ionex
+from scripts.parallele import executer_par_fichier
+from scripts.synthetique import generer_archive_ionex
+from scripts.tec_cube import construire_cube, serie_boite, serie_point, serie_points, serie_zone, serie_zones
+
+
+def _construire(dossier_ionex, racine, n_workers=None):
+    return construire_cube(dossier_ionex, dossier_cube=os.path.join(racine, "cube"),
+                           dossier_cache=os.path.join(racine, "cache"), n_workers=n_workers)
+
+
+@pytest.fixture(scope="module")
+def archive(tmp_path_factory):
+    """Quatre jours à cheval sur deux années (deux blocs annuels)."""
+    dossier = str(tmp_path_factory.mktemp("archive_cube"))
+    return dossier, generer_archive_ionex(dossier, "2022-12-30", 4)
+
+
+@pytest.fixture(scope="module")
+def cube(archive, tmp_path_factory):
+    return _construire(archive[0], str(tmp_path_factory.mktemp("cube")))
+
+
+def test_fusion_parallele_deterministe(archive, tmp_path):
+    sequentiel = _construire(archive[0], str(tmp_path / "seq"), n_workers=1)
+    parallele = _construire(archive[0], str(tmp_path / "par"), n_workers=2)
+    np.testing.assert_array_equal(parallele["temps"], sequentiel["temps"])
+    np.testing.assert_array_equal(parallele["bornes"], sequentiel["bornes"])
+    for a, b in zip(parallele["blocs"], sequentiel["blocs"]):
+        np.testing.assert_array_equal(np.asarray(a), np.asarray(b))
+    assert parallele["echecs"] == sequentiel["echecs"] == []
+
+
+def test_executer_par_fichier_ordre_d_entree(archive, tmp_path):
+    fichiers = list(reversed(archive[1])) + [str(tmp_path / "absent.23i")]
+    for n_workers in (1, 2):
+        resultats, echecs = executer_par_fichier(os.path.getsize, fichiers, n_workers=n_workers)
+        assert [f for f, _ in resultats] == fichiers[:-1]
+        assert [taille for _, taille in resultats] == [os.path.getsize(f) for f in fichiers[:-1]]
+        assert [f for f, _ in echecs] == fichiers[-1:]
+
+
+def test_blocs_annuels_et_dedoublonnage(archive, cube):
+    _, fichiers = archive
+    jeux = [lire_ionex(f) for f in fichiers]
+    temps = cube["temps"]
+    assert len(cube["blocs"]) == 2
+    assert np.all(np.diff(temps.astype(np.int64)) == 3600)
+    assert temps[0] == jeux[0]["epoques"][0] and temps[-1] == jeux[-1]["epoques"][-1]
+    assert len(temps) == sum(len(ds["epoques"]) for ds in jeux) - (len(jeux) - 1)
+
+    # Carte de minuit présente dans deux fichiers : celle du jour suivant est gardée
+    grille = np.concatenate([np.asarray(bloc) for bloc in cube["blocs"]])
+    for ds in jeux[1:]:
+        k = np.searchsorted(temps, ds["epoques"][0])
+        np.testing.assert_array_equal(grille[k], ds["tec"][0])
+    debut = np.searchsorted(temps, jeux[1]["epoques"][0])
+    np.testing.assert_array_equal(grille[debut:debut + 24], jeux[1]["tec"][:24])
+
+
+def test_series_point_et_zone(archive, cube):
+    _, fichiers = archive
+    ds = lire_ionex(fichiers[2])
+    debut, fin = ds["epoques"][0], ds["epoques"][-2]
+    i, j = 30, 40
+    lat, lon = ds["latitudes"][i] + 0.4, ds["longitudes"][j] - 1.0
+
+    temps, valeurs = serie_point(cube, lat, lon, debut, fin)
+    np.testing.assert_array_equal(temps, ds["epoques"][:-1])
+    np.testing.assert_array_equal(valeurs, ds["tec"][:-1, i, j])
+
+    _, plusieurs = serie_points(cube, [lat, -lat], [lon, -lon], debut, fin)
+    np.testing.assert_array_equal(plusieurs[:, 0], valeurs)
+
+    _, boite, lats, lons = serie_boite(cube, ds["latitudes"][i + 1], ds["latitudes"][i - 1],
+                                       ds["longitudes"][j - 1], ds["longitudes"][j + 1], debut, fin)
+    np.testing.assert_array_equal(lats, ds["latitudes"][i - 1:i + 2])
+    np.testing.assert_array_equal(lons, ds["longitudes"][j - 1:j + 2])
+    np.testing.assert_array_equal(boite, ds["tec"][:-1, i - 1:i + 2, j - 1:j + 2])
+
+    _, zone = serie_zone(cube, lat, lon, debut=debut, fin=fin)
+    np.testing.assert_allclose(zone, boite.mean(axis=(1, 2)), rtol=1e-6)
+    _, zones = serie_zones(cube, [lat, ds["latitudes"][0]], [lon, ds["longitudes"][0]], debut=debut, fin=fin)
+    np.testing.assert_allclose(zones[:, 0], zone, rtol=1e-6)
+    # Au bord de la grille, la fenêtre est tronquée
+    np.testing.assert_allclose(zones[:, 1], ds["tec"][:-1, :2, :2].mean(axis=(1, 2)), rtol=1e-6)
+
+
+def test_reconstruction_incrementale(archive, tmp_path):
+    dossier = str(tmp_path / "ionex")
+    shutil.copytree(archive[0], dossier)
+    racine = str(tmp_path / "travail")
+    premier = _construire(dossier, racine)
+    bloc_2022 = os.path.join(racine, "cube", "tec_2022.npy")
+    date_2022 = os.path.getmtime(bloc_2022)
+
+    # Un jour de plus en 2023 : seul le bloc 2023 est réécrit
+    generer_archive_ionex(dossier, "2023-01-03", 1)
+    second = _construire(dossier, racine)
+    assert len(second["temps"]) == len(premier["temps"]) + 24
+    assert os.path.getmtime(bloc_2022) == date_2022
+    assert second["bornes"][1] == premier["bornes"][1]
+
+
+def test_fichier_illisible(archive, tmp_path):
+    dossier = str(tmp_path / "ionex")
+    shutil.copytree(archive[0], dossier)
+    with open(os.path.join(dossier, "CODG0010.24i"), "w") as f:
+        f.write("pas un fichier IONEX\n")
+    cube = _construire(dossier, str(tmp_path / "travail"), n_workers=2)
+    assert [os.path.basename(f) for f, _ in cube["echecs"]] == ["CODG0010.24i"]
+    assert len(cube["blocs"]) == 2
+
+
+def test_descripteurs_bornes(tmp_path):
+    resource = pytest.importorskip("resource")
+    if not os.path.isdir("/proc/self/fd"):
+        pytest.skip("descripteurs ouverts non listables")
+    # Grille grossière : 60 jours vite écrits ; l'ancienne version gardait 2 memmaps ouverts par jour
+    dossier = str(tmp_path / "ionex")
+    fichiers = generer_archive_ionex(dossier, "2023-01-01", 60, intervalle_s=7200,
+                                     grille_lat=(87.5, -87.5, -17.5), grille_lon=(-180.0, 180.0, 30.0))
+    racine = str(tmp_path / "travail")
+    _construire(dossier, racine)
+
+    souple, dur = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (len(os.listdir("/proc/self/fd")) + 40, dur))
+    try:
+        shutil.rmtree(os.path.join(racine, "cube"))
+        cube = _construire(dossier, racine)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (souple, dur))
+    assert cube["echecs"] == []
+    assert len(cube["temps"]) == len(fichiers) * 12 + 1
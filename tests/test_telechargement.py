@@ -0,0 +1,199 @@
+import gzip
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from scripts import igs_downloader  # noqa: E402
+from scripts.igs_downloader import creer_session, telecharger_fichier  # noqa: E402
+
+CONTENU = bytes(range(256)) * 4000
+
+
+class ServeurLocal:
+    """
+    Serveur HTTP local rejouant un scénario, une réponse par requête :
+    "complet" (200, ou 206 si Range, 416 si Range au-delà de la fin),
+    "coupure" (moitié du corps puis fermeture), "coupure_fin" (tout le corps
+    mais une longueur annoncée trop grande), "html", ou un code HTTP ("503"...).
+    """
+
+    def __init__(self, contenu, scenario):
+        self.contenu = contenu
+        self.scenario = list(scenario)
+        self.requetes = []
+        serveur = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                plage = self.headers.get("Range")
+                serveur.requetes.append(plage)
+                action = serveur.scenario.pop(0) if serveur.scenario else "complet"
+                debut = int(plage[len("bytes="):-1]) if plage else 0
+                corps = serveur.contenu[debut:]
+
+                if action.isdigit():
+                    self.send_response(int(action))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                elif action == "html":
+                    page = b"<html>login</html>"
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html")
+                    self.send_header("Content-Length", str(len(page)))
+                    self.end_headers()
+                    self.wfile.write(page)
+                elif plage and debut >= len(serveur.contenu):
+                    self.send_response(416)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                else:
+                    self.send_response(206 if plage else 200)
+                    annonce = len(corps) + (1 if action == "coupure_fin" else 0)
+                    self.send_header("Content-Length", str(annonce))
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.end_headers()
+                    self.wfile.write(corps[:len(corps) // 2] if action == "coupure" else corps)
+                    if action in ("coupure", "coupure_fin"):
+                        self.wfile.flush()
+                        self.close_connection = True
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Gestionnaire)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, nom):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/{nom}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def petits_blocs(monkeypatch):
+    # Blocs plus petits que le fichier : une coupure laisse des octets déjà écrits à reprendre
+    monkeypatch.setattr(igs_downloader, "TAILLE_BLOC", 4096)
+
+
+def _telecharger(serveur, nom, sortie, **options):
+    with creer_session() as session:
+        return telecharger_fichier(session, serveur.url(nom), str(sortie), delai_initial=0.0, timeout=5, **options)
+
+
+def test_reprise_range(tmp_path):
+    with ServeurLocal(CONTENU, ["coupure", "complet"]) as serveur:
+        chemin = _telecharger(serveur, "f.bin", tmp_path / "f.bin")
+    assert open(chemin, "rb").read() == CONTENU
+    assert serveur.requetes[0] is None
+    assert serveur.requetes[1] == f"bytes={len(CONTENU) // 2}-"
+    assert not os.path.exists(chemin + ".part")
+
+
+def test_reprise_d_un_fichier_partiel_existant(tmp_path):
+    sortie = tmp_path / "f.bin"
+    with open(str(sortie) + ".part", "wb") as f:
+        f.write(CONTENU[:1000])
+    with ServeurLocal(CONTENU, ["complet"]) as serveur:
+        _telecharger(serveur, "f.bin", sortie)
+    assert serveur.requetes == ["bytes=1000-"]
+    assert sortie.read_bytes() == CONTENU
+
+
+def test_nouvelles_tentatives_sur_code_transitoire(tmp_path):
+    with ServeurLocal(CONTENU, ["503", "429", "complet"]) as serveur:
+        chemin = _telecharger(serveur, "f.bin", tmp_path / "f.bin")
+    assert len(serveur.requetes) == 3
+    assert open(chemin, "rb").read() == CONTENU
+
+
+def test_tentatives_epuisees(tmp_path):
+    with ServeurLocal(CONTENU, ["503"] * 3) as serveur:
+        with pytest.raises(RuntimeError, match="3 tentatives"):
+            _telecharger(serveur, "f.bin", tmp_path / "f.bin", tentatives=3)
+    assert not (tmp_path / "f.bin").exists()
+
+
+@pytest.mark.parametrize("action", ["404", "html"])
+def test_echec_definitif_sans_nouvelle_tentative(tmp_path, action):
+    with ServeurLocal(CONTENU, [action]) as serveur:
+        with pytest.raises(RuntimeError):
+            _telecharger(serveur, "f.bin", tmp_path / "f.bin")
+    assert len(serveur.requetes) == 1
+
+
+def test_decompression_a_la_volee_avec_reprise(tmp_path):
+    with ServeurLocal(gzip.compress(CONTENU), ["coupure", "complet"]) as serveur:
+        chemin = _telecharger(serveur, "f.bin.gz", tmp_path / "f.bin", decompresser=True)
+    assert len(serveur.requetes) == 2
+    assert open(chemin, "rb").read() == CONTENU
+
+
+def test_reprise_compressee_entre_deux_appels(tmp_path):
+    # Sans compression effective : l'archive dépasse plusieurs blocs
+    compresse = gzip.compress(CONTENU, compresslevel=0)
+    sortie = tmp_path / "f.bin"
+    # Exécution interrompue : le .part garde les octets compressés déjà reçus
+    with ServeurLocal(compresse, ["coupure"]) as serveur:
+        with pytest.raises(RuntimeError):
+            _telecharger(serveur, "f.bin.gz", sortie, decompresser=True, tentatives=1)
+    partiel = tmp_path / "f.bin.gz.part"
+    recu = partiel.stat().st_size
+    assert 0 < recu < len(compresse) and partiel.read_bytes() == compresse[:recu]
+
+    with ServeurLocal(compresse, ["complet"]) as serveur:
+        _telecharger(serveur, "f.bin.gz", sortie, decompresser=True)
+    assert serveur.requetes == [f"bytes={recu}-"]
+    assert sortie.read_bytes() == CONTENU
+    assert not partiel.exists()
+
+
+def test_archive_corrompue_supprime_le_partiel(tmp_path):
+    with ServeurLocal(b"\x1f\x8b\x08" + b"\x00" * 100, ["complet"]) as serveur:
+        with pytest.raises(Exception):
+            _telecharger(serveur, "f.bin.gz", tmp_path / "f.bin", decompresser=True)
+    assert os.listdir(tmp_path) == []
+
+
+class _DecompresseurRetenu:
+    """gzip dont le dernier octet décodé n'est rendu que par flush(), comme un décodeur qui bufferise."""
+
+    def __init__(self):
+        import zlib
+        self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._reste = b""
+
+    def decompress(self, donnees):
+        sortie = self._reste + self._zlib.decompress(donnees)
+        self._reste = sortie[-1:]
+        return sortie[:-1]
+
+    def flush(self):
+        return self._reste + self._zlib.flush()
+
+
+def test_416_apres_reprise_vide_le_decompresseur(tmp_path, monkeypatch):
+    compresse = gzip.compress(CONTENU)
+    monkeypatch.setattr(igs_downloader, "decompresseur_pour", lambda nom: _DecompresseurRetenu())
+    # Le corps entier tient dans un bloc, reçu avant que la connexion casse : la reprise obtient 416
+    monkeypatch.setattr(igs_downloader, "TAILLE_BLOC", len(compresse))
+    with ServeurLocal(compresse, ["coupure_fin", "complet"]) as serveur:
+        chemin = _telecharger(serveur, "f.bin.gz", tmp_path / "f.bin", decompresser=True)
+    assert serveur.requetes[1] == f"bytes={len(compresse)}-"
+    assert open(chemin, "rb").read() == CONTENU
+
+
+def test_reprise_lzw_contre_ncompress(tmp_path):
+    ncompress = pytest.importorskip("ncompress")
+    with ServeurLocal(ncompress.compress(CONTENU), ["coupure", "complet"]) as serveur:
+        chemin = _telecharger(serveur, "f.bin.Z", tmp_path / "f.bin", decompresser=True)
+    assert open(chemin, "rb").read() == CONTENU
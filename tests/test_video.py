@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cartopy")
+
+from scripts.video import interpoler_pile, operateurs_interpolation  # noqa: E402
+
+LATITUDES = np.arange(87.5, -90.0, -2.5)
+LONGITUDES = np.arange(-180.0, 185.0, 5.0)
+
+
+def _pile(n=2):
+    rng = np.random.default_rng(0)
+    return rng.uniform(5.0, 50.0, (n, len(LATITUDES), len(LONGITUDES)))
+
+
+def test_pile_sans_lacune_inchangee_aux_noeuds():
+    pile = _pile()
+    cartes, lat_fine, lon_fine = interpoler_pile(pile, LATITUDES, LONGITUDES, n_points=len(LONGITUDES))
+    assert np.isfinite(cartes).all()
+    # Sur la grille fine des longitudes, les nœuds source sont retrouvés exactement
+    i = np.flatnonzero(np.isin(lat_fine, LATITUDES))
+    np.testing.assert_allclose(cartes[:, i[0], :], pile[:, LATITUDES == lat_fine[i[0]], :][:, 0, :])
+
+
+def test_lacune_limitee_aux_pixels_voisins():
+    pile = _pile()
+    i, j = 30, 40
+    pile[0, i, j] = np.nan
+    m_lat, m_lon = operateurs_interpolation(LATITUDES, LONGITUDES, 300)
+    cartes, _, _ = interpoler_pile(pile, LATITUDES, LONGITUDES, operateurs=(m_lat, m_lon))
+
+    attendus = np.outer(m_lat[:, i] != 0, m_lon[:, j] != 0)
+    assert attendus.any()
+    np.testing.assert_array_equal(np.isnan(cartes[0]), attendus)
+    assert np.isnan(cartes[0]).mean() < 0.01
+    # Les autres cartes de la pile ne sont pas touchées
+    assert np.isfinite(cartes[1]).all()
+
+
+def test_valeurs_hors_lacune_identiques():
+    pile = _pile()
+    reference, _, _ = interpoler_pile(pile, LATITUDES, LONGITUDES)
+    pile[0, 30, 40] = np.nan
+    cartes, _, _ = interpoler_pile(pile, LATITUDES, LONGITUDES)
+    valides = np.isfinite(cartes)
+    np.testing.assert_allclose(cartes[valides], reference[valides])
+
+
+def _ajouter_lacune(chemin):
+    """Remplace la première valeur de la première carte TEC par 9999 (« pas de donnée »)."""
+    with open(chemin) as f:
+        lignes = f.readlines()
+    debut = next(k for k, l in enumerate(lignes) if "START OF TEC MAP" in l[60:])
+    rangee = next(k for k in range(debut, len(lignes)) if "LAT/LON1/LON2/DLON/H" in lignes[k][60:])
+    lignes[rangee + 1] = " 9999" + lignes[rangee + 1][5:]
+    with open(chemin, "w") as f:
+        f.writelines(lignes)
+
+
+def test_animation_archive_avec_lacune(tmp_path, monkeypatch):
+    import os
+    from scripts import fond_carte, video
+    from scripts.synthetique import generer_archive_ionex
+
+    # Fond de carte vide : aucune donnée Natural Earth n'est lue ni téléchargée
+    def couches_vides(style="animation", largeur=fond_carte.LARGEUR_FOND, *args, **kwargs):
+        return np.zeros((largeur // 2, largeur, 4), np.uint8), np.zeros((largeur // 2, largeur, 4), np.uint8)
+
+    monkeypatch.setattr(fond_carte, "couches_fond", couches_vides)
+
+    fichiers = generer_archive_ionex(str(tmp_path / "archive"), "2023-02-06", 2)
+    _ajouter_lacune(fichiers[0])
+
+    images = []
+    interpoler = video.interpoler_pile
+
+    def espion(*args, **kwargs):
+        cartes, lat_fine, lon_fine = interpoler(*args, **kwargs)
+        images.extend(cartes)
+        return cartes, lat_fine, lon_fine
+
+    monkeypatch.setattr(video, "interpoler_pile", espion)
+    chemin = video.generer_animation_archive(str(tmp_path / "archive"), "2023-02-06T00:00", "2023-02-06T03:00",
+                                             10.0, 20.0, resolution=60, dpi=20,
+                                             dossier_cache=str(tmp_path / "cache"))
+    try:
+        assert os.path.getsize(chemin) > 0
+    finally:
+        os.remove(chemin)
+
+    assert not os.path.exists(tmp_path / "cache" / "fonds_carte")
+    assert len(images) == 4
+    assert np.isnan(images[0]).any()
+    assert all(np.isnan(image).mean() < 0.01 for image in images)